@@ -2,10 +2,23 @@ import os
 import re
 import subprocess
 import tempfile
-from langchain_openai import ChatOpenAI
+import shutil
+import json
+import copy
+import asyncio
 from langchain.prompts import ChatPromptTemplate
-from pydantic import SecretStr
 from dotenv import load_dotenv
+from utils.metrics import metrics
+from AI_service.llm_cache import acached_completion
+from AI_service.model_router import get_llm, route
+from AI_service.canonicalize import source_fingerprint
+from utils.hashing import source_hash
+from AI_service.similarity_index import audit_index
+from AI_service.patch_apply import PATCH_FORMAT_INSTRUCTIONS, PatchApplyError, parse_edits, apply_edits
+from AI_service.contract_units import split_contract_units, contract_skeleton, stitch_units, is_truncated
+from utils.cache import LRUCache
+from utils.concurrency import run_subprocess
+from utils.rate_limit import AdmissionRejected
 
 # Load API Key from backend directory
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
@@ -14,23 +27,89 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 if not openai_api_key:
     raise ValueError("OPENAI_API_KEY not found in .env")
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.1,  # Lower temperature for more consistent fixes
-    api_key=SecretStr(openai_api_key),
-    model_kwargs={"max_tokens": 2048}  # Ensure the model can return long contracts
+def audit_llm(tier: str = "fast"):
+    # Lower temperature for more consistent fixes; max_tokens so the model can return long contracts
+    return get_llm(tier, temperature=0.1, max_tokens=2048)
+
+# solc is used for the quick compile check; OpenZeppelin imports resolve from the Hardhat project
+SOLC_PATH = os.getenv("SOLC_PATH", "solc")
+HARDHAT_NODE_MODULES = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "contracts", "hardhat", "node_modules")
+
+# Audit and compile results keyed by the canonical source fingerprint, so
+# resubmissions differing only in whitespace, comments or quoting share entries.
+# Lint results key on the exact text: solhint's quote, line-length and
+# solhint-disable rules and its line:col findings depend on the layout.
+AUDIT_CACHE_TTL_SECONDS = float(os.getenv("AUDIT_CACHE_TTL_SECONDS", "3600"))
+AUDIT_CACHE_MAX_ENTRIES = int(os.getenv("AUDIT_CACHE_MAX_ENTRIES", "256"))
+audit_cache = LRUCache(AUDIT_CACHE_MAX_ENTRIES, AUDIT_CACHE_TTL_SECONDS)
+lint_cache = LRUCache(AUDIT_CACHE_MAX_ENTRIES * 4, AUDIT_CACHE_TTL_SECONDS)
+compile_cache = LRUCache(AUDIT_CACHE_MAX_ENTRIES * 4, AUDIT_CACHE_TTL_SECONDS)
+
+# A prior audit is only returned as-is for the same canonical source (fingerprint).
+# Near-duplicates above AUDIT_REFERENCE_THRESHOLD are still linted and fixed in full,
+# with the prior audit given to the LLM as a starting point
+AUDIT_REFERENCE_THRESHOLD = float(os.getenv("AUDIT_REFERENCE_THRESHOLD", "0.6"))
+
+# "patch" asks the LLM for anchored edits instead of the whole contract, "full" regenerates it,
+# "chunked" fixes each function/modifier in parallel. Contracts above the chunk threshold are
+# never regenerated in one piece, since the output would not fit in max_tokens.
+AUDIT_FIX_MODE = os.getenv("AUDIT_FIX_MODE", "patch")
+AUDIT_CHUNK_THRESHOLD_TOKENS = int(os.getenv("AUDIT_CHUNK_THRESHOLD_TOKENS", "1500"))
+
+AUDIT_SYSTEM_PROMPT = (
+    "You are an expert Solidity smart contract auditor and developer. Your task is to:\n"
+    "1. Analyze the provided incomplete or incorrect smart contract\n"
+    "2. Identify all issues, vulnerabilities, and missing components\n"
+    "3. Provide a complete, secure, and production-ready version of the contract\n"
+    "4. Follow Solidity best practices and security guidelines\n"
+    "5. Use OpenZeppelin contracts v5.x when appropriate\n"
+    "6. Ensure the contract compiles without errors\n"
+    "7. Add comprehensive comments explaining the fixes\n\n"
+    "IMPORTANT RULES:\n"
+    "- Always use pragma solidity ^0.8.0 or higher\n"
+    "- Remove SafeMath usage (not needed in Solidity ^0.8.0)\n"
+    "- Remove Counters usage (replaced with uint256 in OpenZeppelin v5.x)\n"
+    "- Replace _exists() with ownerOf() != address(0) for ERC721\n"
+    "- Add Ownable(msg.sender) to constructors when inheriting from Ownable\n"
+    "- Use reentrancy guards where appropriate\n"
+    "- Validate all inputs\n"
+    "- Handle edge cases and potential vulnerabilities\n\n"
+)
+
+UNIT_FORMAT_INSTRUCTIONS = (
+    "You are fixing ONE unit (function, modifier, constructor, fallback or receive) of a larger contract. "
+    "The rest of the contract is given as context with unit bodies elided as { ... }; other units are fixed separately.\n"
+    "Return ONLY the corrected unit, from its keyword to its closing brace, keeping its kind and name, "
+    "with NO explanations, markdown, or other code."
 )
 
-def run_solhint_audit(solidity_code: str) -> dict:
+def lookup_cached(cache: LRUCache, name: str, fingerprint: str):
+    cached = cache.get(fingerprint)
+    metrics.increment(f"{name}.hits" if cached is not None else f"{name}.misses")
+    return copy.deepcopy(cached) if cached is not None else None
+
+async def run_solhint_audit(solidity_code: str) -> dict:
     """
-    Run solhint audit on the provided Solidity code
+    Run solhint audit on the provided Solidity code, reusing results for identical sources
+    """
+    key = source_hash(solidity_code)
+    cached = lookup_cached(lint_cache, "lint_cache", key)
+    if cached is not None:
+        return cached
+    audit_result = await execute_solhint(solidity_code)
+    if "error" not in audit_result:
+        lint_cache.set(key, copy.deepcopy(audit_result))
+    return audit_result
+
+async def execute_solhint(solidity_code: str) -> dict:
+    """
+    Run the solhint CLI on the provided Solidity code
     """
     try:
         # Check if solhint is available
-        try:
-            subprocess.run(["solhint", "--version"], capture_output=True, text=True, timeout=10)
+        if shutil.which("solhint"):
             print(f"[DEBUG] Solhint is available")
-        except FileNotFoundError:
+        else:
             print(f"[DEBUG] Solhint not found - please install with: npm install -g solhint")
             return {
                 "success": True,  # Assume success if solhint not available
@@ -46,12 +125,13 @@ def run_solhint_audit(solidity_code: str) -> dict:
         # Run solhint with config file
         config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".solhint.json")
         print(f"[DEBUG] Running solhint on file: {temp_path} with config: {config_path}")
-        result = subprocess.run(["solhint", "--config", config_path, temp_path], capture_output=True, text=True, timeout=30)
+        try:
+            result = await run_subprocess(["solhint", "--config", config_path, temp_path], timeout=30, dependency="solhint")
+        finally:
+            # Clean up file
+            os.remove(temp_path)
         print(f"[DEBUG] Solhint command completed with return code: {result.returncode}")
 
-        # Clean up file
-        os.remove(temp_path)
-
         audit_result = {
             "success": True,  # Default to success
             "issues": [],
@@ -101,6 +181,93 @@ def run_solhint_audit(solidity_code: str) -> dict:
             "errors": []
         }
 
+def check_native_rules(contract_code: str) -> list:
+    """
+    Check the deterministic rules the LLM would otherwise be asked to enforce
+    """
+    violations = []
+    if not re.search(r'pragma solidity', contract_code):
+        violations.append("Missing pragma solidity statement")
+    elif not re.search(r'pragma solidity\s*(\^|>=|=)?\s*0\.8\.', contract_code):
+        violations.append("Solidity version is below ^0.8.0")
+    if not re.search(r'\bcontract\s+\w+', contract_code):
+        violations.append("Missing contract declaration")
+    if "SafeMath" in contract_code:
+        violations.append("Uses SafeMath (not needed in Solidity ^0.8.0)")
+    if "Counters" in contract_code:
+        violations.append("Uses Counters (removed in OpenZeppelin v5.x)")
+    if "_exists(" in contract_code:
+        violations.append("Uses _exists() (removed in OpenZeppelin v5.x)")
+    if re.search(r'\bis\s+[^{]*\bOwnable\b', contract_code) and "Ownable(" not in contract_code:
+        violations.append("Ownable constructor is missing Ownable(msg.sender)")
+    return violations
+
+async def quick_compile_check(solidity_code: str) -> dict:
+    """
+    Compile the contract with solc (no Hardhat project round trip) and return the ABI and bytecode
+    """
+    fingerprint = source_fingerprint(solidity_code)
+    cached = lookup_cached(compile_cache, "compile_cache", fingerprint)
+    if cached is not None:
+        return cached
+    compile_result = await compile_with_solc(solidity_code)
+    # Only cache real compiler verdicts, not missing tools or timeouts
+    if compile_result["success"] or compile_result.get("error", "").startswith("Compilation failed"):
+        compile_cache.set(fingerprint, copy.deepcopy(compile_result))
+    return compile_result
+
+async def compile_with_solc(solidity_code: str) -> dict:
+    """
+    Run solc on a single source file with OpenZeppelin imports resolvable
+    """
+    return await compile_sources({"Contract.sol": solidity_code}, "Contract.sol")
+
+async def compile_sources(files: dict, target: str) -> dict:
+    """
+    Write a {path: source} map to a temp project, compile the target file with solc
+    and return the ABI and bytecode of the contracts it declares
+    """
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for path, source in files.items():
+            file_path = os.path.join(temp_dir, path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(source)
+
+        command = [SOLC_PATH, "--combined-json", "abi,bin", "--base-path", temp_dir]
+        if os.path.isdir(HARDHAT_NODE_MODULES):
+            command += ["--include-path", HARDHAT_NODE_MODULES]
+        command.append(os.path.join(temp_dir, target))
+        try:
+            result = await run_subprocess(command, timeout=60, dependency="solc")
+        except FileNotFoundError:
+            print(f"[DEBUG] solc not found - set SOLC_PATH or install solc")
+            return {"success": False, "error": "solc not available"}
+
+        if result.returncode != 0:
+            return {"success": False, "error": f"Compilation failed: {result.stderr}"}
+
+        output = json.loads(result.stdout)
+        contracts = {}
+        for key, artifact in output.get("contracts", {}).items():
+            # Only report contracts declared in the target source, not its imports
+            source, _, name = key.rpartition(":")
+            if os.path.normpath(os.path.join(temp_dir, source)) != os.path.normpath(os.path.join(temp_dir, target)):
+                continue
+            abi = artifact.get("abi", [])
+            contracts[name] = {
+                "abi": json.loads(abi) if isinstance(abi, str) else abi,
+                "bytecode": "0x" + artifact.get("bin", "")
+            }
+        return {"success": True, "contracts": contracts}
+    except subprocess.TimeoutExpired:
+        return {"success": False, "error": "Compilation timed out"}
+    except Exception as e:
+        return {"success": False, "error": f"Compilation error: {str(e)}"}
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
 def get_audit_prompt():
     return ChatPromptTemplate.from_messages([
         (
@@ -224,16 +391,229 @@ def detect_functional_improvements(original_code: str, corrected_code: str) -> d
     
     return improvements
 
-def audit_and_fix_contract(contract_code: str) -> dict:
+async def remember_audit(fingerprint: str, contract_code: str, audit_result: dict) -> dict:
+    audit_cache.set(fingerprint, copy.deepcopy(audit_result))
+    try:
+        record = {key: value for key, value in audit_result.items() if key != "original_code"}
+        await asyncio.to_thread(audit_index.add, fingerprint, contract_code, record)
+    except Exception as e:
+        print(f"[Audit Contract] Failed to index audit: {e}")
+    return audit_result
+
+def format_reference_audit(match: dict) -> str:
+    """Describe a prior near-duplicate audit for inclusion in the LLM prompt"""
+    record = match["record"]
+    original_audit = record.get("original_audit", {})
+    findings = original_audit.get("errors", []) + original_audit.get("warnings", []) + original_audit.get("issues", [])
+    return (
+        f"A very similar contract (similarity {match['similarity']:.2f}) was audited before.\n"
+        f"Its solhint findings were:\n{chr(10).join(findings) if findings else 'None'}\n\n"
+        f"Its corrected version was:\n{record.get('corrected_code', '')}\n\n"
+        "Use it as a starting point: apply the same fixes where they fit, keeping this contract's own names, values and features."
+    )
+
+def build_fix_messages(contract_code: str, audit_summary: str, reference: dict | None, fix_mode: str) -> list:
+    """Build the LLM messages for a full-regeneration or patch-mode fix"""
+    from langchain_core.messages import SystemMessage, HumanMessage
+    if fix_mode == "patch":
+        system_message = AUDIT_SYSTEM_PROMPT + PATCH_FORMAT_INSTRUCTIONS
+        request = "Please provide the edits that make this contract complete, secure, and correct."
+    else:
+        system_message = AUDIT_SYSTEM_PROMPT + "Return ONLY the ENTIRE corrected Solidity contract code, from the pragma statement to the last closing bracket, with NO explanations, markdown, or comments outside the code. Do not truncate the contract."
+        request = "Please provide a complete, secure, and corrected version of this contract."
+    human_message = f"Here is the incomplete or incorrect smart contract:\n\n{contract_code}\n\nSolhint audit results:\n{audit_summary}\n\n{request}"
+    if reference:
+        human_message += "\n\n" + format_reference_audit(reference)
+    return [SystemMessage(content=system_message), HumanMessage(content=human_message)]
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+def finding_line(finding: str) -> int | None:
+    """Line number of a solhint finding such as '12:5  warning  ...'"""
+    match = re.match(r'(\d+):\d+', finding)
+    return int(match.group(1)) if match else None
+
+def findings_between(audit_result: dict, start_line: int, end_line: int) -> list:
+    findings = audit_result.get("errors", []) + audit_result.get("warnings", []) + audit_result.get("issues", [])
+    return [f for f in findings if (line := finding_line(f)) is not None and start_line <= line <= end_line]
+
+def clean_unit_output(output: str, unit: dict) -> str | None:
+    """Extract a fixed unit from the LLM output, or None if it is not a complete unit of the same kind"""
+    code_block_match = re.search(r'```(?:solidity)?\s*\n(.*?)\n```', output, re.DOTALL | re.IGNORECASE)
+    code = (code_block_match.group(1) if code_block_match else output).strip()
+    if not code.startswith(unit["kind"]) or is_truncated(code) or "{" not in code:
+        return None
+    return code
+
+async def fix_contract_unit(unit: dict, skeleton: str, solhint_results: dict, tier: str = "fast") -> str | None:
+    from langchain_core.messages import SystemMessage, HumanMessage
+    findings = findings_between(solhint_results, unit["start_line"], unit["end_line"])
+    human_message = (
+        f"Contract context:\n\n{skeleton}\n\n"
+        f"Unit to fix ({unit['id']}):\n\n{unit['text']}\n\n"
+        f"Solhint findings in this unit:\n{chr(10).join(findings) if findings else 'None'}\n\n"
+        "Please provide the corrected unit."
+    )
+    metrics.increment("audit.llm_calls")
+    output = await acached_completion(audit_llm(tier), [
+        SystemMessage(content=AUDIT_SYSTEM_PROMPT + UNIT_FORMAT_INSTRUCTIONS),
+        HumanMessage(content=human_message)
+    ])
+    fixed = clean_unit_output(output, unit)
+    if fixed is None:
+        print(f"[Audit Contract] Keeping original {unit['id']}: LLM output was not a complete unit")
+    return fixed
+
+async def fix_contract_header(skeleton: str, solhint_results: dict, units: list, reference: dict | None, tier: str = "fast") -> list:
+    """Contract-level fixes (pragma, imports, inheritance, state) as edits against the skeleton"""
+    unit_lines = [(unit["start_line"], unit["end_line"]) for unit in units]
+    findings = [
+        f for f in solhint_results.get("errors", []) + solhint_results.get("warnings", []) + solhint_results.get("issues", [])
+        if not any(start <= (finding_line(f) or 0) <= end for start, end in unit_lines)
+    ]
+    from langchain_core.messages import SystemMessage
+    system_message, human_message = build_fix_messages(skeleton, "\n".join(findings) or "None", reference, "patch")
+    messages = [
+        SystemMessage(content=system_message.content + " Function bodies are elided as { ... } and fixed separately; only edit code outside them."),
+        human_message
+    ]
+    metrics.increment("audit.llm_calls")
+    return parse_edits(await acached_completion(audit_llm(tier), messages))
+
+async def chunked_fix_contract(contract_code: str, solhint_results: dict, reference: dict | None, tier: str = "fast") -> str | None:
+    """
+    Fix each function-level unit in a parallel LLM call with the contract skeleton as
+    shared context, fix contract-level code as edits, and stitch the results together.
+    Returns None if the contract has no units to split on.
+    """
+    units = split_contract_units(contract_code)
+    if not units:
+        return None
+    skeleton = contract_skeleton(contract_code, units)
+    print(f"[Audit Contract] Chunked audit of {len(units)} units")
+    header_result, *unit_results = await asyncio.gather(
+        fix_contract_header(skeleton, solhint_results, units, reference, tier),
+        *(fix_contract_unit(unit, skeleton, solhint_results, tier) for unit in units),
+        return_exceptions=True
+    )
+    # Out of LLM quota: fail the request rather than return a partially fixed contract
+    for result in [header_result, *unit_results]:
+        if isinstance(result, AdmissionRejected):
+            raise result
+    replacements = {}
+    for unit, fixed in zip(units, unit_results):
+        if isinstance(fixed, Exception):
+            print(f"[Audit Contract] Unit {unit['id']} failed: {fixed}")
+        elif fixed:
+            replacements[unit["id"]] = fixed
+    stitched = stitch_units(contract_code, units, replacements)
+
+    if isinstance(header_result, Exception):
+        print(f"[Audit Contract] Contract-level fixes skipped: {header_result}")
+    elif header_result:
+        try:
+            stitched = apply_edits(stitched, header_result)
+        except PatchApplyError as e:
+            print(f"[Audit Contract] Contract-level edits did not apply: {e}")
+    return stitched
+
+async def llm_fix_contract(contract_code: str, solhint_results: dict, audit_summary: str, reference: dict | None, fix_mode: str, tier: str = "fast") -> tuple:
+    """
+    Ask the LLM to fix the contract and return (corrected_code, applied_fix_mode).
+    Patch-mode edits are applied locally; if they don't apply cleanly the contract
+    is regenerated instead, in parallel chunks when it is too large for one response.
+    """
+    large = estimate_tokens(contract_code) > AUDIT_CHUNK_THRESHOLD_TOKENS
+    if fix_mode == "full" and large:
+        fix_mode = "chunked"
+
+    if fix_mode == "patch":
+        metrics.increment("audit.llm_calls")
+        output = await acached_completion(audit_llm(tier), build_fix_messages(contract_code, audit_summary, reference, "patch"))
+        try:
+            edits = parse_edits(output)
+            corrected_code = apply_edits(contract_code, edits)
+            print(f"[Audit Contract] Applied {len(edits)} LLM edits")
+            metrics.increment("audit.patch_applied")
+            return corrected_code, "patch"
+        except PatchApplyError as e:
+            print(f"[Audit Contract] Patch did not apply ({e}), falling back to regeneration")
+            metrics.increment("audit.patch_fallback")
+            fix_mode = "chunked" if large else "full"
+
+    if fix_mode == "chunked":
+        metrics.increment("audit.chunked")
+        corrected_code = await chunked_fix_contract(contract_code, solhint_results, reference, tier)
+        if corrected_code is not None:
+            return corrected_code, "chunked"
+
+    metrics.increment("audit.llm_calls")
+    output = await acached_completion(audit_llm(tier), build_fix_messages(contract_code, audit_summary, reference, "full"))
+    corrected_code = clean_llm_code_output(output)
+    if is_truncated(corrected_code):
+        metrics.increment("audit.truncated")
+        raise ValueError("LLM output was truncated before the end of the contract")
+    return corrected_code, "full"
+
+async def fix_passes_checks(corrected_code: str, solhint_results: dict) -> bool:
+    """
+    Escalation check for an LLM fix: it must compile and must not add lint errors.
+    Missing tools count as a pass, so escalation only happens on real failures.
+    """
+    compile_result = await quick_compile_check(corrected_code)
+    if not compile_result["success"] and compile_result.get("error", "").startswith("Compilation failed"):
+        return False
+    final_audit = await run_solhint_audit(corrected_code)
+    return len(final_audit.get("errors", [])) <= len(solhint_results.get("errors", []))
+
+async def audit_and_fix_contract(contract_code: str, force_llm: bool = False, fix_mode: str = AUDIT_FIX_MODE) -> dict:
     """
-    Main function to audit and fix a smart contract
+    Main function to audit and fix a smart contract.
+    Clean contracts skip the LLM unless force_llm is set. fix_mode is "patch",
+    "full" or "chunked" (see AUDIT_FIX_MODE).
     """
     print(f"[Audit Contract] Starting audit process...")
+    metrics.increment("audit.requests")
+    
+    fingerprint = source_fingerprint(contract_code)
+    if not force_llm:
+        cached = lookup_cached(audit_cache, "audit_cache", fingerprint)
+        if cached is None:
+            # The persisted index outlives the in-memory cache and restarts, but not the
+            # cache TTL; exact fingerprint matches only
+            try:
+                indexed = await asyncio.to_thread(audit_index.get, fingerprint, AUDIT_CACHE_TTL_SECONDS)
+            except Exception as e:
+                print(f"[Audit Contract] Audit index lookup failed: {e}")
+                indexed = None
+            if indexed is not None:
+                metrics.increment("audit.index_reused")
+                cached = copy.deepcopy(indexed)
+        if cached is not None:
+            print(f"[Audit Contract] Reusing audit for fingerprint {fingerprint[:12]}")
+            cached["original_code"] = contract_code
+            if cached.get("fast_path"):
+                cached["corrected_code"] = contract_code
+            cached["cached"] = True
+            return cached
     
     try:
+        # Step 0: Look for a near-duplicate contract audited before
+        reference = None
+        try:
+            reference = await asyncio.to_thread(audit_index.nearest, contract_code, fingerprint)
+        except Exception as e:
+            print(f"[Audit Contract] Similarity lookup failed: {e}")
+        if reference:
+            print(f"[Audit Contract] Nearest prior audit {reference['fingerprint'][:12]} with similarity {reference['similarity']:.2f}")
+            if reference["similarity"] < AUDIT_REFERENCE_THRESHOLD:
+                reference = None
+        
+
         # Step 1: Run solhint audit
         print(f"[Audit Contract] Running solhint audit...")
-        solhint_results = run_solhint_audit(contract_code)
+        solhint_results = await run_solhint_audit(contract_code)
         print(f"[Audit Contract] Solhint audit completed")
         
         # Step 2: Prepare audit results for LLM
@@ -250,46 +630,48 @@ def audit_and_fix_contract(contract_code: str) -> dict:
         else:
             audit_summary = "No issues found - contract passed solhint analysis"
         
-        # Step 3: Call LLM for fixes
-        print(f"[Audit Contract] Calling LLM for contract fixes...")
-        audit_prompt = get_audit_prompt()
-        
-        # Create the prompt manually
-        system_message = (
-            "You are an expert Solidity smart contract auditor and developer. Your task is to:\n"
-            "1. Analyze the provided incomplete or incorrect smart contract\n"
-            "2. Identify all issues, vulnerabilities, and missing components\n"
-            "3. Provide a complete, secure, and production-ready version of the contract\n"
-            "4. Follow Solidity best practices and security guidelines\n"
-            "5. Use OpenZeppelin contracts v5.x when appropriate\n"
-            "6. Ensure the contract compiles without errors\n"
-            "7. Add comprehensive comments explaining the fixes\n\n"
-            "IMPORTANT RULES:\n"
-            "- Always use pragma solidity ^0.8.0 or higher\n"
-            "- Remove SafeMath usage (not needed in Solidity ^0.8.0)\n"
-            "- Remove Counters usage (replaced with uint256 in OpenZeppelin v5.x)\n"
-            "- Replace _exists() with ownerOf() != address(0) for ERC721\n"
-            "- Add Ownable(msg.sender) to constructors when inheriting from Ownable\n"
-            "- Use reentrancy guards where appropriate\n"
-            "- Validate all inputs\n"
-            "- Handle edge cases and potential vulnerabilities\n\n"
-                            "Return ONLY the ENTIRE corrected Solidity contract code, from the pragma statement to the last closing bracket, with NO explanations, markdown, or comments outside the code. Do not truncate the contract."
-        )
-        
-        human_message = f"Here is the incomplete or incorrect smart contract:\n\n{contract_code}\n\nSolhint audit results:\n{audit_summary}\n\nPlease provide a complete, secure, and corrected version of this contract."
+        # Fast path: lint is clean, native rules pass and the contract compiles
+        if not force_llm and not issues and solhint_results.get("success"):
+            native_violations = check_native_rules(contract_code)
+            if not native_violations:
+                print(f"[Audit Contract] Lint clean, running quick compile check...")
+                compile_result = await quick_compile_check(contract_code)
+                if compile_result["success"]:
+                    print(f"[Audit Contract] Contract is already clean, skipping LLM")
+                    metrics.increment("audit.fast_path")
+                    return await remember_audit(fingerprint, contract_code, {
+                        "success": True,
+                        "original_code": contract_code,
+                        "corrected_code": contract_code,
+                        "original_audit": solhint_results,
+                        "final_audit": solhint_results,
+                        "issues_fixed": 0,
+                        "remaining_issues": 0,
+                        "improvements": detect_functional_improvements(contract_code, contract_code),
+                        "fast_path": True,
+                        "message": "No changes needed - contract passed solhint, native rules and compilation"
+                    })
+                print(f"[Audit Contract] Quick compile check failed: {compile_result.get('error')}")
+            else:
+                print(f"[Audit Contract] Native rule violations: {native_violations}")
         
-        from langchain_core.messages import SystemMessage, HumanMessage
-        messages = [SystemMessage(content=system_message), HumanMessage(content=human_message)]
-        
-        response = llm(messages)
-        corrected_code = str(response.content) if hasattr(response, 'content') else str(response)
-        corrected_code = clean_llm_code_output(corrected_code)
+        # Step 3: Call LLM for fixes
+        print(f"[Audit Contract] Calling LLM for contract fixes ({fix_mode} mode)...")
+        if reference:
+            metrics.increment("audit.similar_referenced")
+        async def attempt(tier):
+            return await llm_fix_contract(contract_code, solhint_results, audit_summary, reference, fix_mode, tier)
+
+        async def validate(fix):
+            return await fix_passes_checks(fix[0], solhint_results)
+
+        (corrected_code, applied_fix_mode), model_tier = await route("audit_fix", attempt, validate)
         
-        print(f"[Audit Contract] LLM processing completed")
+        print(f"[Audit Contract] LLM processing completed ({model_tier} tier)")
         
         # Step 4: Run solhint on corrected code
         print(f"[Audit Contract] Running solhint on corrected code...")
-        final_audit = run_solhint_audit(corrected_code)
+        final_audit = await run_solhint_audit(corrected_code)
         print(f"[Audit Contract] Final audit completed")
         
         # Step 5: Detect functional improvements
@@ -303,7 +685,7 @@ def audit_and_fix_contract(contract_code: str) -> dict:
         
         print(f"[Audit Contract] Solhint issues: {solhint_issues}, Functional improvements: {functional_improvements}")
         
-        return {
+        return await remember_audit(fingerprint, contract_code, {
             "success": True,
             "original_code": contract_code,
             "corrected_code": corrected_code,
@@ -311,9 +693,16 @@ def audit_and_fix_contract(contract_code: str) -> dict:
             "final_audit": final_audit,
             "issues_fixed": total_issues_fixed,
             "remaining_issues": len(final_audit.get("errors", [])) + len(final_audit.get("warnings", [])),
-            "improvements": improvements
-        }
+            "improvements": improvements,
+            "fast_path": False,
+            "fix_mode": applied_fix_mode,
+            "model_tier": model_tier,
+            "reused_from": reference["fingerprint"] if reference else None,
+            "similarity": reference["similarity"] if reference else None
+        })
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         print(f"[Audit Contract] Error during audit: {e}")
         import traceback
@@ -325,6 +714,179 @@ def audit_and_fix_contract(contract_code: str) -> dict:
             "corrected_code": contract_code
         }
 
+FINDING_CATEGORIES = ("errors", "warnings", "issues")
+
+def unit_at(units: list, line: int | None) -> dict | None:
+    return next((unit for unit in units if line is not None and unit["start_line"] <= line <= unit["end_line"]), None)
+
+def contract_findings_key(source: str, units: list) -> str:
+    """known_findings key of the findings outside every unit, which only hold for one skeleton"""
+    return f"contract:{source_hash(contract_skeleton(source, units))}"
+
+async def incremental_lint(source: str, known_findings: dict) -> tuple:
+    """
+    Lint only the code that changed: units whose text hash is in known_findings reuse
+    their prior findings and are blanked out (line count preserved) before solhint runs.
+    The blanked file is only trusted inside changed units; contract-level findings
+    (e.g. an import only a blanked unit uses looks unused) come from the last full
+    lint of the same skeleton. Returns the audit result and the relative findings
+    of every unit, keyed by unit hash, plus the contract-level ones.
+    """
+    units = split_contract_units(source)
+    reused = [unit for unit in units if unit["hash"] in known_findings]
+    contract_key = contract_findings_key(source, units)
+    reuse_contract = bool(reused) and contract_key in known_findings
+    delta_source = stitch_units(source, reused, {unit["id"]: "\n" * unit["text"].count("\n") for unit in reused})
+    audit_result = await run_solhint_audit(delta_source)
+    for category in FINDING_CATEGORIES:
+        kept = []
+        for f in audit_result.get(category, []):
+            line = finding_line(f)
+            unit = unit_at(units, line)
+            # Reused units are covered by their stored findings, the rest of the file by the stored contract findings
+            if line is None or (unit["hash"] not in known_findings if unit else not reuse_contract):
+                kept.append(f)
+        audit_result[category] = kept
+
+    unit_findings = {}
+    for unit in units:
+        if unit["hash"] in known_findings:
+            unit_findings[unit["hash"]] = known_findings[unit["hash"]]
+            for category, offset, rest in known_findings[unit["hash"]]:
+                audit_result.setdefault(category, []).append(f"{unit['start_line'] + offset}{rest}")
+        else:
+            # Store findings relative to the unit's first line so they survive moves
+            unit_findings[unit["hash"]] = [
+                (category, finding_line(f) - unit["start_line"], f[len(str(finding_line(f))):])
+                for category in FINDING_CATEGORIES
+                for f in findings_between({category: audit_result.get(category, [])}, unit["start_line"], unit["end_line"])
+            ]
+
+    by_id = {unit["id"]: unit for unit in units}
+    if reuse_contract:
+        unit_findings[contract_key] = known_findings[contract_key]
+        for category, anchor, offset, rest in known_findings[contract_key]:
+            base = by_id[anchor]["end_line"] if anchor is not None else 0
+            audit_result.setdefault(category, []).append(f"{base + offset}{rest}")
+    else:
+        # Relative to the end of the preceding unit, since unit bodies may grow or shrink
+        unit_findings[contract_key] = []
+        for category in FINDING_CATEGORIES:
+            for f in audit_result.get(category, []):
+                line = finding_line(f)
+                if line is None or unit_at(units, line):
+                    continue
+                anchor = next((unit for unit in reversed(units) if unit["end_line"] < line), None)
+                base = anchor["end_line"] if anchor else 0
+                unit_findings[contract_key].append((category, anchor["id"] if anchor else None, line - base, f[len(str(line)):]))
+    if any(audit_result.get(category) for category in FINDING_CATEGORIES):
+        audit_result["success"] = False
+    return audit_result, unit_findings
+
+# Previous audit per session, for incremental re-audits of edited contracts
+AUDIT_SESSION_TTL_SECONDS = float(os.getenv("AUDIT_SESSION_TTL_SECONDS", "3600"))
+audit_sessions = LRUCache(int(os.getenv("AUDIT_SESSION_MAX_ENTRIES", "1024")), AUDIT_SESSION_TTL_SECONDS)
+
+async def start_audit_session(session_id: str, contract_code: str, force_llm: bool, fix_mode: str) -> dict:
+    audit_result = await audit_and_fix_contract(contract_code, force_llm=force_llm, fix_mode=fix_mode)
+    if audit_result.get("success"):
+        _, original_findings = await incremental_lint(contract_code, {})
+        _, final_findings = await incremental_lint(audit_result["corrected_code"], {})
+        audit_sessions.set(session_id, {
+            "original_code": contract_code,
+            "skeleton": contract_skeleton(contract_code, split_contract_units(contract_code)),
+            "unit_findings": {**original_findings, **final_findings},
+            "result": copy.deepcopy(audit_result)
+        })
+    audit_result["incremental"] = {"changed_units": None, "reused_units": 0}
+    return audit_result
+
+async def incremental_audit_and_fix_contract(session_id: str, contract_code: str, force_llm: bool = False, fix_mode: str = AUDIT_FIX_MODE) -> dict:
+    """
+    Re-audit an edited contract against the previous audit of the same session.
+    When only function bodies changed, just the changed units are re-linted, and
+    only those with findings are re-fixed (all of them with force_llm); findings
+    and fixes for untouched units are reused. Anything else (first audit,
+    contract-level edits) runs the full audit and starts the session.
+    """
+    session = audit_sessions.get(session_id)
+    units = split_contract_units(contract_code)
+    if session is None or contract_skeleton(contract_code, units) != session["skeleton"]:
+        print(f"[Audit Contract] Starting audit session {session_id}")
+        return await start_audit_session(session_id, contract_code, force_llm, fix_mode)
+
+    try:
+        previous_units = {unit["id"]: unit for unit in split_contract_units(session["original_code"])}
+        prior = session["result"]
+        corrected_units = {unit["id"]: unit for unit in split_contract_units(prior["corrected_code"])}
+        changed = [unit for unit in units if previous_units[unit["id"]]["hash"] != unit["hash"]]
+        if any(unit["id"] not in corrected_units for unit in changed):
+            print(f"[Audit Contract] Prior fix restructured the contract, re-auditing session {session_id}")
+            return await start_audit_session(session_id, contract_code, force_llm, fix_mode)
+        print(f"[Audit Contract] Incremental audit: {len(changed)} of {len(units)} units changed")
+        metrics.increment("audit.incremental")
+        metrics.increment("audit.incremental_units_reused", len(units) - len(changed))
+
+        solhint_results, original_findings = await incremental_lint(contract_code, session["unit_findings"])
+        skeleton = contract_skeleton(contract_code, units)
+        # Same clean-check as the full audit, per unit: only units with findings go to the LLM
+        to_fix = changed if force_llm else [
+            unit for unit in changed if findings_between(solhint_results, unit["start_line"], unit["end_line"])
+        ]
+        replacements = {unit["id"]: unit["text"] for unit in changed}
+        if not force_llm and len(to_fix) < len(changed):
+            candidate = stitch_units(prior["corrected_code"], list(corrected_units.values()), replacements)
+            compile_result = await quick_compile_check(candidate)
+            compile_failed = not compile_result["success"] and compile_result.get("error", "").startswith("Compilation failed")
+            if check_native_rules(candidate) or compile_failed:
+                # A contract-level failure can't be pinned to one unit, so every changed unit is re-fixed
+                print(f"[Audit Contract] Lint-clean units fail native rules or compilation, fixing all changed units")
+                to_fix = changed
+        metrics.increment("audit.incremental_units_clean", len(changed) - len(to_fix))
+        fixed_units = await asyncio.gather(*(fix_contract_unit(unit, skeleton, solhint_results) for unit in to_fix))
+        replacements.update({unit["id"]: fixed for unit, fixed in zip(to_fix, fixed_units) if fixed})
+        corrected_code = stitch_units(prior["corrected_code"], list(corrected_units.values()), replacements)
+        final_audit, final_findings = await incremental_lint(corrected_code, session["unit_findings"])
+
+        improvements = detect_functional_improvements(contract_code, corrected_code)
+        solhint_issues = len(solhint_results.get("errors", [])) + len(solhint_results.get("warnings", []))
+        audit_result = {
+            "success": True,
+            "original_code": contract_code,
+            "corrected_code": corrected_code,
+            "original_audit": solhint_results,
+            "final_audit": final_audit,
+            "issues_fixed": solhint_issues + improvements["total_improvements"],
+            "remaining_issues": len(final_audit.get("errors", [])) + len(final_audit.get("warnings", [])),
+            "improvements": improvements,
+            "fast_path": not to_fix,
+            "fix_mode": "incremental",
+        }
+        audit_sessions.set(session_id, {
+            "original_code": contract_code,
+            "skeleton": skeleton,
+            "unit_findings": {**session["unit_findings"], **original_findings, **final_findings},
+            "result": copy.deepcopy(audit_result)
+        })
+        audit_result["incremental"] = {
+            "changed_units": [unit["id"] for unit in changed],
+            "fixed_units": [unit["id"] for unit in to_fix],
+            "reused_units": len(units) - len(changed)
+        }
+        return audit_result
+    except AdmissionRejected:
+        raise
+    except Exception as e:
+        print(f"[Audit Contract] Error during incremental audit: {e}")
+        import traceback
+        traceback.print_exc()
+        return {
+            "success": False,
+            "error": str(e),
+            "original_code": contract_code,
+            "corrected_code": contract_code
+        }
+
 def validate_contract_structure(contract_code: str) -> dict:
     """
     Basic validation of contract structure
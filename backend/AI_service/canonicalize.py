@@ -0,0 +1,71 @@
+import re
+import hashlib
+
+# Comments, string literals, words and single punctuation characters, in priority order
+TOKEN_PATTERN = re.compile(
+    r'(?P<space>\s+)'
+    r'|(?P<comment>//[^\n]*|/\*.*?(?:\*/|$))'
+    r'|(?P<string>"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')'
+    r'|(?P<word>\w+)'
+    r'|(?P<punct>.)',
+    re.DOTALL
+)
+
+def normalize_string_literal(literal: str) -> str:
+    """Rewrite a string literal in double-quoted form so 'abc' and "abc" compare equal"""
+    if literal.startswith('"'):
+        return literal
+    body = literal[1:-1].replace("\\'", "'").replace('"', '\\"')
+    return f'"{body}"'
+
+def tokenize_source(contract_code: str) -> list:
+    """
+    Split Solidity source into tokens with comments and whitespace removed
+    and string literals normalized
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(contract_code):
+        kind = match.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        text = match.group(kind)
+        tokens.append(normalize_string_literal(text) if kind == "string" else text)
+    return tokens
+
+def split_statements(tokens: list) -> tuple:
+    """Separate top-level import statements from the rest of the token stream"""
+    imports, body, depth, i = [], [], 0, 0
+    while i < len(tokens):
+        token = tokens[i]
+        if depth == 0 and token == "import":
+            end = i
+            while end < len(tokens) and tokens[end] != ";":
+                end += 1
+            imports.append(" ".join(tokens[i:end + 1]))
+            i = end + 1
+            continue
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth = max(depth - 1, 0)
+        body.append(token)
+        i += 1
+    return imports, body
+
+def canonicalize_source(contract_code: str) -> str:
+    """
+    Produce a stable canonical form of a contract: comments (including the SPDX line)
+    removed, whitespace collapsed, string literals double-quoted and imports sorted
+    """
+    imports, body = split_statements(tokenize_source(contract_code))
+    header = []
+    # Keep pragma directives ahead of the sorted imports so ordering stays meaningful
+    while body[:1] == ["pragma"]:
+        end = body.index(";") if ";" in body else len(body) - 1
+        header.append(" ".join(body[:end + 1]))
+        body = body[end + 1:]
+    return "\n".join(header + sorted(set(imports)) + [" ".join(body)])
+
+def source_fingerprint(contract_code: str) -> str:
+    """sha256 of the canonical source, used as the key for the audit and compile caches (lint keys on the exact text)"""
+    return hashlib.sha256(canonicalize_source(contract_code).encode("utf-8")).hexdigest()
@@ -0,0 +1,196 @@
+import os
+import re
+import time
+import asyncio
+from datetime import datetime, timezone
+from langchain_core.messages import SystemMessage, HumanMessage
+from AI_service.llm_cache import acached_completion
+from AI_service.llm_gateway import llm_gateway
+from AI_service.model_router import get_llm
+from utils.chat_store import archive_buckets, read_summary
+from utils.mongo import get_async_chat_bucket_collection, get_async_chat_summary_collection
+from utils.concurrency import foreground_activity
+from utils.metrics import metrics
+from utils.cache import LRUCache
+
+# Background compaction of long chat histories: everything but a user's newest
+# CHAT_COMPACTION_KEEP_BUCKETS buckets is folded into a stored rolling summary
+# and moved to the compressed cold archive, so hot reads and context stay small.
+# The worker only runs while this process is nearly idle and, for LLM summaries,
+# while the shared token bucket has headroom.
+CHAT_COMPACTION_ENABLED = os.getenv("CHAT_COMPACTION_ENABLED", "true").lower() == "true"
+CHAT_COMPACTION_INTERVAL_SECONDS = float(os.getenv("CHAT_COMPACTION_INTERVAL_SECONDS", "300"))
+# At least the tail bucket stays hot: it is the only one appends write to
+CHAT_COMPACTION_KEEP_BUCKETS = max(1, int(os.getenv("CHAT_COMPACTION_KEEP_BUCKETS", "2")))
+CHAT_COMPACTION_BATCH_USERS = int(os.getenv("CHAT_COMPACTION_BATCH_USERS", "20"))
+CHAT_COMPACTION_USER_PAUSE_SECONDS = float(os.getenv("CHAT_COMPACTION_USER_PAUSE_SECONDS", "1"))
+CHAT_COMPACTION_MAX_FOREGROUND_REQUESTS = int(os.getenv("CHAT_COMPACTION_MAX_FOREGROUND_REQUESTS", "1"))
+CHAT_COMPACTION_MIN_LLM_HEADROOM = float(os.getenv("CHAT_COMPACTION_MIN_LLM_HEADROOM", "0.5"))
+CHAT_COMPACTION_FAILURE_BACKOFF_SECONDS = float(os.getenv("CHAT_COMPACTION_FAILURE_BACKOFF_SECONDS", "3600"))
+
+# Users whose last compaction failed are skipped until the backoff expires, so
+# one bad history can't hold the front of every pass and starve everyone after it
+failed_users = LRUCache(int(os.getenv("CHAT_COMPACTION_FAILED_USERS_MAX_ENTRIES", "1000")), CHAT_COMPACTION_FAILURE_BACKOFF_SECONDS)
+
+# "llm" summarizes with the fast tier (falling back to extractive on errors); "extractive" never calls the LLM
+CHAT_SUMMARY_MODE = os.getenv("CHAT_SUMMARY_MODE", "llm")
+CHAT_SUMMARY_MAX_CHARS = int(os.getenv("CHAT_SUMMARY_MAX_CHARS", "4000"))
+CHAT_SUMMARY_INPUT_CHARS = int(os.getenv("CHAT_SUMMARY_INPUT_CHARS", "24000"))
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a rolling summary of a user's conversation with a Solidity smart-contract assistant. "
+    "Merge the new messages into the existing summary. Keep what later turns may depend on: contracts "
+    "requested and their names, features and parameters, deployed addresses, decisions, and open problems. "
+    f"Drop greetings and repetition. Reply with the updated summary only, at most {CHAT_SUMMARY_MAX_CHARS} characters."
+)
+CONTRACT_NAME_PATTERN = re.compile(r'\bcontract\s+([A-Za-z_]\w*)')
+
+def describe_message(message: dict, max_chars: int) -> str:
+    """One transcript line; contract code is referenced, not included"""
+    text = " ".join(str(message.get("text", "")).split())[:max_chars]
+    if isinstance(message.get("code"), str):
+        names = CONTRACT_NAME_PATTERN.findall(message["code"])
+        text += f" [contract code: {', '.join(names) or 'unnamed'}]"
+    elif message.get("code_hash"):
+        text += f" [contract code sha256:{message['code_hash'][:12]}]"
+    return f"{message.get('sender', 'unknown')}: {text}"
+
+def transcript(messages: list) -> str:
+    # Share the input budget evenly so one long message can't crowd out the rest
+    per_message = max(80, CHAT_SUMMARY_INPUT_CHARS // max(1, len(messages)))
+    return "\n".join(describe_message(message, per_message) for message in messages)
+
+def extractive_summary(previous: str, messages: list) -> str:
+    """Deterministic fallback: the user's requests and code references, newest kept when over budget"""
+    lines = [describe_message(message, 160) for message in messages if message.get("sender") == "user" or message.get("code") or message.get("code_hash")]
+    summary = "\n".join(part for part in [previous, *lines] if part)
+    return summary[-CHAT_SUMMARY_MAX_CHARS:]
+
+def llm_has_headroom() -> bool:
+    return llm_gateway.token_bucket.headroom() >= CHAT_COMPACTION_MIN_LLM_HEADROOM
+
+async def summarize(previous: str, messages: list) -> tuple:
+    """(summary, method); only spends LLM tokens while foreground traffic leaves headroom"""
+    if CHAT_SUMMARY_MODE == "llm" and llm_has_headroom():
+        prompt = [
+            SystemMessage(content=SUMMARY_SYSTEM_PROMPT),
+            HumanMessage(content=f"Existing summary:\n{previous or '(none)'}\n\nNew messages:\n{transcript(messages)}")
+        ]
+        try:
+            summary = await acached_completion(get_llm("fast", 0.2, 1024), prompt)
+            return summary.strip()[:CHAT_SUMMARY_MAX_CHARS], "llm"
+        except Exception as e:
+            print(f"[Chat Compaction] LLM summary failed, using extractive summary: {e}")
+            metrics.increment("chat_compaction.llm_failures")
+    return extractive_summary(previous, messages), "extractive"
+
+class ChatCompactor:
+    """Periodic background worker; start() on startup and stop() on shutdown"""
+
+    def __init__(self):
+        self._task = None
+        self._stopping = asyncio.Event()
+
+    def start(self):
+        if CHAT_COMPACTION_ENABLED and self._task is None:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping.set()
+        # A user is compacted in one go, so let the current one finish
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _sleep(self, seconds: float) -> bool:
+        """Sleep unless stopping; returns False once stop() was called"""
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+            return False
+        except asyncio.TimeoutError:
+            return True
+
+    async def _wait_for_idle(self) -> bool:
+        while foreground_activity.inflight > CHAT_COMPACTION_MAX_FOREGROUND_REQUESTS:
+            metrics.increment("chat_compaction.deferred")
+            if not await self._sleep(CHAT_COMPACTION_USER_PAUSE_SECONDS):
+                return False
+        return not self._stopping.is_set()
+
+    async def _run(self):
+        while await self._sleep(CHAT_COMPACTION_INTERVAL_SECONDS):
+            try:
+                for user_id in await compaction_candidates(CHAT_COMPACTION_BATCH_USERS):
+                    if not await self._wait_for_idle():
+                        return
+                    try:
+                        await compact_user(user_id)
+                    except Exception as e:
+                        print(f"[Chat Compaction] Compacting {user_id} failed, skipping for {CHAT_COMPACTION_FAILURE_BACKOFF_SECONDS:.0f}s: {e}")
+                        metrics.increment("chat_compaction.user_failures")
+                        failed_users.set(user_id, True)
+                    if not await self._sleep(CHAT_COMPACTION_USER_PAUSE_SECONDS):
+                        return
+            except Exception as e:
+                # Never let one bad pass kill the worker; the next pass retries
+                print(f"[Chat Compaction] Pass failed: {e}")
+                metrics.increment("chat_compaction.failures")
+
+async def compaction_candidates(limit: int) -> list:
+    """Users with more hot buckets than the compactor keeps, minus those backing off after a failure"""
+    pipeline = [
+        {"$sort": {"user_id": 1}},
+        {"$group": {"_id": "$user_id", "buckets": {"$sum": 1}}},
+        {"$match": {"buckets": {"$gt": CHAT_COMPACTION_KEEP_BUCKETS}}},
+        # Over-fetch by the number of failed users so skipping them still fills the batch
+        {"$limit": limit + len(failed_users)}
+    ]
+    users = [group["_id"] async for group in get_async_chat_bucket_collection().aggregate(pipeline)]
+    return [user_id for user_id in users if not failed_users.get(user_id)][:limit]
+
+async def compact_user(user_id: str) -> dict:
+    """
+    Fold the user's older buckets into the rolling summary, then archive them.
+    Only full buckets behind the newest CHAT_COMPACTION_KEEP_BUCKETS are touched;
+    appends only ever write the tail, so nothing compacted is still changing.
+    Buckets at or below summarized_through were summarized by an earlier run
+    that stopped before archiving; they are archived without summarizing twice.
+    """
+    start = time.perf_counter()
+    buckets_collection = get_async_chat_bucket_collection()
+    newest = [bucket["bucket_seq"] async for bucket in buckets_collection.find(
+        {"user_id": user_id}, projection={"bucket_seq": 1}, sort=[("bucket_seq", -1)], limit=CHAT_COMPACTION_KEEP_BUCKETS + 1
+    )]
+    if len(newest) <= CHAT_COMPACTION_KEEP_BUCKETS:
+        return {"compacted": 0}
+    cutoff = newest[CHAT_COMPACTION_KEEP_BUCKETS - 1]
+    buckets = [bucket async for bucket in buckets_collection.find(
+        {"user_id": user_id, "bucket_seq": {"$lt": cutoff}}, sort=[("bucket_seq", 1)]
+    )]
+    state = await read_summary(user_id) or {}
+    summarized_through = state.get("summarized_through")
+    fresh = [bucket for bucket in buckets if summarized_through is None or bucket["bucket_seq"] > summarized_through]
+    messages = [message for bucket in fresh for message in bucket["messages"]]
+    if messages:
+        summary, method = await summarize(state.get("summary", ""), messages)
+        await get_async_chat_summary_collection().update_one(
+            {"_id": user_id},
+            {
+                "$set": {"summary": summary, "summarized_through": fresh[-1]["bucket_seq"], "method": method,
+                         "updated_at": datetime.now(timezone.utc)},
+                "$inc": {"archived_messages": len(messages)}
+            },
+            upsert=True
+        )
+        metrics.increment(f"chat_compaction.summaries_{method}")
+    await archive_buckets(user_id, buckets)
+    metrics.increment("chat_compaction.users_compacted")
+    metrics.increment("chat_compaction.messages_compacted", len(messages))
+    metrics.observe("chat_compaction.user_latency", time.perf_counter() - start)
+    print(f"[Chat Compaction] Compacted {len(buckets)} buckets ({len(messages)} new messages) for {user_id}")
+    return {"compacted": len(buckets), "summarized": len(messages)}
+
+# Create a global instance
+chat_compactor = ChatCompactor()
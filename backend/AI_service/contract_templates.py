@@ -0,0 +1,257 @@
+import re
+import asyncio
+from utils.metrics import metrics
+from AI_service.audit_contract import run_solhint_audit, quick_compile_check
+
+# Parameterized OpenZeppelin v5 templates for the "<contract_type>|<features>" prompts
+# we see most. Anything the parser doesn't fully recognize goes to the LLM instead.
+TEMPLATE_TYPES = {
+    "erc20": "erc20", "erc20token": "erc20", "fungibletoken": "erc20",
+    "erc721": "erc721", "erc721token": "erc721", "nft": "erc721",
+}
+TEMPLATE_DEFAULTS = {
+    "erc20": {"name": "MyToken", "symbol": "MTK", "initial_supply": 1_000_000, "cap": 1_000_000},
+    "erc721": {"name": "MyNFT", "symbol": "MNFT", "cap": 10_000},
+}
+FLAG_FEATURES = {
+    "mintable": "mintable", "mint": "mintable",
+    "burnable": "burnable", "burn": "burnable",
+    "pausable": "pausable", "pause": "pausable",
+    "ownable": "ownable", "owned": "ownable",
+}
+IGNORED_FEATURES = {"", "none", "basic", "standard", "simple", "secure", "production-ready", "production ready"}
+
+AMOUNT = r'(\d[\d,_]*(?:\.\d+)?)\s*([kmb]|thousand|million|billion)?'
+CAP_PATTERN = re.compile(r'^(?:capped|cap|max(?:imum)? supply)(?:\s+(?:at|of|to))?(?:\s+' + AMOUNT + r')?(?:\s+(?:tokens|nfts|items))?$')
+SUPPLY_PATTERN = re.compile(r'^(?:initial\s+)?supply(?:\s+(?:of|=))?\s+' + AMOUNT + r'(?:\s+tokens)?$')
+NAME_PATTERN = re.compile(r'^(?:name|named|called)\s*[:=]?\s*([a-z][a-z0-9 ]{0,39})$')
+SYMBOL_PATTERN = re.compile(r'^(?:symbol|ticker)\s*[:=]?\s*([a-z0-9]{1,11})$')
+FEATURE_SEPARATOR = re.compile(r'\s*(?:,|;|\band\b|&|\+|\n)\s*')
+
+MULTIPLIERS = {None: 1, "k": 1_000, "thousand": 1_000, "m": 1_000_000, "million": 1_000_000, "b": 1_000_000_000, "billion": 1_000_000_000}
+
+def parse_amount(number: str, suffix: str | None) -> int | None:
+    value = float(number.replace(",", "").replace("_", "")) * MULTIPLIERS[suffix]
+    return int(value) if value >= 1 and value == int(value) else None
+
+def parse_template_request(contract_type: str, features: str) -> dict | None:
+    """
+    Turn a generation prompt into a template spec, or None when the type or any
+    requested feature isn't covered by the templates
+    """
+    template = TEMPLATE_TYPES.get(re.sub(r'[^a-z0-9]', '', contract_type.lower()))
+    if template is None:
+        return None
+    spec = {"type": template, "features": set(), **TEMPLATE_DEFAULTS[template]}
+    names = {}
+    for phrase in FEATURE_SEPARATOR.split(features.strip()):
+        lowered = phrase.lower().strip(" .")
+        if lowered in IGNORED_FEATURES:
+            continue
+        if lowered in FLAG_FEATURES:
+            spec["features"].add(FLAG_FEATURES[lowered])
+            continue
+        cap = CAP_PATTERN.match(lowered)
+        if cap:
+            spec["features"].add("capped")
+            if cap.group(1):
+                spec["cap"] = parse_amount(cap.group(1), cap.group(2))
+            continue
+        supply = SUPPLY_PATTERN.match(lowered)
+        if supply and template == "erc20":
+            spec["initial_supply"] = parse_amount(supply.group(1), supply.group(2))
+            continue
+        name = NAME_PATTERN.match(lowered)
+        if name:
+            names["name"] = phrase.strip(" .")[-len(name.group(1)):]
+            continue
+        symbol = SYMBOL_PATTERN.match(lowered)
+        if symbol:
+            names["symbol"] = symbol.group(1).upper()
+            continue
+        return None
+    if spec["cap"] is None or spec.get("initial_supply", 1) is None:
+        return None
+    spec.update(names)
+    # Minting and pausing are owner-only, and a capped NFT collection needs a mint function
+    if template == "erc721" and "capped" in spec["features"]:
+        spec["features"].add("mintable")
+    if spec["features"] & {"mintable", "pausable"}:
+        spec["features"].add("ownable")
+    if template == "erc20" and "capped" in spec["features"]:
+        spec["initial_supply"] = min(spec["initial_supply"], spec["cap"])
+    return spec
+
+def contract_identifier(name: str, fallback: str) -> str:
+    identifier = "".join(word[:1].upper() + word[1:] for word in re.findall(r'[A-Za-z0-9]+', name))
+    return identifier if re.match(r'^[A-Za-z_]', identifier or "") else fallback
+
+def render_erc20(spec: dict, contract_name: str) -> str:
+    features = spec["features"]
+    imports = ["@openzeppelin/contracts/token/ERC20/ERC20.sol"]
+    bases = ["ERC20"]
+    for feature, base in (("burnable", "ERC20Burnable"), ("capped", "ERC20Capped"), ("pausable", "ERC20Pausable")):
+        if feature in features:
+            imports.append(f"@openzeppelin/contracts/token/ERC20/extensions/{base}.sol")
+            bases.append(base)
+    constructor_bases = [f'ERC20("{spec["name"]}", "{spec["symbol"]}")']
+    if "capped" in features:
+        constructor_bases.append(f'ERC20Capped({spec["cap"]} * 10 ** 18)')
+    if "ownable" in features:
+        imports.append("@openzeppelin/contracts/access/Ownable.sol")
+        bases.append("Ownable")
+        constructor_bases.append("Ownable(msg.sender)")
+
+    body = [
+        f"    constructor() {' '.join(constructor_bases)} {{",
+        f"        _mint(msg.sender, {spec['initial_supply']} * 10 ** decimals());",
+        "    }",
+    ]
+    if "mintable" in features:
+        body += ["", "    function mint(address to, uint256 amount) public onlyOwner {", "        _mint(to, amount);", "    }"]
+    if "pausable" in features:
+        body += pause_functions()
+    update_bases = [base for base in ("ERC20", "ERC20Capped", "ERC20Pausable") if base in bases]
+    if len(update_bases) > 1:
+        body += [
+            "",
+            "    // The following function is an override required by Solidity",
+            "    function _update(address from, address to, uint256 value)",
+            "        internal",
+            f"        override({', '.join(update_bases)})",
+            "    {",
+            "        super._update(from, to, value);",
+            "    }",
+        ]
+    return contract_source(contract_name, imports, bases, body)
+
+def render_erc721(spec: dict, contract_name: str) -> str:
+    features = spec["features"]
+    imports = ["@openzeppelin/contracts/token/ERC721/ERC721.sol"]
+    bases = ["ERC721"]
+    for feature, base in (("burnable", "ERC721Burnable"), ("pausable", "ERC721Pausable")):
+        if feature in features:
+            imports.append(f"@openzeppelin/contracts/token/ERC721/extensions/{base}.sol")
+            bases.append(base)
+    constructor_bases = [f'ERC721("{spec["name"]}", "{spec["symbol"]}")']
+    if "ownable" in features:
+        imports.append("@openzeppelin/contracts/access/Ownable.sol")
+        bases.append("Ownable")
+        constructor_bases.append("Ownable(msg.sender)")
+
+    body = []
+    if "capped" in features:
+        body.append(f"    uint256 public constant MAX_SUPPLY = {spec['cap']};")
+    if "mintable" in features:
+        body.append("    uint256 private _nextTokenId;")
+    if body:
+        body.append("")
+    body.append(f"    constructor() {' '.join(constructor_bases)} {{}}")
+    if "mintable" in features:
+        body += ["", "    function safeMint(address to) public onlyOwner returns (uint256) {"]
+        if "capped" in features:
+            body.append('        require(_nextTokenId < MAX_SUPPLY, "Max supply reached");')
+        body += [
+            "        uint256 tokenId = _nextTokenId++;",
+            "        _safeMint(to, tokenId);",
+            "        return tokenId;",
+            "    }",
+        ]
+    if "pausable" in features:
+        body += pause_functions()
+        body += [
+            "",
+            "    // The following function is an override required by Solidity",
+            "    function _update(address to, uint256 tokenId, address auth)",
+            "        internal",
+            "        override(ERC721, ERC721Pausable)",
+            "        returns (address)",
+            "    {",
+            "        return super._update(to, tokenId, auth);",
+            "    }",
+        ]
+    return contract_source(contract_name, imports, bases, body)
+
+def pause_functions() -> list:
+    return [
+        "",
+        "    function pause() public onlyOwner {",
+        "        _pause();",
+        "    }",
+        "",
+        "    function unpause() public onlyOwner {",
+        "        _unpause();",
+        "    }",
+    ]
+
+def contract_source(contract_name: str, imports: list, bases: list, body: list) -> str:
+    lines = ["// SPDX-License-Identifier: MIT", "pragma solidity ^0.8.20;", ""]
+    lines += [f'import "{path}";' for path in imports]
+    lines += ["", f"contract {contract_name} is {', '.join(bases)} {{"] + body + ["}"]
+    return "\n".join(lines) + "\n"
+
+def explain_template(spec: dict, contract_name: str) -> str:
+    """Plain-language explanation, in the same shape as the LLM's answers"""
+    features = spec["features"]
+    if spec["type"] == "erc20":
+        points = [f"**{contract_name}** is an ERC-20 token called \"{spec['name']}\" with the symbol {spec['symbol']}.",
+                  f"- {spec['initial_supply']:,} tokens are created and sent to your wallet when the contract is deployed."]
+        if "mintable" in features:
+            points.append("- **Mintable:** as the owner you can create new tokens and send them to any address.")
+        if "capped" in features:
+            points.append(f"- **Capped:** the total supply can never exceed {spec['cap']:,} tokens.")
+        if "burnable" in features:
+            points.append("- **Burnable:** holders can permanently destroy their own tokens.")
+    else:
+        points = [f"**{contract_name}** is an ERC-721 NFT collection called \"{spec['name']}\" with the symbol {spec['symbol']}."]
+        if "mintable" in features:
+            points.append("- **Mintable:** as the owner you can mint a new NFT to any address; token ids start at 0.")
+        if "capped" in features:
+            points.append(f"- **Capped:** at most {spec['cap']:,} NFTs can ever be minted.")
+        if "burnable" in features:
+            points.append("- **Burnable:** owners of an NFT (or approved operators) can destroy it.")
+    if "pausable" in features:
+        points.append("- **Pausable:** as the owner you can pause and resume all transfers, e.g. during an emergency.")
+    if "ownable" in features:
+        points.append("- **Ownable:** the deploying wallet is the owner and the only account allowed to use the admin functions.")
+    points.append("It is built on audited OpenZeppelin v5 contracts and has no constructor arguments, so it can be deployed as is.")
+    return "\n".join(points)
+
+def render_template(spec: dict) -> tuple:
+    """Return (contract_name, code, response text formatted like an LLM answer)"""
+    fallback = TEMPLATE_DEFAULTS[spec["type"]]["name"]
+    contract_name = contract_identifier(spec["name"], fallback)
+    code = render_erc20(spec, contract_name) if spec["type"] == "erc20" else render_erc721(spec, contract_name)
+    features = ", ".join(sorted(spec["features"])) or "no extra features"
+    text = (
+        f"Here is your {'ERC-20' if spec['type'] == 'erc20' else 'ERC-721'} contract ({features}):\n\n"
+        f"```solidity\n{code}```\n\n{explain_template(spec, contract_name)}"
+    )
+    return contract_name, code, text
+
+async def build_template_contract(contract_type: str, features: str) -> dict | None:
+    """
+    Render a recognized request locally and lint and compile it before returning it
+    with its ABI and bytecode. Returns None (use the LLM) for unrecognized requests
+    or if the rendered contract doesn't compile.
+    """
+    spec = parse_template_request(contract_type, features)
+    if spec is None:
+        metrics.increment("generate.template_misses")
+        return None
+    contract_name, code, text = render_template(spec)
+    lint, compiled = await asyncio.gather(run_solhint_audit(code), quick_compile_check(code))
+    if not compiled["success"] and compiled.get("error", "").startswith("Compilation failed"):
+        print(f"[Contract Templates] Rendered {contract_name} does not compile, falling back to LLM: {compiled['error']}")
+        metrics.increment("generate.template_rejected")
+        return None
+    metrics.increment("generate.template_hits")
+    return {
+        "contract": text,
+        "code": code,
+        "contract_name": contract_name,
+        "template": spec["type"],
+        "features": sorted(spec["features"]),
+        "lint": lint,
+        "artifact": (compiled.get("contracts") or {}).get(contract_name)
+    }
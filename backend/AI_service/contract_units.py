@@ -0,0 +1,135 @@
+import re
+import hashlib
+
+# Function-level units of a contract: the pieces the chunked and incremental audits work on
+UNIT_KEYWORDS = re.compile(r'\b(function|modifier|constructor|fallback|receive)\b')
+CONTAINER_PATTERN = re.compile(r'\b(contract|library|interface)\s+([A-Za-z_]\w*)')
+COMMENT_OR_STRING = re.compile(
+    r'//[^\n]*|/\*.*?(?:\*/|$)|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'',
+    re.DOTALL
+)
+
+def mask_comments_and_strings(source: str) -> str:
+    """Blank out comments and string literals (keeping newlines and offsets) so braces can be matched safely"""
+    return COMMENT_OR_STRING.sub(lambda m: re.sub(r'[^\n]', ' ', m.group(0)), source)
+
+def matching_brace(masked: str, open_index: int) -> int:
+    """Index of the brace closing the one at open_index, or -1 if the source is truncated"""
+    depth = 0
+    for i in range(open_index, len(masked)):
+        if masked[i] == "{":
+            depth += 1
+        elif masked[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def is_truncated(source: str) -> bool:
+    """True when braces don't balance, e.g. an LLM response cut off by the token limit"""
+    masked = mask_comments_and_strings(source)
+    return masked.count("{") != masked.count("}")
+
+def line_of(source: str, index: int) -> int:
+    return source.count("\n", 0, index) + 1
+
+def split_contract_units(source: str) -> list:
+    """
+    Split a contract into its function, modifier, constructor, fallback and receive
+    units. Each unit is a dict with id, contract, kind, name, start, end, start_line,
+    end_line, text and hash; declarations without a body are skipped.
+    """
+    masked = mask_comments_and_strings(source)
+    units, seen_ids = [], {}
+    position = 0
+    while True:
+        container = CONTAINER_PATTERN.search(masked, position)
+        if not container:
+            break
+        body_open = masked.find("{", container.end())
+        if body_open == -1:
+            break
+        body_close = matching_brace(masked, body_open)
+        if body_close == -1:
+            body_close = len(masked)
+
+        cursor = body_open + 1
+        while cursor < body_close:
+            keyword = UNIT_KEYWORDS.search(masked, cursor, body_close)
+            if not keyword:
+                break
+            # Only members at the top level of the contract body are units
+            if masked.count("{", body_open + 1, keyword.start()) != masked.count("}", body_open + 1, keyword.start()):
+                cursor = keyword.end()
+                continue
+            kind = keyword.group(1)
+            name_match = re.match(r'\s+([A-Za-z_]\w*)', masked[keyword.end():])
+            name = name_match.group(1) if kind in ("function", "modifier") and name_match else kind
+
+            # The unit's body starts at the first brace outside the parameter list
+            paren_depth, body_start, index = 0, -1, keyword.end()
+            while index < body_close:
+                char = masked[index]
+                if char == "(":
+                    paren_depth += 1
+                elif char == ")":
+                    paren_depth -= 1
+                elif paren_depth == 0 and char == ";":
+                    break
+                elif paren_depth == 0 and char == "{":
+                    body_start = index
+                    break
+                index += 1
+            if body_start == -1:
+                cursor = index + 1
+                continue
+            unit_end = matching_brace(masked, body_start)
+            if unit_end == -1:
+                break
+            unit_end += 1
+
+            base_id = f"{container.group(2)}.{kind}:{name}"
+            seen_ids[base_id] = seen_ids.get(base_id, 0) + 1
+            unit_id = base_id if seen_ids[base_id] == 1 else f"{base_id}#{seen_ids[base_id]}"
+            text = source[keyword.start():unit_end]
+            units.append({
+                "id": unit_id,
+                "contract": container.group(2),
+                "kind": kind,
+                "name": name,
+                "start": keyword.start(),
+                "end": unit_end,
+                "start_line": line_of(source, keyword.start()),
+                "end_line": line_of(source, unit_end),
+                "text": text,
+                "hash": hashlib.sha256(text.encode("utf-8")).hexdigest()
+            })
+            cursor = unit_end
+        position = body_close + 1
+    return units
+
+def contract_skeleton(source: str, units: list) -> str:
+    """
+    Shared context for unit-level prompts: the full source with every unit body
+    elided, keeping pragma, imports, inheritance, state variables and signatures
+    """
+    masked = mask_comments_and_strings(source)
+    skeleton, position = [], 0
+    for unit in units:
+        body_start = masked.find("{", unit["start"])
+        # Keep the signature up to the body brace
+        skeleton.append(source[position:body_start])
+        skeleton.append("{ ... }")
+        position = unit["end"]
+    skeleton.append(source[position:])
+    return "".join(skeleton)
+
+def stitch_units(source: str, units: list, replacements: dict) -> str:
+    """Replace the text of the given units (by id) and return the reassembled source"""
+    stitched, position = [], 0
+    for unit in sorted(units, key=lambda u: u["start"]):
+        stitched.append(source[position:unit["start"]])
+        stitched.append(replacements.get(unit["id"], unit["text"]))
+        position = unit["end"]
+    stitched.append(source[position:])
+    return "".join(stitched)
@@ -1,12 +1,20 @@
 import os
 import sys
 import subprocess
+import re
+import asyncio
 import tempfile
 from dotenv import load_dotenv
 
-from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-from pydantic import SecretStr
+
+# Make the backend packages importable when run as a CLI script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from AI_service.llm_cache import cached_completion, acached_stream
+from AI_service.model_router import get_llm, route_sync
+from AI_service.contract_units import is_truncated
+from AI_service.contract_templates import parse_template_request, render_template, build_template_contract
+from utils.rate_limit import AdmissionRejected
 
 # Load API Key from backend directory
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
@@ -17,12 +25,7 @@ if not openai_api_key:
     print("OPENAI_API_KEY not found in .env")
     sys.exit(1)
 
-# Init LLM
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.2,
-    api_key=SecretStr(openai_api_key)
-)
+CODE_BLOCK_PATTERN = re.compile(r'```(?:solidity)?\s*\n(.*?)\n```', re.DOTALL | re.IGNORECASE)
 
 # Prompt Template
 contract_prompt = ChatPromptTemplate.from_messages([
@@ -31,17 +34,125 @@ contract_prompt = ChatPromptTemplate.from_messages([
 ])
 
 # Contract Generator
-def generate_contract(contract_type, features):
+def generate_contract(contract_type, features, use_templates=True):
     try:
+        # Recognized ERC-20/ERC-721 requests are rendered locally, unless the caller
+        # already tried the template and it failed its checks
+        spec = parse_template_request(contract_type, features) if use_templates else None
+        if spec is not None:
+            return render_template(spec)[2]
         messages = contract_prompt.format_messages(
             contract_type=contract_type,
             features=features
         )
-        response = llm(messages)
-        return response.content
+        contract, tier = route_sync(
+            "generate",
+            lambda tier: cached_completion(get_llm(tier, temperature=0.2), messages),
+            generated_contract_passes_checks
+        )
+        print(f"[Generate Contract] Contract produced by {tier} tier")
+        return contract
+    except AdmissionRejected:
+        raise
     except Exception as e:
         return f"Error generating contract: {str(e)}"
 
+async def agenerate_contract(contract_type, features) -> dict:
+    """
+    Generate a contract for the API: a checked local template when the request is
+    recognized (with its ABI and bytecode), otherwise the LLM off the event loop
+    """
+    template = await build_template_contract(contract_type, features)
+    if template is not None:
+        print(f"[Generate Contract] Rendered {template['contract_name']} from the {template['template']} template")
+        return template
+    # build_template_contract already handled (or rejected) the template, so go straight to the LLM
+    return {"contract": await asyncio.to_thread(generate_contract, contract_type, features, False)}
+
+class CodeBlockSplitter:
+    """
+    Split streamed markdown into ("code", text) and ("explanation", text) segments
+    as chunks arrive. Solidity (or untagged) fenced blocks are code; fence lines
+    are dropped. Text is held back only while it could still be a fence line.
+    """
+    CODE_LANGUAGES = ("", "solidity", "sol")
+
+    def __init__(self):
+        self.buffer = ""
+        self.fence = None  # None outside a block, else True for a code block, False for another language
+        self.line_start = True
+
+    def kind(self) -> str:
+        return "code" if self.fence else "explanation"
+
+    def feed(self, chunk: str) -> list:
+        self.buffer += chunk
+        segments = []
+        while self.buffer:
+            if self.line_start and self.buffer.startswith("```"):
+                newline = self.buffer.find("\n")
+                if newline == -1:
+                    break  # Wait for the rest of the fence line
+                language = self.buffer[3:newline].strip().lower()
+                if self.fence is None:
+                    self.fence = language in self.CODE_LANGUAGES
+                    if not self.fence:
+                        segments.append(("explanation", self.buffer[:newline + 1]))
+                else:
+                    if not self.fence:
+                        segments.append(("explanation", self.buffer[:newline + 1]))
+                    self.fence = None
+                self.buffer = self.buffer[newline + 1:]
+                continue
+            if self.line_start and len(self.buffer) < 3 and "```".startswith(self.buffer):
+                break  # Could still become a fence
+            newline = self.buffer.find("\n")
+            end = len(self.buffer) if newline == -1 else newline + 1
+            segments.append((self.kind(), self.buffer[:end]))
+            self.buffer = self.buffer[end:]
+            self.line_start = newline != -1
+        return segments
+
+    def flush(self) -> list:
+        segments = [(self.kind(), self.buffer)] if self.buffer else []
+        self.buffer = ""
+        return segments
+
+async def stream_generate_contract(contract_type, features):
+    """
+    Stream a generated contract as (event, data) pairs: "code" and "explanation"
+    text deltas as the LLM produces them, then "done" with the full response.
+    Streaming always uses the fast tier, since output can't be escalated mid-stream.
+    """
+    template = await build_template_contract(contract_type, features)
+    if template is not None:
+        before, _, after = template["contract"].split("```", 2)
+        explanation = "\n\n".join(part.strip() for part in (before, after) if part.strip())
+        yield "code", template["code"]
+        yield "explanation", explanation
+        yield "done", {"code": template["code"].strip(), "explanation": explanation, "template": template["template"]}
+        return
+
+    messages = contract_prompt.format_messages(contract_type=contract_type, features=features)
+    splitter = CodeBlockSplitter()
+    parts = {"code": [], "explanation": []}
+    async for chunk in acached_stream(get_llm("fast", temperature=0.2), messages):
+        for kind, text in splitter.feed(chunk):
+            parts[kind].append(text)
+            yield kind, text
+    for kind, text in splitter.flush():
+        parts[kind].append(text)
+        yield kind, text
+    yield "done", {"code": "".join(parts["code"]).strip(), "explanation": "".join(parts["explanation"]).strip()}
+
+def generated_contract_passes_checks(response: str) -> bool:
+    """Escalation check: the response contains a complete contract with no solhint errors"""
+    match = CODE_BLOCK_PATTERN.search(response)
+    code = match.group(1) if match else ""
+    if "contract " not in code or is_truncated(code):
+        return False
+    return not audit_contract(code).startswith("Solhint Audit Report")
+
 # Smart Contract Auditor (using solhint)
 def audit_contract(solidity_code):
     try:
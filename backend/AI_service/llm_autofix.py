@@ -1,9 +1,9 @@
 import os
 import re
-from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-from pydantic import SecretStr
 from dotenv import load_dotenv
+from AI_service.llm_cache import cached_completion
+from AI_service.model_router import get_llm, route_sync, LLM_TIERS, RULE_TIER
 
 # Load API Key from backend directory
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
@@ -12,11 +12,8 @@ openai_api_key = os.getenv("OPENAI_API_KEY")
 if not openai_api_key:
     raise ValueError("OPENAI_API_KEY not found in .env")
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.1,  # Lower temperature for more consistent fixes
-    api_key=SecretStr(openai_api_key)
-)
+def autofix_llm(tier: str = "fast"):
+    return get_llm(tier, temperature=0.1)  # Lower temperature for more consistent fixes
 
 def preprocess_contract_code(code: str) -> str:
     try:
@@ -119,9 +116,12 @@ def clean_llm_code_output(code: str) -> str:
             cleaned_lines.append(line)
     return '\n'.join(cleaned_lines).strip()
 
-def llm_autofix_solidity(contract_code: str, error_message: str) -> str:
+def llm_autofix_solidity(contract_code: str, error_message: str, validate=None) -> str:
     """
     Hybrid autofix: regex for known patterns, LLM for complex fixes.
+    Given a validate(code) -> bool check (e.g. a compile), the regex pass is tried
+    on its own first and the LLM escalates from the fast to the strong tier only
+    while the result still fails the check.
     """
     print(f"[LLM Autofix] Starting autofix process...")
     try:
@@ -131,7 +131,7 @@ def llm_autofix_solidity(contract_code: str, error_message: str) -> str:
         print(f"[LLM Autofix] Regex preprocessing completed")
         
         # Now call the LLM for any remaining issues
-        print(f"[LLM Autofix] Calling LLM for additional fixes...")
+        print(f"[LLM Autofix] Preparing LLM fixes...")
         autofix_prompt = get_comprehensive_autofix_prompt()
         
         # Create the prompt manually to avoid string formatting issues
@@ -171,10 +171,16 @@ def llm_autofix_solidity(contract_code: str, error_message: str) -> str:
         from langchain_core.messages import SystemMessage, HumanMessage
         messages = [SystemMessage(content=system_message), HumanMessage(content=human_message)]
         
-        response = llm(messages)
-        code = str(response.content) if hasattr(response, 'content') else str(response)
-        code = clean_llm_code_output(code)
-        print(f"[LLM Autofix] LLM processing completed")
+        def attempt(tier):
+            if tier == RULE_TIER:
+                return preprocessed_code if preprocessed_code != contract_code else None
+            return clean_llm_code_output(cached_completion(autofix_llm(tier), messages))
+
+        if validate is None:
+            code, tier = route_sync("autofix", attempt, lambda code: True, ["fast"])
+        else:
+            code, tier = route_sync("autofix", attempt, validate, [RULE_TIER] + LLM_TIERS)
+        print(f"[LLM Autofix] Fix produced by {tier} tier")
         return code
     except Exception as e:
         print(f"[LLM Autofix] Error during fix: {e}")
@@ -0,0 +1,194 @@
+import os
+import json
+import asyncio
+import time
+import hashlib
+import sqlite3
+import threading
+from utils.cache import LRUCache
+from utils.metrics import metrics
+from AI_service.llm_gateway import llm_gateway
+from utils.concurrency import SingleFlight
+
+# Two tiers: a small in-memory LRU in front of a local SQLite file that survives restarts
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "llm_cache.sqlite3")
+)
+LLM_CACHE_MEMORY_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_MAX_ENTRIES", "512"))
+LLM_CACHE_MEMORY_TTL_SECONDS = float(os.getenv("LLM_CACHE_MEMORY_TTL_SECONDS", "3600"))
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "20000"))
+LLM_CACHE_DISK_TTL_SECONDS = float(os.getenv("LLM_CACHE_DISK_TTL_SECONDS", str(7 * 24 * 3600)))
+
+class SQLiteCompletionStore:
+    """Disk tier of the completion cache, capped by entry count and TTL"""
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if created_at + self.ttl_seconds <= now:
+                conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            # Drop expired rows, then the least recently used ones above the size cap
+            conn.execute("DELETE FROM completions WHERE created_at <= ?", (now - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+
+class LLMCompletionCache:
+    """Completion cache keyed by model, temperature and the exact message list"""
+
+    def __init__(self):
+        self.memory = LRUCache(LLM_CACHE_MEMORY_MAX_ENTRIES, LLM_CACHE_MEMORY_TTL_SECONDS)
+        self.disk = SQLiteCompletionStore(LLM_CACHE_PATH, LLM_CACHE_DISK_MAX_ENTRIES, LLM_CACHE_DISK_TTL_SECONDS)
+
+    @staticmethod
+    def make_key(model: str, temperature, messages, max_tokens=None) -> str:
+        payload = {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": [[getattr(m, "type", "human"), str(getattr(m, "content", m))] for m in messages]
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is not None:
+            metrics.increment("llm_cache.memory_hits")
+            return value
+        try:
+            value = self.disk.get(key)
+        except sqlite3.Error as e:
+            print(f"[LLM Cache] Disk tier read failed: {e}")
+            value = None
+        if value is not None:
+            metrics.increment("llm_cache.disk_hits")
+            self.memory.set(key, value)
+            return value
+        metrics.increment("llm_cache.misses")
+        return None
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        try:
+            self.disk.set(key, value)
+        except sqlite3.Error as e:
+            print(f"[LLM Cache] Disk tier write failed: {e}")
+
+completion_cache = LLMCompletionCache()
+
+# Identical LLM requests in flight at the same time share one upstream call
+LLM_COALESCING_ENABLED = os.getenv("LLM_COALESCING_ENABLED", "true").lower() == "true"
+inflight_completions = SingleFlight()
+
+def request_key(llm, messages):
+    max_tokens = (getattr(llm, "model_kwargs", None) or {}).get("max_tokens") or getattr(llm, "max_tokens", None)
+    return completion_cache.make_key(llm.model_name, llm.temperature, messages, max_tokens)
+
+def completion_key(llm, messages):
+    return request_key(llm, messages) if LLM_CACHE_ENABLED else None
+
+def response_text(response) -> str:
+    return str(response.content) if hasattr(response, 'content') else str(response)
+
+def cached_completion(llm, messages) -> str:
+    """
+    Invoke the LLM through the completion cache and return the response text
+    """
+    key = completion_key(llm, messages)
+    if key is not None:
+        cached = completion_cache.get(key)
+        if cached is not None:
+            return cached
+
+    content = response_text(llm_gateway.complete(llm, messages))
+
+    if key is not None:
+        completion_cache.set(key, content)
+    return content
+
+async def acached_stream(llm, messages):
+    """
+    Stream the completion text in chunks; a cached completion is yielded as a
+    single chunk and a streamed one is cached once it has finished
+    """
+    key = completion_key(llm, messages)
+    if key is not None:
+        cached = await asyncio.to_thread(completion_cache.get, key)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks = []
+    async for chunk in llm_gateway.astream(llm, messages):
+        chunks.append(chunk)
+        yield chunk
+
+    if key is not None:
+        await asyncio.to_thread(completion_cache.set, key, "".join(chunks))
+
+async def acached_completion(llm, messages) -> str:
+    """
+    Async variant of cached_completion: the LLM call goes through the gateway's
+    async path (concurrency limit, hedging) and the disk tier is accessed off the event loop
+    """
+    key = completion_key(llm, messages)
+    if key is not None:
+        cached = await asyncio.to_thread(completion_cache.get, key)
+        if cached is not None:
+            return cached
+
+    async def complete():
+        content = response_text(await llm_gateway.acomplete(llm, messages))
+        if key is not None:
+            await asyncio.to_thread(completion_cache.set, key, content)
+        return content
+
+    if not LLM_COALESCING_ENABLED:
+        return await complete()
+    content, shared = await inflight_completions.do(key or request_key(llm, messages), complete)
+    if shared:
+        metrics.increment("llm_cache.coalesced")
+    return content
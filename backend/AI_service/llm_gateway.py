@@ -0,0 +1,253 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+import httpx
+import openai
+from utils.metrics import metrics
+from utils.concurrency import dependency_slot
+from utils.rate_limit import TokenBucket, AdmissionRejected
+
+# One place for how every LLM call is made: pooled keep-alive connections, a per-call
+# timeout, jittered retries on transient errors and a hedged duplicate for slow calls
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+LLM_POOL_KEEPALIVE_SECONDS = float(os.getenv("LLM_POOL_KEEPALIVE_SECONDS", "60"))
+
+# Hedging starts once enough latencies are observed to estimate the p95
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+
+# Admission control sized to the provider's tokens-per-minute quota: bursts queue briefly
+# for tokens, and once the queue is full callers get an immediate AdmissionRejected (HTTP 429)
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_ADMISSION_QUEUE_MAX = int(os.getenv("LLM_ADMISSION_QUEUE_MAX", "64"))
+LLM_ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("LLM_ADMISSION_MAX_WAIT_SECONDS", "30"))
+LLM_DEFAULT_COMPLETION_TOKENS = 1024
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection failures, rate limits and server errors are worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS_CODES
+
+def retry_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, so concurrent retries don't arrive together"""
+    return random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+
+def estimate_request_tokens(llm, messages) -> int:
+    """Quota cost of a request: prompt tokens (about 4 characters each) plus the completion budget"""
+    prompt_tokens = sum(len(str(getattr(m, "content", m))) for m in messages) // 4
+    max_tokens = (getattr(llm, "model_kwargs", None) or {}).get("max_tokens") or LLM_DEFAULT_COMPLETION_TOKENS
+    return prompt_tokens + max_tokens
+
+class LLMGateway:
+    """Shared HTTP clients and call policy for every ChatOpenAI client in the backend"""
+
+    def __init__(self):
+        self.timeout = httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+        self.limits = httpx.Limits(
+            max_connections=LLM_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_POOL_MAX_CONNECTIONS,
+            keepalive_expiry=LLM_POOL_KEEPALIVE_SECONDS
+        )
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LLM_HEDGE_WINDOW)
+        self._http_client = None
+        self._async_http_client = None
+        self.token_bucket = TokenBucket(LLM_TOKENS_PER_MINUTE, LLM_ADMISSION_QUEUE_MAX, LLM_ADMISSION_MAX_WAIT_SECONDS)
+
+    @property
+    def http_client(self) -> httpx.Client:
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(timeout=self.timeout, limits=self.limits)
+            return self._http_client
+
+    @property
+    def async_http_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async_http_client is None:
+                self._async_http_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+            return self._async_http_client
+
+    def client_kwargs(self) -> dict:
+        """ChatOpenAI arguments that route its requests through the pooled clients; retries happen here"""
+        return {
+            "http_client": self.http_client,
+            "http_async_client": self.async_http_client,
+            "timeout": self.timeout,
+            "max_retries": 0
+        }
+
+    def observe_latency(self, latency: float):
+        metrics.observe("llm_gateway.latency", latency)
+        with self._lock:
+            self._latencies.append(latency)
+
+    def hedge_delay(self) -> float | None:
+        """Observed p95 latency, or None while hedging is disabled or there are too few samples"""
+        with self._lock:
+            if not LLM_HEDGE_ENABLED or len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def record_admission(self, wait: float):
+        if wait > 0:
+            metrics.increment("llm_gateway.admission_queued")
+            metrics.observe("llm_gateway.admission_wait", wait)
+
+    def complete(self, llm, messages):
+        """Invoke the LLM with retries and return the response message"""
+        cost = estimate_request_tokens(llm, messages)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self.record_admission(self.admit(cost))
+            metrics.increment("llm_gateway.calls")
+            started = time.perf_counter()
+            try:
+                response = llm.invoke(messages)
+                self.observe_latency(time.perf_counter() - started)
+                return response
+            except Exception as e:
+                if attempt == LLM_MAX_RETRIES or not is_retryable(e):
+                    metrics.increment("llm_gateway.failures")
+                    raise
+                delay = retry_delay(attempt)
+                print(f"[LLM Gateway] Retrying in {delay:.2f}s after {type(e).__name__}: {e}")
+                metrics.increment("llm_gateway.retries")
+                time.sleep(delay)
+
+    async def invoke_once(self, llm, messages):
+        async with dependency_slot("llm"):
+            metrics.increment("llm_gateway.calls")
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(llm.ainvoke(messages), LLM_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                metrics.increment("llm_gateway.timeouts")
+                raise
+            self.observe_latency(time.perf_counter() - started)
+            return response
+
+    async def hedged_invoke(self, llm, messages):
+        """
+        Send the request and, if it is still running after the observed p95 latency,
+        a duplicate; the first successful response wins and the other is cancelled
+        """
+        cost = estimate_request_tokens(llm, messages)
+        self.record_admission(await self.admit_async(cost))
+        tasks = [asyncio.create_task(self.invoke_once(llm, messages))]
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                # The duplicate only goes out if the quota has room for it right now
+                if not done and self.token_bucket.try_acquire(cost):
+                    metrics.increment("llm_gateway.hedges")
+                    tasks.append(asyncio.create_task(self.invoke_once(llm, messages)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            metrics.increment("llm_gateway.hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def acomplete(self, llm, messages):
+        """Async counterpart of complete, with hedging for slow calls"""
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                return await self.hedged_invoke(llm, messages)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                if attempt == LLM_MAX_RETRIES or not is_retryable(e):
+                    metrics.increment("llm_gateway.failures")
+                    raise
+                delay = retry_delay(attempt)
+                print(f"[LLM Gateway] Retrying in {delay:.2f}s after {type(e).__name__}: {e}")
+                metrics.increment("llm_gateway.retries")
+                await asyncio.sleep(delay)
+
+    async def astream(self, llm, messages):
+        """
+        Yield response text chunks as they arrive. Admission, the concurrency slot and
+        retries apply as in acomplete, but a call is only retried before its first chunk.
+        """
+        cost = estimate_request_tokens(llm, messages)
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self.record_admission(await self.admit_async(cost))
+            streamed = False
+            try:
+                async with dependency_slot("llm"):
+                    metrics.increment("llm_gateway.calls")
+                    started = time.perf_counter()
+                    stream = llm.astream(messages).__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(stream.__anext__(), LLM_TIMEOUT_SECONDS)
+                        except StopAsyncIteration:
+                            break
+                        if not streamed:
+                            streamed = True
+                            metrics.observe("llm_gateway.time_to_first_token", time.perf_counter() - started)
+                        yield str(getattr(chunk, "content", chunk))
+                    self.observe_latency(time.perf_counter() - started)
+                return
+            except Exception as e:
+                if streamed or attempt == LLM_MAX_RETRIES or not is_retryable(e):
+                    metrics.increment("llm_gateway.failures")
+                    raise
+                delay = retry_delay(attempt)
+                print(f"[LLM Gateway] Retrying stream in {delay:.2f}s after {type(e).__name__}: {e}")
+                metrics.increment("llm_gateway.retries")
+                await asyncio.sleep(delay)
+
+    def admit(self, cost: int) -> float:
+        try:
+            return self.token_bucket.acquire(cost)
+        except AdmissionRejected:
+            metrics.increment("llm_gateway.admission_rejected")
+            raise
+
+    async def admit_async(self, cost: int) -> float:
+        try:
+            return await self.token_bucket.acquire_async(cost)
+        except AdmissionRejected:
+            metrics.increment("llm_gateway.admission_rejected")
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+
+    async def aclose(self):
+        self.close()
+        with self._lock:
+            client, self._async_http_client = self._async_http_client, None
+        if client is not None:
+            await client.aclose()
+
+# Create a global instance
+llm_gateway = LLMGateway()
@@ -0,0 +1,126 @@
+import os
+import time
+import threading
+from langchain_openai import ChatOpenAI
+from pydantic import SecretStr
+from dotenv import load_dotenv
+from utils.metrics import metrics
+from AI_service.llm_gateway import llm_gateway
+from utils.rate_limit import AdmissionRejected
+
+# Load API Key from backend directory
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env"))
+openai_api_key = os.getenv("OPENAI_API_KEY")
+
+# Model tiers in escalation order: the fast tier handles every call first and the
+# strong tier only sees inputs whose fast-tier output failed lint or compile checks
+MODEL_TIERS = {
+    "fast": os.getenv("LLM_TIER_FAST", "gpt-4o-mini"),
+    "strong": os.getenv("LLM_TIER_STRONG", "gpt-4o"),
+}
+LLM_ESCALATION_ENABLED = os.getenv("LLM_ESCALATION_ENABLED", "true").lower() == "true"
+LLM_TIERS = ["fast", "strong"] if LLM_ESCALATION_ENABLED else ["fast"]
+
+# Deterministic passes (e.g. regex fixes) that callers can put before the LLM tiers
+RULE_TIER = "rules"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_llm(tier: str = "fast", temperature: float = 0.1, max_tokens: int | None = None) -> ChatOpenAI:
+    """Shared ChatOpenAI client for a model tier and sampling settings"""
+    if not openai_api_key:
+        raise ValueError("OPENAI_API_KEY not found in .env")
+    key = (tier, temperature, max_tokens)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = ChatOpenAI(
+                model=MODEL_TIERS[tier],
+                temperature=temperature,
+                api_key=SecretStr(openai_api_key),
+                model_kwargs={"max_tokens": max_tokens} if max_tokens else {},
+                **llm_gateway.client_kwargs()
+            )
+    return client
+
+def record_attempt(task: str, tier: str, latency: float, accepted: bool):
+    metrics.increment(f"router.{task}.{tier}.calls")
+    metrics.increment(f"router.{task}.{tier}.{'accepted' if accepted else 'rejected'}")
+    metrics.observe(f"router.{task}.{tier}.latency", latency)
+
+def finish_attempt(task: str, tiers: list, index: int, started: float, output=None, accepted: bool = False, error: Exception | None = None) -> bool:
+    """
+    The escalation policy shared by route and route_sync: record one tier's attempt
+    and return True if its output is final. A failure on the last tier is re-raised.
+    """
+    tier, last = tiers[index], index == len(tiers) - 1
+    record_attempt(task, tier, time.perf_counter() - started, accepted and error is None)
+    if error is not None:
+        if last:
+            raise error
+        print(f"[Model Router] {task} failed on {tier} tier: {error}")
+    elif accepted or (last and output is not None):
+        return True
+    if not last:
+        print(f"[Model Router] Escalating {task} from {tier} to {tiers[index + 1]}")
+        metrics.increment(f"router.{task}.escalations")
+    return False
+
+async def route(task: str, attempt, validate, tiers: list | None = None) -> tuple:
+    """
+    Await attempt(tier) for each tier in escalation order until validate(output)
+    passes, and return (output, tier). The last tier's output is returned even if
+    it fails validation, so callers keep today's behaviour on hard inputs.
+    """
+    tiers = tiers or LLM_TIERS
+    for index, tier in enumerate(tiers):
+        started = time.perf_counter()
+        try:
+            output = await attempt(tier)
+            accepted = output is not None and await validate(output)
+        except AdmissionRejected:
+            # Out of quota: a stronger tier would be rejected too
+            raise
+        except Exception as e:
+            finish_attempt(task, tiers, index, started, error=e)
+            continue
+        if finish_attempt(task, tiers, index, started, output, accepted):
+            return output, tier
+    return None, tiers[-1]
+
+def route_sync(task: str, attempt, validate, tiers: list | None = None) -> tuple:
+    """Synchronous counterpart of route, for callers that may already be inside an event loop"""
+    tiers = tiers or LLM_TIERS
+    for index, tier in enumerate(tiers):
+        started = time.perf_counter()
+        try:
+            output = attempt(tier)
+            accepted = output is not None and validate(output)
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            finish_attempt(task, tiers, index, started, error=e)
+            continue
+        if finish_attempt(task, tiers, index, started, output, accepted):
+            return output, tier
+    return None, tiers[-1]
+
+def routing_stats() -> dict:
+    """Per task and tier: calls, acceptance rate and average latency"""
+    snapshot = metrics.snapshot()
+    counters, timings = snapshot["counters"], snapshot["timings"]
+    stats = {}
+    for name, calls in counters.items():
+        parts = name.split(".")
+        if len(parts) != 4 or parts[0] != "router" or parts[3] != "calls":
+            continue
+        _, task, tier, _ = parts
+        accepted = counters.get(f"router.{task}.{tier}.accepted", 0)
+        stats.setdefault(task, {"escalations": counters.get(f"router.{task}.escalations", 0)})[tier] = {
+            "calls": calls,
+            "accepted": accepted,
+            "success_rate": accepted / calls if calls else 0.0,
+            "avg_latency": timings.get(f"router.{task}.{tier}.latency", {}).get("avg", 0.0)
+        }
+    return stats
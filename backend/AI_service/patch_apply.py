@@ -0,0 +1,81 @@
+import re
+
+# Anchored replacement blocks the LLM returns in patch mode
+EDIT_BLOCK_PATTERN = re.compile(
+    r'<<<<<<< SEARCH\n(.*?)\n?=======\n(.*?)\n?>>>>>>> REPLACE',
+    re.DOTALL
+)
+NO_CHANGES_MARKER = "NO_CHANGES"
+
+PATCH_FORMAT_INSTRUCTIONS = (
+    "Return ONLY targeted edits, never the whole contract. Use one block per edit in exactly this format:\n"
+    "<<<<<<< SEARCH\n"
+    "<lines copied verbatim from the original contract>\n"
+    "=======\n"
+    "<replacement lines>\n"
+    ">>>>>>> REPLACE\n"
+    "Each SEARCH section must match the original exactly once, so include enough surrounding lines to be unique. "
+    "To insert code, SEARCH for the neighbouring line and repeat it in the replacement. "
+    f"If the contract needs no changes, return only {NO_CHANGES_MARKER}."
+)
+
+class PatchApplyError(Exception):
+    """Raised when LLM edits cannot be applied cleanly to the original source"""
+
+def parse_edits(llm_output: str) -> list:
+    """
+    Parse SEARCH/REPLACE blocks from the LLM output into (search, replace) pairs
+    """
+    output = llm_output.replace("\r\n", "\n")
+    edits = [(search, replace) for search, replace in EDIT_BLOCK_PATTERN.findall(output)]
+    if not edits and output.strip().strip("`").strip() != NO_CHANGES_MARKER:
+        raise PatchApplyError("No edit blocks found in LLM output")
+    return edits
+
+def find_anchor(source: str, search: str) -> tuple:
+    """
+    Locate a SEARCH block in the source, first verbatim and then ignoring
+    trailing whitespace and indentation, and return its (start, end) span
+    """
+    start = source.find(search)
+    if start != -1:
+        if source.find(search, start + 1) != -1:
+            raise PatchApplyError(f"Edit anchor is ambiguous: {search.splitlines()[0]!r}")
+        return start, start + len(search)
+
+    source_lines = source.split("\n")
+    search_lines = [line.strip() for line in search.split("\n")]
+    matches = [
+        i for i in range(len(source_lines) - len(search_lines) + 1)
+        if [line.strip() for line in source_lines[i:i + len(search_lines)]] == search_lines
+    ]
+    if len(matches) != 1:
+        reason = "not found" if not matches else "ambiguous"
+        raise PatchApplyError(f"Edit anchor {reason}: {search.splitlines()[0]!r}")
+    first = matches[0]
+    start = sum(len(line) + 1 for line in source_lines[:first])
+    end = start + len("\n".join(source_lines[first:first + len(search_lines)]))
+    return start, end
+
+def apply_edits(source: str, edits: list) -> str:
+    """
+    Apply (search, replace) edits to the original source. Every anchor is
+    resolved against the original before anything is replaced, and overlapping
+    edits are rejected, so a patch either applies cleanly or not at all.
+    """
+    spans = []
+    for search, replace in edits:
+        if not search.strip():
+            raise PatchApplyError("Edit has an empty SEARCH section")
+        start, end = find_anchor(source, search)
+        spans.append((start, end, replace))
+
+    spans.sort()
+    for (_, previous_end, _), (start, _, _) in zip(spans, spans[1:]):
+        if start < previous_end:
+            raise PatchApplyError("Edits overlap")
+
+    patched = source
+    for start, end, replace in reversed(spans):
+        patched = patched[:start] + replace + patched[end:]
+    return patched
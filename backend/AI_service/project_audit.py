@@ -0,0 +1,91 @@
+import os
+import copy
+import asyncio
+from AI_service.audit_contract import lint_cache, lookup_cached, execute_solhint, compile_sources
+from AI_service.project_graph import (
+    normalize_project_path, build_import_graph, topological_levels,
+    dependency_closure, closure_hash
+)
+from utils.hashing import source_hash
+from utils.cache import LRUCache
+from utils.metrics import metrics
+
+# Per-file results: lint shares the single-contract lint_cache (keyed by the file's content
+# hash), compile is keyed by the hash of the file plus everything it imports, so an edit
+# only reprocesses the file and its dependents
+PROJECT_CACHE_TTL_SECONDS = float(os.getenv("PROJECT_CACHE_TTL_SECONDS", "3600"))
+PROJECT_CACHE_MAX_ENTRIES = int(os.getenv("PROJECT_CACHE_MAX_ENTRIES", "2048"))
+project_compile_cache = LRUCache(PROJECT_CACHE_MAX_ENTRIES, PROJECT_CACHE_TTL_SECONDS)
+
+def normalize_files(files: dict) -> dict:
+    normalized = {normalize_project_path(path): source for path, source in files.items()}
+    if len(normalized) != len(files):
+        raise ValueError("File paths must be unique after normalization")
+    return normalized
+
+async def lint_project_file(path: str, source: str) -> dict:
+    key = source_hash(source)
+    cached = lookup_cached(lint_cache, "lint_cache", key)
+    if cached is not None:
+        metrics.increment("project.lint_cached")
+        return {**cached, "cached": True}
+    metrics.increment("project.lint_runs")
+    lint = await execute_solhint(source)
+    if "error" not in lint:
+        lint_cache.set(key, copy.deepcopy(lint))
+    return {**lint, "cached": False}
+
+async def compile_project_file(path: str, files: dict, graph: dict, failed: set) -> dict:
+    key = closure_hash(files, graph, path)
+    cached = project_compile_cache.get(key)
+    if cached is not None:
+        metrics.increment("project.compile_cached")
+        return {**copy.deepcopy(cached), "cached": True}
+    closure = dependency_closure(graph, path)
+    broken = sorted(dep for dep in closure if dep in failed and dep != path)
+    if broken:
+        return {"success": False, "error": f"Skipped: imported files failed to compile: {', '.join(broken)}", "cached": False}
+    metrics.increment("project.compile_runs")
+    result = await compile_sources({dep: files[dep] for dep in closure}, path)
+    if result["success"] or result.get("error", "").startswith("Compilation failed"):
+        project_compile_cache.set(key, copy.deepcopy(result))
+    return {**result, "cached": False}
+
+async def audit_project(files: dict, lint: bool = True, compile: bool = True) -> dict:
+    """
+    Lint and/or compile every file of a {path: source} project in topological
+    import order. Files whose imports failed to compile are skipped.
+    """
+    files = normalize_files(files)
+    graph = build_import_graph(files)
+    levels, cyclic = topological_levels(graph)
+    order = [path for level in levels for path in level]
+    print(f"[Project Audit] {len(files)} files in {len(levels)} levels, {len(cyclic)} in import cycles")
+
+    report = {path: {"hash": source_hash(files[path]), "imports": graph[path]} for path in order}
+    if lint:
+        lint_results = await asyncio.gather(*(lint_project_file(path, files[path]) for path in order))
+        for path, result in zip(order, lint_results):
+            report[path]["lint"] = result
+
+    if compile:
+        failed = set()
+        for level in levels:
+            results = await asyncio.gather(*(compile_project_file(path, files, graph, failed) for path in level))
+            for path, result in zip(level, results):
+                report[path]["compile"] = result
+                if not result["success"]:
+                    failed.add(path)
+
+    stages = [stage for stage, enabled in (("lint", lint), ("compile", compile)) if enabled]
+    reprocessed = sorted(
+        path for path, entry in report.items()
+        if any(not entry[stage]["cached"] for stage in stages)
+    )
+    return {
+        "success": all(entry[stage].get("success") for entry in report.values() for stage in stages),
+        "order": order,
+        "cycles": cyclic,
+        "files": report,
+        "reprocessed": reprocessed
+    }
@@ -0,0 +1,73 @@
+import re
+import hashlib
+import posixpath
+from utils.hashing import source_hash
+
+# Import graph of a multi-file Solidity project given as {path: source}
+COMMENT_PATTERN = re.compile(r'//[^\n]*|/\*.*?(?:\*/|$)', re.DOTALL)
+IMPORT_PATTERN = re.compile(r'\bimport\s+(?:[^;"\']*?\bfrom\s+)?["\']([^"\']+)["\']')
+
+class ProjectError(ValueError):
+    """Raised for file maps that cannot be processed, e.g. paths escaping the project root"""
+
+def normalize_project_path(path: str) -> str:
+    normalized = posixpath.normpath(path.replace("\\", "/"))
+    if normalized.startswith("/") or normalized == ".." or normalized.startswith("../"):
+        raise ProjectError(f"File path must be relative to the project root: {path}")
+    return normalized
+
+def parse_imports(source: str) -> list:
+    return IMPORT_PATTERN.findall(COMMENT_PATTERN.sub("", source))
+
+def resolve_import(importer: str, import_path: str, files: dict) -> str | None:
+    """Project path an import refers to, or None for external imports such as @openzeppelin"""
+    if import_path.startswith("./") or import_path.startswith("../"):
+        candidate = posixpath.normpath(posixpath.join(posixpath.dirname(importer), import_path))
+    else:
+        candidate = posixpath.normpath(import_path)
+    return candidate if candidate in files else None
+
+def build_import_graph(files: dict) -> dict:
+    """Map each file to the project files it imports directly"""
+    return {
+        path: sorted({dep for dep in (resolve_import(path, imp, files) for imp in parse_imports(source)) if dep})
+        for path, source in files.items()
+    }
+
+def topological_levels(graph: dict) -> tuple:
+    """
+    Group files into levels where every file only depends on earlier levels.
+    Files in import cycles (which solc accepts) are placed together in a final
+    level. Returns (levels, cyclic_files).
+    """
+    remaining = {path: set(deps) - {path} for path, deps in graph.items()}
+    levels = []
+    while remaining:
+        ready = sorted(path for path, deps in remaining.items() if not deps)
+        if not ready:
+            break
+        levels.append(ready)
+        for path in ready:
+            del remaining[path]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    cyclic = sorted(remaining)
+    if cyclic:
+        levels.append(cyclic)
+    return levels, cyclic
+
+def dependency_closure(graph: dict, path: str) -> list:
+    """The file and every project file it imports, directly or transitively"""
+    seen, stack = set(), [path]
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        stack.extend(graph.get(current, []))
+    return sorted(seen)
+
+def closure_hash(files: dict, graph: dict, path: str) -> str:
+    """Changes whenever the file or anything it imports changes, so dependents get reprocessed"""
+    parts = [f"{dep}:{source_hash(files[dep])}" for dep in dependency_closure(graph, path)]
+    return hashlib.sha256("\n".join([path] + parts).encode("utf-8")).hexdigest()
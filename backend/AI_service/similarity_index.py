@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import random
+import hashlib
+import sqlite3
+import threading
+from AI_service.canonicalize import canonicalize_source
+
+# MinHash signatures over token shingles, bucketed with LSH banding.
+# 32 bands x 4 rows puts the candidate threshold around 0.4 Jaccard similarity.
+SHINGLE_SIZE = int(os.getenv("AUDIT_INDEX_SHINGLE_SIZE", "3"))
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+AUDIT_INDEX_PATH = os.getenv(
+    "AUDIT_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "audit_index.sqlite3")
+)
+AUDIT_INDEX_MAX_ENTRIES = int(os.getenv("AUDIT_INDEX_MAX_ENTRIES", "5000"))
+
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1043)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERMUTATIONS)]
+
+def shingle_token(token: str) -> str:
+    # Names and supplies live in literals; mask them so template variants stay close
+    if token.startswith('"'):
+        return "<str>"
+    if token[0].isdigit():
+        return "<num>"
+    return token
+
+def contract_shingles(contract_code: str) -> set:
+    """Hashed k-token shingles of the canonical source, with literals masked"""
+    tokens = [shingle_token(token) for token in canonicalize_source(contract_code).split()]
+    if len(tokens) < SHINGLE_SIZE:
+        tokens = tokens + [""] * (SHINGLE_SIZE - len(tokens))
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(tokens[i:i + SHINGLE_SIZE]).encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+
+def minhash_signature(shingles: set) -> list:
+    return [min((a * s + b) % MERSENNE_PRIME for s in shingles) for a, b in PERMUTATIONS]
+
+def estimate_similarity(signature_a: list, signature_b: list) -> float:
+    return sum(1 for x, y in zip(signature_a, signature_b) if x == y) / NUM_PERMUTATIONS
+
+def band_keys(signature: list) -> list:
+    return [
+        (band, hash(tuple(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])))
+        for band in range(LSH_BANDS)
+    ]
+
+class AuditSimilarityIndex:
+    """
+    Near-duplicate index over every audited contract. Records hold the prior
+    corrected code and findings and are persisted to SQLite so they survive restarts.
+    """
+
+    def __init__(self, path: str = AUDIT_INDEX_PATH, max_entries: int = AUDIT_INDEX_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = None
+        self._entries = {}  # fingerprint -> (signature, record, created_at)
+        self._buckets = {}  # (band, band_hash) -> set of fingerprints
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS audits ("
+                "fingerprint TEXT PRIMARY KEY, signature TEXT NOT NULL, record TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+            rows = self._conn.execute(
+                "SELECT fingerprint, signature, record, created_at FROM audits ORDER BY created_at DESC LIMIT ?", (self.max_entries,)
+            ).fetchall()
+            for fingerprint, signature, record, created_at in rows:
+                self._insert(fingerprint, json.loads(signature), json.loads(record), created_at)
+            print(f"[Audit Index] Loaded {len(rows)} prior audits")
+        return self._conn
+
+    def _insert(self, fingerprint: str, signature: list, record: dict, created_at: float):
+        self._entries[fingerprint] = (signature, record, created_at)
+        for key in band_keys(signature):
+            self._buckets.setdefault(key, set()).add(fingerprint)
+
+    def _remove(self, fingerprint: str):
+        signature, _, _ = self._entries.pop(fingerprint)
+        for key in band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.discard(fingerprint)
+                if not bucket:
+                    del self._buckets[key]
+
+    def add(self, fingerprint: str, contract_code: str, record: dict):
+        signature = minhash_signature(contract_shingles(contract_code))
+        created_at = time.time()
+        with self._lock:
+            conn = self._connect()
+            if fingerprint in self._entries:
+                self._remove(fingerprint)
+            self._insert(fingerprint, signature, record, created_at)
+            conn.execute(
+                "INSERT OR REPLACE INTO audits (fingerprint, signature, record, created_at) VALUES (?, ?, ?, ?)",
+                (fingerprint, json.dumps(signature), json.dumps(record), created_at)
+            )
+            # Evict the oldest audits above the size cap
+            stale = conn.execute(
+                "SELECT fingerprint FROM audits ORDER BY created_at DESC LIMIT -1 OFFSET ?", (self.max_entries,)
+            ).fetchall()
+            for (old_fingerprint,) in stale:
+                if old_fingerprint in self._entries:
+                    self._remove(old_fingerprint)
+                conn.execute("DELETE FROM audits WHERE fingerprint = ?", (old_fingerprint,))
+            conn.commit()
+
+    def get(self, fingerprint: str, max_age_seconds: float | None = None):
+        """The prior audit of exactly this canonical source, or None if there is none or it is older than max_age_seconds"""
+        with self._lock:
+            self._connect()
+            entry = self._entries.get(fingerprint)
+            if entry is None or (max_age_seconds and time.time() - entry[2] > max_age_seconds):
+                return None
+            return entry[1]
+
+    def nearest(self, contract_code: str, exclude: str | None = None):
+        """
+        Return the most similar prior audit as {"fingerprint", "similarity", "record"}, or None.
+        Similarity says nothing about whether the differing tokens matter (a dropped
+        onlyOwner scores ~1.0), so callers may only use the record as LLM context.
+        """
+        signature = minhash_signature(contract_shingles(contract_code))
+        with self._lock:
+            self._connect()
+            candidates = set()
+            for key in band_keys(signature):
+                candidates |= self._buckets.get(key, set())
+            candidates.discard(exclude)
+            best = None
+            for fingerprint in candidates:
+                prior_signature, record, _ = self._entries[fingerprint]
+                similarity = estimate_similarity(signature, prior_signature)
+                if best is None or similarity > best["similarity"]:
+                    best = {"fingerprint": fingerprint, "similarity": similarity, "record": record}
+            return best
+
+# Create a global instance
+audit_index = AuditSimilarityIndex()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dashboard-style polling of get_deployments through the read-through
+cache, with deployments saved in between. Runs against an in-memory Mongo
+stand-in (mongomock-motor) and checks that every read after a save sees it,
+so a missed invalidation fails the run instead of just skewing the numbers.
+(Only the full-list read: mongomock cannot evaluate the paging aggregation.)
+
+Requires: pip install mongomock-motor
+
+Usage: python benchmarks/bench_deployments_cache.py [--users 200] [--polls 20000] [--write-ratio 0.02]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mongomock_motor import AsyncMongoMockClient
+import utils.mongo
+from utils import deployment_store
+from utils.deployment_store import read_deployments, append_deployment, deployments_cache_stats
+
+async def run(users: int, polls: int, write_ratio: float, rng: random.Random, cached: bool) -> tuple:
+    deployment_store.DEPLOYMENTS_CACHE_ENABLED = cached
+    deployment_store.deployments_cache.clear()
+    expected = {f"user-{i}": 0 for i in range(users)}
+    start = time.perf_counter()
+    for poll in range(polls):
+        user_id = f"user-{rng.randrange(users)}"
+        if rng.random() < write_ratio:
+            expected[user_id] += 1
+            await append_deployment(user_id, {"contractName": "TestToken", "contractAddress": f"0x{poll:040x}"})
+            continue
+        deployments = await read_deployments(user_id)
+        if len(deployments) != expected[user_id]:
+            raise AssertionError(f"{user_id}: read {len(deployments)} deployments, expected {expected[user_id]}")
+    return time.perf_counter() - start, deployments_cache_stats()
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--polls", type=int, default=20000, help="reads and writes in total")
+    parser.add_argument("--write-ratio", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Fresh in-memory database per run so both runs start from the same state
+    for cached in (False, True):
+        client = AsyncMongoMockClient()
+        utils.mongo.get_async_mongo_client = lambda: client
+        before = deployments_cache_stats()
+        elapsed, stats = await run(args.users, args.polls, args.write_ratio, random.Random(args.seed), cached)
+        hits, misses = stats["hits"] - before["hits"], stats["misses"] - before["misses"]
+        ratio = hits / (hits + misses) if hits + misses else 0.0
+        print(
+            f"{'cached' if cached else 'uncached':<10}{elapsed:>8.2f}s  {args.polls / elapsed:>9.0f} ops/s  "
+            f"hit ratio {ratio:.1%}  invalidations {stats['invalidations'] - before['invalidations']}"
+        )
+    print("All reads reflected preceding writes")
+
+if __name__ == "__main__":
+    asyncio.run(main())
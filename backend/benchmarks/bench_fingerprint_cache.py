@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cache hit rate with exact-text keys vs canonical source fingerprints.
+
+Builds a corpus of resubmissions from the given .sol files (default: the Hardhat
+and Foundry sample contracts) by applying the trivial edits users make between
+submissions: whitespace, comments, SPDX line, quote style and import order.
+
+Usage: python benchmarks/bench_fingerprint_cache.py [--variants N] [file.sol ...]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import hashlib
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from AI_service.canonicalize import source_fingerprint
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CORPUS = [
+    os.path.join(REPO_ROOT, "contracts", "hardhat", "contracts", "Greeter.sol"),
+    os.path.join(REPO_ROOT, "contracts", "foundry", "src", "MyToken.sol"),
+]
+
+def mutate(source: str, rng: random.Random) -> str:
+    """Apply a random mix of edits that do not change the contract's meaning"""
+    if rng.random() < 0.5:
+        source = re.sub(r'// SPDX-License-Identifier: [^\n]*', "// SPDX-License-Identifier: " + rng.choice(["MIT", "UNLICENSED", "Apache-2.0"]), source)
+    if rng.random() < 0.5:
+        source = source.replace("    ", rng.choice(["  ", "\t", "        "]))
+    if rng.random() < 0.5:
+        source = source.replace("{\n", "{ // " + rng.choice(["todo", "fixed", "v2"]) + "\n", 1)
+    if rng.random() < 0.4:
+        source = re.sub(r'"([^"\n]*)"', r"'\1'", source, count=1)
+    if rng.random() < 0.4:
+        imports = re.findall(r'^import [^\n]*$', source, flags=re.MULTILINE)
+        if len(imports) > 1:
+            rng.shuffle(imports)
+            source = re.sub(r'(^import [^\n]*\n)+', "\n".join(imports) + "\n", source, flags=re.MULTILINE)
+    if rng.random() < 0.5:
+        source = source.rstrip() + "\n" * rng.randint(0, 3)
+    return source
+
+def hit_rate(submissions: list, key_fn) -> tuple:
+    seen, hits = set(), 0
+    start = time.perf_counter()
+    for source in submissions:
+        key = key_fn(source)
+        if key in seen:
+            hits += 1
+        seen.add(key)
+    return hits / len(submissions), len(seen), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", default=DEFAULT_CORPUS)
+    parser.add_argument("--variants", type=int, default=50, help="resubmissions generated per contract")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    submissions = []
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        submissions.append(source)
+        submissions.extend(mutate(source, rng) for _ in range(args.variants))
+    rng.shuffle(submissions)
+
+    exact = hit_rate(submissions, lambda s: hashlib.sha256(s.encode("utf-8")).hexdigest())
+    canonical = hit_rate(submissions, source_fingerprint)
+
+    print(f"Corpus: {len(args.files)} contracts, {len(submissions)} submissions")
+    print(f"{'key':<14}{'hit rate':>10}{'distinct':>10}{'time (ms)':>12}")
+    for name, (rate, distinct, elapsed) in (("exact text", exact), ("fingerprint", canonical)):
+        print(f"{name:<14}{rate:>10.1%}{distinct:>10}{elapsed * 1000:>12.2f}")
+    print(f"Hit rate improvement: {(canonical[0] - exact[0]) * 100:+.1f} points")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: chat/deployment write latency as the collection grows, comparing the
+old find_one + update_one/insert_one on an unindexed user_id with a single
+$push upsert backed by the unique user_id index.
+
+Runs against a scratch database on MONGO_URI (dropped afterwards).
+
+Usage: python benchmarks/bench_mongo_writes.py [--sizes 1000 10000 50000] [--writes 500]
+"""
+
+import os
+import time
+import random
+import argparse
+from pymongo import MongoClient, ASCENDING
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def old_write(collection, user_id: str, message: dict):
+    existing = collection.find_one({"user_id": user_id})
+    if existing:
+        collection.update_one({"user_id": user_id}, {"$push": {"chat_history": {"$each": [message]}}})
+    else:
+        collection.insert_one({"user_id": user_id, "chat_history": [message]})
+
+def upsert_write(collection, user_id: str, message: dict):
+    collection.update_one({"user_id": user_id}, {"$push": {"chat_history": {"$each": [message]}}}, upsert=True)
+
+def fill(collection, size: int):
+    """Grow the collection to size user documents with a few messages each"""
+    batch = []
+    for i in range(collection.count_documents({"user_id": {"$regex": "^user-"}}), size):
+        batch.append({"user_id": f"user-{i}", "chat_history": [{"sender": "user", "text": "hello"}] * 3})
+        if len(batch) == 1000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+def measure(collection, write, size: int, writes: int, rng: random.Random) -> list:
+    latencies = []
+    for _ in range(writes):
+        # Mostly existing users, some first-time writers
+        user_id = f"user-{rng.randrange(size)}" if rng.random() < 0.9 else f"new-{rng.random()}"
+        start = time.perf_counter()
+        write(collection, user_id, {"sender": "user", "text": "benchmark"})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017/"))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--writes", type=int, default=500, help="timed writes per size and strategy")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    db = client[f"metadag_bench_{os.getpid()}"]
+    old, new = db["chat_old"], db["chat_upsert"]
+    new.create_index([("user_id", ASCENDING)], unique=True)
+    rng = random.Random(args.seed)
+
+    print(f"{'users':>8}  {'strategy':<22}{'mean (ms)':>10}{'p50':>8}{'p95':>8}{'p99':>8}")
+    try:
+        for size in sorted(args.sizes):
+            fill(old, size)
+            fill(new, size)
+            for name, collection, write in (("find + update/insert", old, old_write), ("upsert + index", new, upsert_write)):
+                latencies = measure(collection, write, size, args.writes, rng)
+                print(
+                    f"{size:>8}  {name:<22}{sum(latencies) / len(latencies):>10.2f}"
+                    f"{percentile(latencies, 0.5):>8.2f}{percentile(latencies, 0.95):>8.2f}{percentile(latencies, 0.99):>8.2f}"
+                )
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+if __name__ == "__main__":
+    main()
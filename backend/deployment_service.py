@@ -158,13 +158,18 @@ class ContractDeploymentService:
             compile_result = self.compile_contract(contract_name)
             # If compilation failed, try to autofix with LLM and recompile
             if not compile_result["success"]:
-                # Attempt to autofix using LLM
-                fixed_code = llm_autofix_solidity(contract_code, compile_result.get("error", ""))
+                # Attempt to autofix using LLM, escalating while the fix doesn't compile
+                attempts = {}
+                def compiles(code):
+                    self.save_contract_to_file(code, contract_name)
+                    attempts[code] = self.compile_contract(contract_name)
+                    return attempts[code]["success"]
+                fixed_code = llm_autofix_solidity(contract_code, compile_result.get("error", ""), validate=compiles)
                 if fixed_code and fixed_code != contract_code:
                     # Save the fixed contract to file
                     contract_file = self.save_contract_to_file(fixed_code, contract_name)
-                    # Try to recompile with the fixed code
-                    compile_result = self.compile_contract(contract_name)
+                    # Reuse the validation compile of the fixed code when there was one
+                    compile_result = attempts.get(fixed_code) or self.compile_contract(contract_name)
                     if not compile_result["success"]:
                         return compile_result["error"]
                     contract_code = fixed_code  # Use the fixed code for deployment
@@ -241,7 +246,11 @@ main()
                         "network": json_output["network"],
                         "contractName": json_output["contractName"],
                         "transactionHash": "N/A",  # Could be extracted from deployment logs
-                        "explorerUrl": f"https://primordial.bdagscan.com/address/{json_output['contractAddress']}"
+                        "explorerUrl": f"https://primordial.bdagscan.com/address/{json_output['contractAddress']}",
+                        # Compiled artifact of the code actually deployed, persisted by the /deploy route
+                        "abi": compile_result.get("abi", []),
+                        "bytecode": compile_result.get("bytecode", ""),
+                        "code": contract_code
                     }
                 else:
                     return {
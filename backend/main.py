@@ -1,8 +1,17 @@
+import asyncio
 from fastapi import FastAPI
 from routes_chat import router as chat_router
 from routes_contract import router as contract_router
 from routes_audit import router as audit_router
 from fastapi.middleware.cors import CORSMiddleware
+from utils.metrics import metrics
+from AI_service.model_router import routing_stats
+from AI_service.llm_gateway import llm_gateway
+from utils.mongo import close_mongo_clients, ensure_indexes
+from utils.chat_buffer import chat_buffer
+from utils.deployment_store import deployments_cache_stats, backfill_legacy_deployments
+from utils.concurrency import foreground_activity
+from AI_service.chat_compaction import chat_compactor
 
 app = FastAPI()
 
@@ -14,10 +23,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def track_foreground_requests(request, call_next):
+    # Background workers (chat compaction) back off while requests are in flight
+    async with foreground_activity.track():
+        return await call_next(request)
+
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "MetaDAG backend is running!"}
 
+@app.get("/metrics")
+def read_metrics():
+    return {**metrics.snapshot(), "routing": routing_stats(), "deployments_cache": deployments_cache_stats()}
+
+async def prepare_database():
+    """Create indexes, then move legacy per-user deployment arrays into deployment_records"""
+    try:
+        await ensure_indexes()
+        await backfill_legacy_deployments()
+    except Exception as e:
+        print(f"[Startup] Database preparation failed: {e}")
+        metrics.increment("startup.database_failures")
+
+@app.on_event("startup")
+async def start_background_work():
+    # In the background so an unreachable Mongo (5s timeout per index) doesn't hold
+    # up serving; routes that need Mongo fail on their own until it is back
+    app.state.database_preparation = asyncio.create_task(prepare_database())
+    chat_compactor.start()
+
+@app.on_event("shutdown")
+async def stop_chat_compactor():
+    await chat_compactor.stop()
+
+@app.on_event("shutdown")
+async def stop_database_preparation():
+    app.state.database_preparation.cancel()
+    await asyncio.gather(app.state.database_preparation, return_exceptions=True)
+
+@app.on_event("shutdown")
+async def close_llm_gateway():
+    await llm_gateway.aclose()
+
+@app.on_event("shutdown")
+async def flush_chat_buffer():
+    await chat_buffer.close()
+
+@app.on_event("shutdown")
+def close_mongo():
+    close_mongo_clients()
+
 app.include_router(chat_router)
 app.include_router(contract_router)
 app.include_router(audit_router) 
\ No newline at end of file
@@ -1,16 +1,27 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from typing import Literal
 import sys
 import os
+import json
+import asyncio
 from datetime import datetime, timezone
 sys.path.append(os.path.join(os.path.dirname(__file__), 'AI_service'))
-from AI_service.audit_contract import audit_and_fix_contract, validate_contract_structure, run_solhint_audit
+from AI_service.audit_contract import audit_and_fix_contract, incremental_audit_and_fix_contract, validate_contract_structure, run_solhint_audit, AUDIT_FIX_MODE
+from utils.hashing import source_hash
+from AI_service.project_audit import audit_project
+from utils.concurrency import request_limits
+from utils.rate_limit import AdmissionRejected
 
 router = APIRouter()
 
 class ContractAuditRequest(BaseModel):
     contract_code: str
     description: str = ""
+    force_llm: bool = False  # Always run the full LLM pass, even for clean contracts
+    fix_mode: Literal["patch", "full", "chunked"] | None = None  # Defaults to AUDIT_FIX_MODE
+    session_id: str | None = None  # Re-audit only what changed since this session's previous audit
 
 @router.get("/test")
 async def test_endpoint():
@@ -31,6 +42,24 @@ async def test_audit_endpoint(req: ContractAuditRequest):
         "contract_code_preview": req.contract_code[:100] + "..." if len(req.contract_code) > 100 else req.contract_code
     }
 
+BATCH_MAX_CONTRACTS = int(os.getenv("BATCH_MAX_CONTRACTS", "200"))
+
+class BatchContract(BaseModel):
+    id: str | None = None
+    contract_code: str
+
+class BatchAuditRequest(BaseModel):
+    contracts: list[BatchContract]
+    force_llm: bool = False
+    fix_mode: Literal["patch", "full", "chunked"] | None = None
+    # Per-stage parallelism for this batch, on top of the worker-wide dependency limits
+    lint_concurrency: int = int(os.getenv("BATCH_LINT_CONCURRENCY", "4"))
+    llm_concurrency: int = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+    compile_concurrency: int = int(os.getenv("BATCH_COMPILE_CONCURRENCY", "2"))
+
+class ProjectRequest(BaseModel):
+    files: dict[str, str]  # Project-relative path -> Solidity source
+
 class AuditResponse(BaseModel):
     success: bool
     original_code: str
@@ -41,6 +70,14 @@ class AuditResponse(BaseModel):
     remaining_issues: int
     validation: dict
     improvements: dict | None = None
+    fast_path: bool = False
+    fix_mode: str | None = None
+    model_tier: str | None = None  # Model tier whose fix was accepted
+    cached: bool = False
+    reused_from: str | None = None  # Fingerprint of the near-duplicate audit used, if any
+    similarity: float | None = None
+    incremental: dict | None = None
+    message: str | None = None
     error: str | None = None
 
 @router.post("/audit")
@@ -59,7 +96,19 @@ async def audit_contract(req: ContractAuditRequest):
         print(f"[DEBUG] Validation result: {validation}")
         
         # Perform audit and fix
-        audit_result = audit_and_fix_contract(req.contract_code)
+        if req.session_id:
+            audit_result = await incremental_audit_and_fix_contract(
+                req.session_id,
+                req.contract_code,
+                force_llm=req.force_llm,
+                fix_mode=req.fix_mode or AUDIT_FIX_MODE
+            )
+        else:
+            audit_result = await audit_and_fix_contract(
+                req.contract_code,
+                force_llm=req.force_llm,
+                fix_mode=req.fix_mode or AUDIT_FIX_MODE
+            )
         print(f"[DEBUG] Audit result keys: {audit_result.keys()}")
         
         # Add validation to the response
@@ -74,10 +123,101 @@ async def audit_contract(req: ContractAuditRequest):
         
         return AuditResponse(**audit_result)
         
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
     except Exception as e:
         print(f"[DEBUG] Error in audit_contract: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Audit failed: {str(e)}")
 
+@router.post("/audit/batch")
+async def audit_contract_batch(req: BatchAuditRequest):
+    """
+    Audit many contracts with bounded parallelism, streaming one NDJSON line per
+    contract as it finishes. Identical contracts in the batch are audited once.
+    """
+    if not req.contracts:
+        raise HTTPException(status_code=400, detail="contracts must not be empty")
+    if len(req.contracts) > BATCH_MAX_CONTRACTS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_CONTRACTS} contracts per batch")
+    if min(req.lint_concurrency, req.llm_concurrency, req.compile_concurrency) < 1:
+        raise HTTPException(status_code=400, detail="Concurrency limits must be at least 1")
+
+    # Dedupe on the exact text, keeping every submitted id for the result: copies that only
+    # differ in formatting still get their own corrected code and lint line numbers
+    groups = {}
+    for index, contract in enumerate(req.contracts):
+        groups.setdefault(source_hash(contract.contract_code), []).append((index, contract))
+
+    async def audit_group(digest: str):
+        _, first = groups[digest][0]
+        try:
+            result = await audit_and_fix_contract(
+                first.contract_code,
+                force_llm=req.force_llm,
+                fix_mode=req.fix_mode or AUDIT_FIX_MODE
+            )
+        except Exception as e:
+            print(f"[DEBUG] Batch audit failed: {str(e)}")
+            result = {"success": False, "error": f"Audit failed: {str(e)}"}
+        return digest, result
+
+    async def stream_results():
+        request_limits.set({
+            "solhint": asyncio.Semaphore(req.lint_concurrency),
+            "llm": asyncio.Semaphore(req.llm_concurrency),
+            "solc": asyncio.Semaphore(req.compile_concurrency),
+        })
+        tasks = [asyncio.create_task(audit_group(digest)) for digest in groups]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                digest, result = await finished
+                members = groups[digest]
+                for index, contract in members:
+                    line = {
+                        **result,
+                        "id": contract.id,
+                        "index": index,
+                        "original_code": contract.contract_code,
+                        "validation": validate_contract_structure(contract.contract_code),
+                        "duplicate_of": members[0][0] if index != members[0][0] else None  # Index of the audited copy
+                    }
+                    yield json.dumps(line, default=str) + "\n"
+        finally:
+            # Stop outstanding audits if the client goes away
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@router.post("/audit/project")
+async def audit_project_endpoint(req: ProjectRequest):
+    """
+    Lint and compile a multi-file project in import order, reusing per-file results
+    for files that (with their imports) haven't changed
+    """
+    if not req.files:
+        raise HTTPException(status_code=400, detail="files must not be empty")
+    try:
+        return await audit_project(req.files)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Project audit failed: {str(e)}")
+
+@router.post("/compile/project")
+async def compile_project_endpoint(req: ProjectRequest):
+    """
+    Compile a multi-file project in import order without linting
+    """
+    if not req.files:
+        raise HTTPException(status_code=400, detail="files must not be empty")
+    try:
+        return await audit_project(req.files, lint=False)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Project compile failed: {str(e)}")
+
 @router.post("/validate")
 async def validate_contract(req: ContractAuditRequest):
     """
@@ -98,7 +238,7 @@ async def solhint_audit(req: ContractAuditRequest):
     Run only solhint audit without LLM fixes
     """
     try:
-        audit_result = run_solhint_audit(req.contract_code)
+        audit_result = await run_solhint_audit(req.contract_code)
         return {
             "success": True,
             "audit_result": audit_result
@@ -1,17 +1,27 @@
 import re
+import json
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
 import sys
 import os
 from datetime import datetime, timezone
 sys.path.append(os.path.join(os.path.dirname(__file__), 'AI_service'))
-from AI_service.generate_contract import generate_contract as ai_generate_contract
+from AI_service.generate_contract import agenerate_contract, stream_generate_contract
 from deployment_service import deployment_service
-from utils.mongo import get_chat_collection
-from utils.mongo import get_deployment_collection
+from utils.chat_store import read_messages, read_message_page, read_summary, oldest_hot_bucket
+from utils.chat_buffer import chat_buffer
+from utils.deployment_store import read_deployment_page, read_deployments, append_deployment, find_deployment_page, deployment_query, decode_position
+from utils.pagination import encode_cursor, decode_cursor, parse_fields, check_limit, PAGE_DEFAULT_LIMIT
+from utils.rate_limit import AdmissionRejected
+from utils.artifact_store import save_artifact, get_abi
+from utils.metrics import metrics
 
 router = APIRouter()
 
+ADDRESS_PATTERN = re.compile(r'^0x[0-9a-fA-F]{40}$')
+ABI_CACHE_MAX_AGE_SECONDS = int(os.getenv("ABI_CACHE_MAX_AGE_SECONDS", "3600"))
+
 class GenerateRequest(BaseModel):
     prompt: str
 
@@ -30,8 +40,54 @@ async def generate_contract(req: GenerateRequest):
     if '|' not in req.prompt:
         return {"error": "Prompt must be in the format '<contract_type>|<features>'"}
     contract_type, features = map(str.strip, req.prompt.split('|', 1))
-    contract = ai_generate_contract(contract_type, features)
-    return {"contract": contract}
+    try:
+        result = await agenerate_contract(contract_type, features)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+    # Template renders also carry the template name and the compiled ABI and bytecode
+    return {key: value for key, value in result.items() if key in ("contract", "template", "features", "artifact")}
+
+def sse_event(event: str, data) -> str:
+    # JSON-encode the payload so newlines in code don't break the SSE framing
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/generate/stream")
+async def generate_contract_stream(req: GenerateRequest):
+    """
+    Stream generation as server-sent events: "code" and "explanation" deltas while
+    the LLM writes, then "done" with the full code and explanation
+    """
+    if '|' not in req.prompt:
+        raise HTTPException(status_code=400, detail="Prompt must be in the format '<contract_type>|<features>'")
+    contract_type, features = map(str.strip, req.prompt.split('|', 1))
+    events = stream_generate_contract(contract_type, features)
+    # Start the stream before responding, so quota rejections still become a 429
+    try:
+        first = await events.__anext__()
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(int(e.retry_after) + 1)})
+    except StopAsyncIteration:
+        first = None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generating contract: {str(e)}")
+
+    async def stream_events():
+        try:
+            if first is not None:
+                yield sse_event(*first)
+            async for event in events:
+                yield sse_event(*event)
+        except Exception as e:
+            print(f"[Generate Stream] Error during generation: {e}")
+            yield sse_event("error", str(e))
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/deploy")
 async def deploy_contract(req: DeployRequest):
@@ -48,7 +104,7 @@ async def deploy_contract(req: DeployRequest):
         deployment_result = deployment_service.deploy_contract(req.code, contract_name)
         
         if deployment_result["success"]:
-            return {
+            response = {
                 "success": True,
                 "message": "Contract deployed successfully",
                 "contractAddress": deployment_result["contractAddress"],
@@ -56,6 +112,9 @@ async def deploy_contract(req: DeployRequest):
                 "contractName": deployment_result["contractName"],
                 "explorerUrl": deployment_result["explorerUrl"]
             }
+            if await persist_artifact(deployment_result):
+                response["abiUrl"] = f"/contracts/{deployment_result['contractAddress']}/abi"
+            return response
         else:
             raise HTTPException(
                 status_code=500, 
@@ -84,31 +143,10 @@ async def save_chat_history(request: Request):
         if "timestamp" not in msg:
             msg["timestamp"] = datetime.now(timezone.utc).isoformat()
 
-    collection = get_chat_collection()
-    existing = collection.find_one({"user_id": user_id})
-
-    if existing:
-        # Append to existing chat_history
-        result = collection.update_one(
-            {"user_id": user_id},
-            {"$push": {"chat_history": {"$each": chat_history}}}
-        )
-        return {
-            "success": True,
-            "action": "appended",
-            "matched_count": result.matched_count,
-            "modified_count": result.modified_count
-        }
-    else:
-        # Create new document
-        result = collection.insert_one(
-            {"user_id": user_id, "chat_history": chat_history}
-        )
-        return {
-            "success": True,
-            "action": "created",
-            "inserted_id": str(result.inserted_id)
-        }
+    # Buffered for a few ms and written with other users' saves in one bulk_write;
+    # see utils/chat_buffer.py
+    result = await chat_buffer.add(user_id, chat_history)
+    return {"success": True, "action": "buffered" if result["buffered"] else "appended", "appended": result["appended"]}
 
 @router.post("/save_deployment")
 async def save_deployment(request: Request):
@@ -121,46 +159,138 @@ async def save_deployment(request: Request):
 
     deployment["timestamp"] = deployment.get("timestamp") or datetime.now(timezone.utc).isoformat()
 
-    collection = get_deployment_collection()
-    existing = collection.find_one({"user_id": user_id})
+    result = await append_deployment(user_id, deployment)
+    return {"success": True, "action": "created", "inserted_id": str(result.inserted_id)}
 
-    if existing:
-        # Append to existing deployments array
-        result = collection.update_one(
-            {"user_id": user_id},
-            {"$push": {"deployments": deployment}}
-        )
-        return {
-            "success": True,
-            "action": "appended",
-            "matched_count": result.matched_count,
-            "modified_count": result.modified_count
-        }
-    else:
-        # Create new document
-        result = collection.insert_one(
-            {"user_id": user_id, "deployments": [deployment]}
-        )
+@router.get("/get_chat_history/{user_id}")
+async def get_chat_history(user_id: str, limit: int | None = None, cursor: str | None = None, fields: str | None = None):
+    """
+    Without paging parameters, the full hot history oldest first (plus the
+    rolling summary and an archive_cursor once older messages were compacted).
+    With limit and/or cursor, one page newest first plus next_cursor (None on
+    the last page), reaching into archived messages too.
+    """
+    if chat_buffer.has_pending(user_id):
+        # Read your own writes: don't serve a history missing the user's buffered saves
+        await chat_buffer.flush()
+    if limit is not None or cursor is not None:
+        try:
+            position = decode_cursor(cursor) if cursor else None
+            before = (int(position["bucket"]), int(position["index"])) if position else None
+            messages, next_before = await read_message_page(
+                user_id, check_limit(limit or PAGE_DEFAULT_LIMIT), before, parse_fields(fields)
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e) or "Invalid cursor")
+        next_cursor = encode_cursor({"bucket": next_before[0], "index": next_before[1]}) if next_before else None
+        return {"success": True, "chat_history": messages, "next_cursor": next_cursor}
+    chat_history = await read_messages(user_id)
+    summary = await read_summary(user_id)
+    if summary:
+        # Older messages were compacted: the hot tail plus the rolling summary, and
+        # archive_cursor to page back through the archived messages from the oldest hot one
+        oldest = await oldest_hot_bucket(user_id)
         return {
             "success": True,
-            "action": "created",
-            "inserted_id": str(result.inserted_id)
+            "chat_history": chat_history,
+            "summary": summary["summary"],
+            "archived_messages": summary.get("archived_messages", 0),
+            "archive_cursor": encode_cursor({"bucket": oldest if oldest is not None else summary["summarized_through"] + 1, "index": 0})
         }
-
-@router.get("/get_chat_history/{user_id}")
-async def get_chat_history(user_id: str):
-    collection = get_chat_collection()
-    doc = collection.find_one({"user_id": user_id})
-    if doc:
-        return {"success": True, "chat_history": doc.get("chat_history", [])}
+    if chat_history:
+        return {"success": True, "chat_history": chat_history}
     else:
         return {"success": False, "error": "No chat history found"} 
 
 @router.get("/get_deployments/{user_id}")
-async def get_deployments(user_id: str):
-    collection = get_deployment_collection()
-    doc = collection.find_one({"user_id": user_id})
-    if doc and "deployments" in doc:
-        return {"success": True, "deployments": doc["deployments"]}
-    else:
-        return {"success": True, "deployments": []} 
\ No newline at end of file
+async def get_deployments(user_id: str, limit: int | None = None, cursor: str | None = None, fields: str | None = None):
+    """
+    Without paging parameters, every deployment oldest first. With limit and/or
+    cursor, one page newest first plus next_cursor (None on the last page).
+    """
+    if limit is not None or cursor is not None:
+        try:
+            before = decode_position(decode_cursor(cursor)) if cursor else None
+            deployments, next_position = await read_deployment_page(
+                user_id, check_limit(limit or PAGE_DEFAULT_LIMIT), before, parse_fields(fields)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        next_cursor = encode_cursor(next_position) if next_position else None
+        return {"success": True, "deployments": deployments, "next_cursor": next_cursor}
+    return {"success": True, "deployments": await read_deployments(user_id)}
+
+async def persist_artifact(deployment_result: dict) -> bool:
+    """Keep the deployed contract's ABI and bytecode; a storage failure must not fail the deploy"""
+    try:
+        await save_artifact(
+            deployment_result["contractAddress"], deployment_result["network"], deployment_result["contractName"],
+            deployment_result.get("abi", []), deployment_result.get("bytecode", ""), deployment_result.get("code", "")
+        )
+        return True
+    except Exception as e:
+        # Best effort: the contract is already on chain, so any storage or encoding error only loses the artifact
+        print(f"[Deploy] Could not store artifact for {deployment_result['contractAddress']}: {e}")
+        metrics.increment("artifacts.save_failures")
+        return False
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match comparison: weak (W/"...") and strong tags compare equal, "*" matches anything"""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+@router.get("/contracts/{contract_address}/abi")
+async def get_contract_abi(contract_address: str, request: Request):
+    """
+    ABI of a contract deployed through /deploy. The ETag is the ABI's content
+    hash, so clients revalidate with If-None-Match and get a bodyless 304.
+    """
+    if not ADDRESS_PATTERN.match(contract_address):
+        raise HTTPException(status_code=400, detail="Invalid contract address")
+    found = await get_abi(contract_address)
+    if found is None:
+        raise HTTPException(status_code=404, detail="No ABI recorded for this address")
+    abi, abi_hash = found
+    etag = f'"{abi_hash}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={ABI_CACHE_MAX_AGE_SECONDS}"}
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        metrics.increment("artifacts.abi_not_modified")
+        return Response(status_code=304, headers=headers)
+    metrics.increment("artifacts.abi_served")
+    return Response(content=abi, media_type="application/json", headers=headers)
+
+def parse_time_param(name: str, value: str | None) -> datetime | None:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO 8601 timestamp")
+
+@router.get("/deployments/address/{contract_address}")
+async def get_deployments_by_address(contract_address: str, limit: int | None = None, cursor: str | None = None):
+    """Who deployed this address (case-insensitive), newest first"""
+    return await search_deployments(contract_address=contract_address, limit=limit, cursor=cursor)
+
+@router.get("/deployments")
+async def search_deployments(contract_address: str | None = None, contract_name: str | None = None, network: str | None = None,
+                             since: str | None = None, until: str | None = None,
+                             limit: int | None = None, cursor: str | None = None, fields: str | None = None):
+    """
+    Deployments across all users, newest first, filtered by any of contract
+    address, contract name, network and a [since, until) time range. Each filter
+    is served by an index on deployment_records; page with next_cursor.
+    """
+    query = deployment_query(
+        contract_address, contract_name, network,
+        parse_time_param("since", since), parse_time_param("until", until)
+    )
+    try:
+        before = decode_position(decode_cursor(cursor)) if cursor else None
+        deployments, next_position = await find_deployment_page(
+            query, check_limit(limit or PAGE_DEFAULT_LIMIT), before, parse_fields(fields), with_owner=True
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    next_cursor = encode_cursor(next_position) if next_position else None
+    return {"success": True, "deployments": deployments, "next_cursor": next_cursor}
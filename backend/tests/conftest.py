@@ -0,0 +1,17 @@
+import os
+import sys
+import pytest
+
+# Tests import backend modules the same way main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# audit_contract refuses to import without a key; no test calls the API
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """In-memory Mongo stand-in behind utils.mongo.get_async_mongo_client"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import utils.mongo
+    client = mongomock_motor.AsyncMongoMockClient()
+    monkeypatch.setattr(utils.mongo, "get_async_mongo_client", lambda: client)
+    return client
@@ -0,0 +1,39 @@
+from AI_service.canonicalize import canonicalize_source, source_fingerprint
+
+CONTRACT = '''// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+import "@openzeppelin/contracts/access/Ownable.sol";
+
+contract Token is ERC20, Ownable {
+    // Mint the initial supply
+    constructor() ERC20("Token", "TKN") Ownable(msg.sender) {
+        _mint(msg.sender, 1000);
+    }
+}
+'''
+
+def test_formatting_comments_and_quotes_do_not_change_the_fingerprint():
+    reformatted = (
+        "pragma solidity ^0.8.20;\n"
+        "import '@openzeppelin/contracts/access/Ownable.sol';\n"
+        "import '@openzeppelin/contracts/token/ERC20/ERC20.sol';\n"
+        "/* no license */ contract Token is ERC20, Ownable { constructor() ERC20('Token', 'TKN') Ownable(msg.sender) "
+        "{ _mint(msg.sender, 1000); } }"
+    )
+    assert source_fingerprint(reformatted) == source_fingerprint(CONTRACT)
+
+def test_code_changes_change_the_fingerprint():
+    assert source_fingerprint(CONTRACT.replace("1000", "1001")) != source_fingerprint(CONTRACT)
+    assert source_fingerprint(CONTRACT.replace('"TKN"', '"TKX"')) != source_fingerprint(CONTRACT)
+
+def test_pragma_stays_ahead_of_sorted_imports():
+    lines = canonicalize_source(CONTRACT).split("\n")
+    assert lines[0] == "pragma solidity ^ 0 . 8 . 20 ;"
+    assert lines[1:3] == sorted(lines[1:3])
+    assert all(line.startswith("import") for line in lines[1:3])
+
+def test_comment_markers_inside_strings_are_kept():
+    with_url = CONTRACT.replace('"Token"', '"https://example.com/token"')
+    assert "https://example.com/token" in canonicalize_source(with_url)
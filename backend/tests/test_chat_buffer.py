@@ -0,0 +1,81 @@
+import asyncio
+from utils import chat_buffer as chat_buffer_module
+from utils.chat_buffer import ChatWriteBuffer
+
+class FakeStore:
+    """append_batch stand-in that records batches and can fail or block on demand"""
+
+    def __init__(self):
+        self.batches = []
+        self.failures = 0
+        self.gate = None
+
+    async def append_batch(self, batch: dict) -> dict:
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database unavailable")
+        self.batches.append({user_id: list(messages) for user_id, messages in batch.items()})
+        return {"appended": sum(len(m) for m in batch.values()), "fallback_users": 0}
+
+def make_buffer(monkeypatch, **kwargs) -> tuple:
+    store = FakeStore()
+    monkeypatch.setattr(chat_buffer_module, "append_batch", store.append_batch)
+    return ChatWriteBuffer(kwargs.get("flush_interval", 10), kwargs.get("max_messages", 100)), store
+
+def message(text: str) -> dict:
+    return {"sender": "user", "text": text}
+
+def test_messages_from_many_users_are_written_in_one_batch(monkeypatch):
+    buffer, store = make_buffer(monkeypatch, flush_interval=0.01)
+
+    async def run():
+        await buffer.add("alice", [message("a1")])
+        await buffer.add("bob", [message("b1")])
+        await buffer.add("alice", [message("a2")])
+        await asyncio.sleep(0.05)
+    asyncio.run(run())
+    assert store.batches == [{"alice": [message("a1"), message("a2")], "bob": [message("b1")]}]
+    assert not buffer.has_pending("alice")
+
+def test_full_buffer_flushes_immediately(monkeypatch):
+    buffer, store = make_buffer(monkeypatch, max_messages=2)
+    asyncio.run(buffer.add("alice", [message("a1"), message("a2")]))
+    assert store.batches == [{"alice": [message("a1"), message("a2")]}]
+
+def test_failed_flush_requeues_ahead_of_newer_messages(monkeypatch):
+    buffer, store = make_buffer(monkeypatch)
+    store.failures = 1
+
+    async def run():
+        await buffer.add("alice", [message("a1")])
+        assert not await buffer.flush()
+        await buffer.add("alice", [message("a2")])
+        assert await buffer.flush()
+    asyncio.run(run())
+    assert store.batches == [{"alice": [message("a1"), message("a2")]}]
+
+def test_user_stays_pending_while_their_flush_is_in_flight(monkeypatch):
+    buffer, store = make_buffer(monkeypatch)
+
+    async def run():
+        store.gate = asyncio.Event()
+        await buffer.add("alice", [message("a1")])
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0)
+        assert buffer.has_pending("alice") and not buffer.has_pending("bob")
+        store.gate.set()
+        await flush
+        assert not buffer.has_pending("alice")
+    asyncio.run(run())
+
+def test_close_flushes_and_later_adds_write_through(monkeypatch):
+    buffer, store = make_buffer(monkeypatch)
+
+    async def run():
+        await buffer.add("alice", [message("a1")])
+        await buffer.close()
+        return await buffer.add("alice", [message("a2")])
+    assert asyncio.run(run()) == {"buffered": False, "appended": 1}
+    assert store.batches == [{"alice": [message("a1")]}, {"alice": [message("a2")]}]
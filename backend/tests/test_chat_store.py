@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from utils import chat_store
+from utils.chat_store import migrate_legacy_history, read_messages
+
+@pytest.fixture
+def store(mongo, monkeypatch):
+    monkeypatch.setattr(chat_store, "CHAT_BUCKET_SIZE", 2)
+    chat_store.migrated_users.clear()
+    return mongo
+
+def legacy_history(count: int) -> list:
+    return [{"sender": "user" if i % 2 == 0 else "ai", "text": f"message {i}"} for i in range(count)]
+
+def test_failed_legacy_migration_is_retried_without_losing_history(store, monkeypatch):
+    externalize = chat_store.externalize_sources
+    attempts = []
+
+    async def failing_once(documents, field):
+        attempts.append(len(documents))
+        if len(attempts) == 1:
+            raise RuntimeError("blob store unavailable")
+        return await externalize(documents, field)
+    monkeypatch.setattr(chat_store, "externalize_sources", failing_once)
+
+    async def run():
+        await chat_store.get_async_chat_collection().insert_one({"user_id": "alice", "chat_history": legacy_history(5)})
+        with pytest.raises(RuntimeError):
+            await migrate_legacy_history("alice")
+        legacy = await chat_store.get_async_chat_collection().find_one({"user_id": "alice"})
+        assert legacy.get("migrated_to_buckets") is not True
+        return await read_messages("alice")
+    assert [message["text"] for message in asyncio.run(run())] == [f"message {i}" for i in range(5)]
+
+def test_repeated_migration_writes_each_bucket_once(store):
+    async def run():
+        await chat_store.get_async_chat_collection().insert_one({"user_id": "bob", "chat_history": legacy_history(3)})
+        await migrate_legacy_history("bob")
+        # Another worker that hasn't seen the flag yet redoes the migration
+        await chat_store.get_async_chat_collection().update_one({"user_id": "bob"}, {"$unset": {"migrated_to_buckets": ""}})
+        chat_store.migrated_users.clear()
+        await migrate_legacy_history("bob")
+        return await read_messages("bob")
+    assert [message["text"] for message in asyncio.run(run())] == [f"message {i}" for i in range(3)]
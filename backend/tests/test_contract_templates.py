@@ -0,0 +1,37 @@
+from AI_service.contract_templates import parse_template_request, render_template
+
+def test_erc20_features_and_amounts_are_parsed():
+    spec = parse_template_request("ERC-20 Token", "Mintable, burnable and capped at 10 million tokens; supply of 2.5m; name: Green Coin; symbol GRC")
+    assert spec["type"] == "erc20"
+    assert spec["features"] == {"mintable", "burnable", "capped", "ownable"}
+    assert spec["cap"] == 10_000_000
+    assert spec["initial_supply"] == 2_500_000
+    assert spec["name"] == "Green Coin"
+    assert spec["symbol"] == "GRC"
+
+def test_defaults_apply_for_a_plain_request():
+    spec = parse_template_request("erc20", "basic")
+    assert spec["features"] == set()
+    assert (spec["name"], spec["symbol"], spec["initial_supply"]) == ("MyToken", "MTK", 1_000_000)
+
+def test_capped_supply_never_exceeds_the_cap():
+    spec = parse_template_request("erc20", "capped at 1000, supply 5000")
+    assert spec["initial_supply"] == 1000
+
+def test_capped_nft_collection_gets_a_mint_function():
+    spec = parse_template_request("NFT", "capped at 500 items")
+    assert spec["type"] == "erc721"
+    assert {"capped", "mintable", "ownable"} <= spec["features"]
+
+def test_unrecognized_requests_go_to_the_llm():
+    assert parse_template_request("governor", "mintable") is None
+    assert parse_template_request("erc20", "mintable, with staking rewards") is None
+    assert parse_template_request("erc20", "supply of 0.5") is None
+
+def test_rendered_contract_reflects_the_spec():
+    contract_name, code, text = render_template(parse_template_request("erc20", "pausable, capped at 1m, name Green Coin"))
+    assert contract_name == "GreenCoin"
+    assert "contract GreenCoin is ERC20, ERC20Capped, ERC20Pausable, Ownable" in code
+    assert "override(ERC20, ERC20Capped, ERC20Pausable)" in code
+    assert "ERC20Capped(1000000 * 10 ** 18)" in code
+    assert f"```solidity\n{code}```" in text
@@ -0,0 +1,75 @@
+from AI_service.contract_units import contract_skeleton, is_truncated, split_contract_units, stitch_units
+
+SOURCE = '''pragma solidity ^0.8.20;
+
+contract Vault {
+    mapping(address => uint256) public balances;
+    // function fake() in a comment is not a unit
+    string public note = "function inString() {";
+
+    modifier nonZero(uint256 amount) {
+        require(amount > 0, "zero");
+        _;
+    }
+
+    constructor() {}
+
+    function deposit() external payable {
+        balances[msg.sender] += msg.value;
+    }
+
+    function withdraw(uint256 amount) external nonZero(amount) {
+        if (balances[msg.sender] >= amount) {
+            balances[msg.sender] -= amount;
+        }
+    }
+
+    function withdraw() external {
+        balances[msg.sender] = 0;
+    }
+
+    receive() external payable {}
+}
+
+interface IVault {
+    function deposit() external payable;
+}
+'''
+
+def test_units_are_split_by_contract_kind_and_name():
+    units = split_contract_units(SOURCE)
+    assert [unit["id"] for unit in units] == [
+        "Vault.modifier:nonZero",
+        "Vault.constructor:constructor",
+        "Vault.function:deposit",
+        "Vault.function:withdraw",
+        "Vault.function:withdraw#2",
+        "Vault.receive:receive",
+    ]
+    deposit = units[2]
+    assert deposit["text"].startswith("function deposit()") and deposit["text"].endswith("}")
+    assert SOURCE.splitlines()[deposit["start_line"] - 1].strip() == "function deposit() external payable {"
+
+def test_stitching_replaces_only_the_given_unit():
+    units = split_contract_units(SOURCE)
+    replacement = "function deposit() external payable {\n        require(msg.value > 0);\n        balances[msg.sender] += msg.value;\n    }"
+    stitched = stitch_units(SOURCE, units, {"Vault.function:deposit": replacement})
+    assert replacement in stitched
+    assert stitch_units(SOURCE, units, {}) == SOURCE
+    assert [unit["hash"] for unit in split_contract_units(stitched) if unit["id"] != "Vault.function:deposit"] == [
+        unit["hash"] for unit in units if unit["id"] != "Vault.function:deposit"
+    ]
+
+def test_skeleton_ignores_body_edits_but_not_signature_edits():
+    units = split_contract_units(SOURCE)
+    skeleton = contract_skeleton(SOURCE, units)
+    assert "balances[msg.sender] += msg.value" not in skeleton
+    assert "function deposit() external payable { ... }" in skeleton
+    body_edit = SOURCE.replace("balances[msg.sender] = 0;", "delete balances[msg.sender];")
+    assert contract_skeleton(body_edit, split_contract_units(body_edit)) == skeleton
+    signature_edit = SOURCE.replace("function deposit() external payable", "function deposit() public payable")
+    assert contract_skeleton(signature_edit, split_contract_units(signature_edit)) != skeleton
+
+def test_truncated_source_is_detected():
+    assert not is_truncated(SOURCE)
+    assert is_truncated(SOURCE[:SOURCE.index("receive()")])
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from utils import deployment_store
+from utils.deployment_store import read_deployments, append_deployment
+
+@pytest.fixture
+def store(mongo, monkeypatch):
+    monkeypatch.setattr(deployment_store, "DEPLOYMENTS_CACHE_ENABLED", True)
+    deployment_store.deployments_cache.clear()
+    deployment_store.migrated_users.clear()
+    return mongo
+
+def deployment(n: int) -> dict:
+    return {"contractName": "TestToken", "contractAddress": f"0x{n:040x}", "network": "testnet",
+            "timestamp": f"2026-01-01T00:00:{n:02d}Z"}
+
+def test_read_after_append_sees_the_new_deployment(store):
+    async def run():
+        assert await read_deployments("alice") == []
+        # The empty list is cached now; the append must drop it
+        await append_deployment("alice", deployment(1))
+        assert [d["contractAddress"] for d in await read_deployments("alice")] == [deployment(1)["contractAddress"]]
+        await append_deployment("alice", deployment(2))
+        return await read_deployments("alice")
+    deployments = asyncio.run(run())
+    assert [d["contractAddress"] for d in deployments] == [deployment(1)["contractAddress"], deployment(2)["contractAddress"]]
+
+def test_repeated_reads_are_served_from_the_cache(store):
+    async def run():
+        await append_deployment("bob", deployment(1))
+        first = await read_deployments("bob")
+        # Written behind the store's back: a cached read must not see it
+        await deployment_store.get_async_deployment_record_collection().insert_one(
+            deployment_store.deployment_record("bob", deployment(2))
+        )
+        return first, await read_deployments("bob")
+    first, second = asyncio.run(run())
+    assert second is first
+    assert len(second) == 1
+
+def test_invalidation_only_drops_that_user(store):
+    async def run():
+        await append_deployment("alice", deployment(1))
+        await append_deployment("bob", deployment(2))
+        alice, bob = await read_deployments("alice"), await read_deployments("bob")
+        await append_deployment("alice", deployment(3))
+        return alice, bob, await read_deployments("alice"), await read_deployments("bob")
+    alice, bob, alice_after, bob_after = asyncio.run(run())
+    assert len(alice_after) == 2 and alice_after is not alice
+    assert bob_after is bob
+
+class InvalidatingCollection:
+    """Collection wrapper that lands a save while a read is between its query and its cache fill"""
+
+    def __init__(self, collection, user_id: str):
+        self.collection, self.user_id = collection, user_id
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def find(self, *args, **kwargs):
+        deployment_store.invalidate_deployments(self.user_id)
+        return self.collection.find(*args, **kwargs)
+
+def test_read_racing_a_write_does_not_cache_stale_data(store, monkeypatch):
+    collection = deployment_store.get_async_deployment_record_collection()
+    monkeypatch.setattr(deployment_store, "get_async_deployment_record_collection", lambda: InvalidatingCollection(collection, "carol"))
+    asyncio.run(read_deployments("carol"))
+    assert deployment_store.deployments_cache.get("carol") is None
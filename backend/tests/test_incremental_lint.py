@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from AI_service import audit_contract
+from AI_service.audit_contract import incremental_lint
+
+SOURCE = '''pragma solidity ^0.8.20;
+import {Helper} from "./Helper.sol";
+contract Vault {
+    function sync() public {
+        Helper.sync();
+    }
+    uint256 total;
+    function deposit(uint256 amount) public {
+        total += amount;
+    }
+}
+'''
+
+async def fake_solhint(source: str) -> dict:
+    """Flags console.log lines, an import no remaining code uses, and the state variable's position"""
+    lines = source.splitlines()
+    warnings = [f"{i + 1}:9  warning  Unexpected console statement  no-console" for i, line in enumerate(lines) if "console.log" in line]
+    if "Helper.sync" not in source:
+        warnings.append("2:1  warning  imported name Helper is not used  no-unused-import")
+    warnings += [f"{i + 1}:5  warning  Function order is incorrect  ordering" for i, line in enumerate(lines) if "uint256 total;" in line]
+    return {"success": not warnings, "errors": [], "warnings": warnings, "issues": []}
+
+@pytest.fixture(autouse=True)
+def solhint(monkeypatch):
+    monkeypatch.setattr(audit_contract, "run_solhint_audit", fake_solhint)
+
+def lint_pair(edited: str) -> tuple:
+    """(incremental lint of edited against the findings of SOURCE, full lint of edited)"""
+    async def run():
+        _, known = await incremental_lint(SOURCE, {})
+        incremental, _ = await incremental_lint(edited, known)
+        full, _ = await incremental_lint(edited, {})
+        return sorted(incremental["warnings"]), sorted(full["warnings"])
+    return asyncio.run(run())
+
+def test_blanked_units_do_not_produce_contract_level_findings():
+    edited = SOURCE.replace("total += amount;", "total += amount;\n        console.log(amount);")
+    incremental, full = lint_pair(edited)
+    assert incremental == full
+    assert not any("no-unused-import" in f for f in incremental)
+
+def test_contract_level_findings_follow_units_that_grow():
+    edited = SOURCE.replace("Helper.sync();", "Helper.sync();\n        Helper.sync();")
+    incremental, full = lint_pair(edited)
+    assert incremental == full == ["8:5  warning  Function order is incorrect  ordering"]
@@ -0,0 +1,59 @@
+import time
+import asyncio
+import httpx
+import pytest
+from AI_service import llm_gateway as gateway_module
+from AI_service.llm_gateway import LLMGateway, is_retryable, retry_delay
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class FakeLLM:
+    """ainvoke replays the given outcomes in order: a delay in seconds, or an exception to raise"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.model_kwargs = {"max_tokens": 10}
+
+    async def ainvoke(self, messages):
+        outcome = self.outcomes[self.calls]
+        self.calls += 1
+        if isinstance(outcome, Exception):
+            raise outcome
+        await asyncio.sleep(outcome)
+        return f"response {self.calls}"
+
+def test_transient_errors_are_retryable():
+    assert is_retryable(asyncio.TimeoutError())
+    assert is_retryable(httpx.TransportError("connection reset"))
+    assert is_retryable(StatusError(429)) and is_retryable(StatusError(503))
+    assert not is_retryable(StatusError(400)) and not is_retryable(ValueError("bad prompt"))
+
+def test_retry_delay_stays_within_the_backoff_cap():
+    for attempt in range(10):
+        delay = retry_delay(attempt)
+        assert 0 <= delay <= min(gateway_module.LLM_RETRY_MAX_SECONDS, gateway_module.LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+
+def test_acomplete_retries_transient_errors_only(monkeypatch):
+    monkeypatch.setattr(gateway_module, "retry_delay", lambda attempt: 0)
+    llm = FakeLLM(StatusError(503), 0)
+    assert asyncio.run(LLMGateway().acomplete(llm, ["hi"])) == "response 2"
+
+    llm = FakeLLM(StatusError(400), 0)
+    with pytest.raises(StatusError):
+        asyncio.run(LLMGateway().acomplete(llm, ["hi"]))
+    assert llm.calls == 1
+
+def test_slow_call_is_hedged_and_the_duplicate_wins(monkeypatch):
+    monkeypatch.setattr(gateway_module, "LLM_HEDGE_ENABLED", True)
+    gateway = LLMGateway()
+    for _ in range(gateway_module.LLM_HEDGE_MIN_SAMPLES):
+        gateway.observe_latency(0.01)
+    llm = FakeLLM(5, 0)
+    started = time.perf_counter()
+    assert asyncio.run(gateway.hedged_invoke(llm, ["hi"])) == "response 2"
+    assert time.perf_counter() - started < 1
+    assert llm.calls == 2
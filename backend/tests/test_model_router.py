@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from AI_service.model_router import route, route_sync
+from utils.metrics import metrics
+from utils.rate_limit import AdmissionRejected
+
+TIERS = ["fast", "strong"]
+
+def outcomes(**by_tier):
+    """attempt(tier) returning or raising the configured outcome, and the tiers it was called with"""
+    calls = []
+
+    def attempt(tier):
+        calls.append(tier)
+        if isinstance(by_tier[tier], Exception):
+            raise by_tier[tier]
+        return by_tier[tier]
+    return attempt, calls
+
+def run_both(attempt, validate, task: str) -> list:
+    """The same routing through route and route_sync, so the two can't drift apart"""
+    async def attempt_async(tier):
+        return attempt(tier)
+
+    async def validate_async(output):
+        return validate(output)
+    return [
+        asyncio.run(route(task, attempt_async, validate_async, TIERS)),
+        route_sync(task, attempt, validate, TIERS),
+    ]
+
+def escalations(task: str) -> int:
+    return metrics.snapshot()["counters"].get(f"router.{task}.escalations", 0)
+
+def test_accepted_fast_output_does_not_escalate():
+    attempt, calls = outcomes(fast="good", strong="better")
+    assert run_both(attempt, lambda output: output == "good", "router_test_accept") == [("good", "fast")] * 2
+    assert calls == ["fast", "fast"]
+    assert escalations("router_test_accept") == 0
+
+def test_rejected_or_failed_fast_output_escalates():
+    attempt, calls = outcomes(fast="bad", strong="good")
+    assert run_both(attempt, lambda output: output == "good", "router_test_reject") == [("good", "strong")] * 2
+    attempt, calls = outcomes(fast=RuntimeError("timeout"), strong="good")
+    assert run_both(attempt, lambda output: True, "router_test_error") == [("good", "strong")] * 2
+    assert escalations("router_test_reject") == escalations("router_test_error") == 2
+
+def test_last_tier_output_is_kept_even_if_rejected():
+    attempt, _ = outcomes(fast="bad", strong="still bad")
+    assert run_both(attempt, lambda output: False, "router_test_last") == [("still bad", "strong")] * 2
+
+def test_last_tier_errors_and_admission_rejections_propagate():
+    attempt, _ = outcomes(fast="bad", strong=ValueError("boom"))
+    with pytest.raises(ValueError):
+        route_sync("router_test_raise", attempt, lambda output: False, TIERS)
+    attempt, calls = outcomes(fast=AdmissionRejected("quota", 1), strong="good")
+    with pytest.raises(AdmissionRejected):
+        route_sync("router_test_quota", attempt, lambda output: True, TIERS)
+    assert calls == ["fast"]
@@ -0,0 +1,50 @@
+import pytest
+from AI_service.patch_apply import PatchApplyError, apply_edits, parse_edits
+
+SOURCE = '''contract Counter {
+    uint256 public count;
+
+    function increment() public {
+        count += 1;
+    }
+
+    function reset() public {
+        count = 0;
+    }
+}
+'''
+
+def edit_block(search: str, replace: str) -> str:
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE"
+
+def test_parse_and_apply_edits():
+    output = "Here are the fixes:\n" + edit_block(
+        "    function reset() public {", "    function reset() public onlyOwner {"
+    ) + "\n" + edit_block("    uint256 public count;", "    uint256 public count;\n    address public owner;")
+    patched = apply_edits(SOURCE, parse_edits(output))
+    assert "function reset() public onlyOwner {" in patched
+    assert "    address public owner;" in patched
+    assert "function increment() public {" in patched
+
+def test_no_changes_marker_means_no_edits():
+    assert parse_edits("NO_CHANGES") == []
+    assert parse_edits("```\nNO_CHANGES\n```") == []
+
+def test_output_without_edit_blocks_is_rejected():
+    with pytest.raises(PatchApplyError):
+        parse_edits("contract Counter {}")
+
+def test_anchor_matches_despite_indentation_drift():
+    patched = apply_edits(SOURCE, [("function increment() public {\ncount += 1;", "    function increment() public {\n        count += 2;")])
+    assert "count += 2;" in patched and "count += 1;" not in patched
+
+def test_ambiguous_missing_and_overlapping_anchors_apply_nothing():
+    with pytest.raises(PatchApplyError, match="ambiguous"):
+        apply_edits(SOURCE, [("    }", "    }\n")])
+    with pytest.raises(PatchApplyError, match="not found"):
+        apply_edits(SOURCE, [("function decrement() public {", "")])
+    with pytest.raises(PatchApplyError, match="overlap"):
+        apply_edits(SOURCE, [
+            ("    function reset() public {\n        count = 0;", "x"),
+            ("        count = 0;\n    }\n}", "y")
+        ])
@@ -0,0 +1,13 @@
+import pytest
+from utils.rate_limit import AdmissionRejected, TokenBucket
+
+def test_token_bucket_queues_then_rejects():
+    # 100 tokens per second once the initial burst is spent
+    bucket = TokenBucket(tokens_per_minute=6000, max_queue=1, max_wait_seconds=1)
+    assert bucket.try_acquire(6000)
+    assert not bucket.try_acquire(10)
+    assert bucket.headroom() < 0.01
+    assert 0 < bucket.acquire(5) <= 0.1
+    with pytest.raises(AdmissionRejected) as rejected:
+        bucket.acquire(1000)
+    assert rejected.value.retry_after > 1
@@ -0,0 +1,76 @@
+import time
+from AI_service.canonicalize import source_fingerprint
+from AI_service.similarity_index import AuditSimilarityIndex
+
+def token_contract(name: str, supply: int, extra: str = "") -> str:
+    return f'''pragma solidity ^0.8.20;
+import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+import "@openzeppelin/contracts/access/Ownable.sol";
+contract {name} is ERC20, Ownable {{
+    constructor() ERC20("{name}", "TKN") Ownable(msg.sender) {{
+        _mint(msg.sender, {supply} * 10 ** decimals());
+    }}
+    function mint(address to, uint256 amount) public onlyOwner {{
+        _mint(to, amount);
+    }}
+    {extra}
+}}
+'''
+
+UNRELATED = '''pragma solidity ^0.8.20;
+contract Voting {
+    mapping(bytes32 => uint256) public votes;
+    mapping(address => bool) public voted;
+    function vote(bytes32 proposal) external {
+        require(!voted[msg.sender], "already voted");
+        voted[msg.sender] = true;
+        votes[proposal] += 1;
+    }
+}
+'''
+
+def add(index: AuditSimilarityIndex, code: str) -> str:
+    fingerprint = source_fingerprint(code)
+    index.add(fingerprint, code, {"corrected_code": code})
+    return fingerprint
+
+def test_get_is_exact_and_nearest_finds_variants(tmp_path):
+    index = AuditSimilarityIndex(str(tmp_path / "audits.sqlite3"))
+    original = token_contract("AlphaToken", 1000)
+    fingerprint = add(index, original)
+    add(index, UNRELATED)
+
+    assert index.get(fingerprint) == {"corrected_code": original}
+    variant = token_contract("BetaToken", 5000)
+    assert index.get(source_fingerprint(variant)) is None
+    nearest = index.nearest(variant)
+    assert nearest["fingerprint"] == fingerprint
+    assert nearest["similarity"] > 0.9
+    # Excluding the contract itself leaves only the unrelated one, if anything
+    other = index.nearest(original, exclude=fingerprint)
+    assert other is None or other["similarity"] < 0.5
+
+def test_audits_survive_a_restart(tmp_path):
+    path = str(tmp_path / "audits.sqlite3")
+    fingerprint = add(AuditSimilarityIndex(path), token_contract("AlphaToken", 1000))
+    reopened = AuditSimilarityIndex(path)
+    assert reopened.get(fingerprint) is not None
+    assert reopened.nearest(token_contract("AlphaToken", 2000))["fingerprint"] == fingerprint
+
+def test_oldest_audits_are_evicted_above_the_cap(tmp_path):
+    path = str(tmp_path / "audits.sqlite3")
+    index = AuditSimilarityIndex(path, max_entries=2)
+    fingerprints = [add(index, token_contract("AlphaToken", 1000, f"uint256 public field{i};")) for i in range(3)]
+    assert index.get(fingerprints[0]) is None
+    assert index.get(fingerprints[1]) is not None and index.get(fingerprints[2]) is not None
+    assert AuditSimilarityIndex(path, max_entries=2).get(fingerprints[0]) is None
+
+def test_get_ignores_audits_older_than_max_age(tmp_path, monkeypatch):
+    index = AuditSimilarityIndex(str(tmp_path / "audits.sqlite3"))
+    fingerprint = add(index, token_contract("AlphaToken", 1000))
+    assert index.get(fingerprint, max_age_seconds=60) is not None
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert index.get(fingerprint, max_age_seconds=60) is None
+    # Still there as a reference for nearest()
+    assert index.nearest(token_contract("BetaToken", 5000))["fingerprint"] == fingerprint
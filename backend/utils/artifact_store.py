@@ -0,0 +1,54 @@
+import os
+import json
+from datetime import datetime, timezone
+from utils.mongo import get_async_artifact_collection
+from utils.blob_store import put_sources, get_sources
+from utils.cache import LRUCache
+from utils.metrics import metrics
+
+# Compiled artifacts of deployed contracts, keyed by lowercased address. The ABI,
+# bytecode and source live in the blob store (compressed, deduplicated by hash,
+# so redeploying the same contract stores nothing new); the artifact record holds
+# only their hashes. The ABI hash doubles as its ETag.
+artifact_cache = LRUCache(int(os.getenv("ARTIFACT_CACHE_MAX_ENTRIES", "1024")))
+
+def canonical_abi(abi: list) -> str:
+    """Stable JSON text for an ABI, so equal ABIs hash (and dedupe) equally"""
+    return json.dumps(abi, sort_keys=True, separators=(",", ":"))
+
+async def save_artifact(address: str, network: str, contract_name: str, abi: list, bytecode: str, code: str) -> dict:
+    abi_hash, bytecode_hash, source_hash = await put_sources([canonical_abi(abi), bytecode or "0x", code])
+    record = {
+        "network": network,
+        "contract_name": contract_name,
+        "abi_hash": abi_hash,
+        "bytecode_hash": bytecode_hash,
+        "source_hash": source_hash,
+        "deployed_at": datetime.now(timezone.utc)
+    }
+    address = address.lower()
+    await get_async_artifact_collection().update_one({"_id": address}, {"$set": record}, upsert=True)
+    artifact_cache.set(address, record)
+    metrics.increment("artifacts.saved")
+    return record
+
+async def get_artifact(address: str) -> dict | None:
+    address = address.lower()
+    record = artifact_cache.get(address)
+    if record is None:
+        record = await get_async_artifact_collection().find_one({"_id": address}, projection={"_id": 0})
+        if record is None:
+            return None
+        artifact_cache.set(address, record)
+    return record
+
+async def get_abi(address: str) -> tuple | None:
+    """(abi_json_text, abi_hash) for a deployed address, or None if nothing was recorded"""
+    record = await get_artifact(address)
+    if record is None:
+        return None
+    sources = await get_sources([record["abi_hash"]])
+    if record["abi_hash"] not in sources:
+        print(f"[Artifact Store] ABI blob missing for {address}")
+        return None
+    return sources[record["abi_hash"]], record["abi_hash"]
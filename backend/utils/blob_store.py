@@ -0,0 +1,118 @@
+import os
+import zlib
+from pymongo import UpdateOne
+from bson import Binary
+from utils.hashing import source_hash
+from utils.mongo import get_async_blob_collection
+from utils.cache import LRUCache
+from utils.metrics import metrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Content-addressed store for Solidity sources (and other large texts such as
+# compiled ABIs and bytecode): each distinct text is kept once, compressed, under
+# its sha256 (the same source_hash the project caches key on). Records that embed
+# a source keep only "<field>_hash" and are rehydrated on read.
+BLOB_CODEC = os.getenv("BLOB_CODEC", "zstd" if zstandard else "zlib")
+BLOB_ZSTD_LEVEL = int(os.getenv("BLOB_ZSTD_LEVEL", "10"))
+BLOB_ZLIB_LEVEL = int(os.getenv("BLOB_ZLIB_LEVEL", "9"))
+
+# Hashes known to be stored, so re-saving a source costs no write at all,
+# and recently read sources so hot contracts don't hit Mongo or decompress again
+stored_hashes = LRUCache(int(os.getenv("BLOB_KNOWN_HASHES_MAX_ENTRIES", "50000")))
+source_cache = LRUCache(int(os.getenv("BLOB_SOURCE_CACHE_MAX_ENTRIES", "1024")))
+
+def compress(data: bytes) -> tuple:
+    """(codec, payload); stored raw when compression doesn't help"""
+    if BLOB_CODEC == "zstd" and zstandard:
+        payload = zstandard.ZstdCompressor(level=BLOB_ZSTD_LEVEL).compress(data)
+        codec = "zstd"
+    else:
+        payload = zlib.compress(data, BLOB_ZLIB_LEVEL)
+        codec = "zlib"
+    return (codec, payload) if len(payload) < len(data) else ("raw", data)
+
+def decompress(codec: str, payload: bytes) -> bytes:
+    if codec == "raw":
+        return payload
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise RuntimeError(f"Unknown blob codec: {codec}")
+
+async def put_sources(sources: list) -> list:
+    """Store each distinct source once (one bulk_write for all new ones) and return their hashes"""
+    hashes = [source_hash(source) for source in sources]
+    new = {}
+    for digest, source in zip(hashes, sources):
+        if stored_hashes.get(digest) or digest in new:
+            metrics.increment("blob_store.dedup_hits")
+            continue
+        new[digest] = source
+    if new:
+        ops = []
+        for digest, source in new.items():
+            data = source.encode("utf-8")
+            codec, payload = compress(data)
+            metrics.increment("blob_store.bytes_in", len(data))
+            metrics.increment("blob_store.bytes_stored", len(payload))
+            # $setOnInsert: a blob that already exists (another user, another worker) is left untouched
+            ops.append(UpdateOne(
+                {"_id": digest},
+                {"$setOnInsert": {"codec": codec, "size": len(data), "data": Binary(payload)}},
+                upsert=True
+            ))
+        result = await get_async_blob_collection().bulk_write(ops, ordered=False)
+        metrics.increment("blob_store.blobs_written", result.upserted_count)
+        metrics.increment("blob_store.dedup_hits", len(ops) - result.upserted_count)
+        for digest in new:
+            stored_hashes.set(digest, True)
+    return hashes
+
+async def get_sources(hashes: list) -> dict:
+    """{hash: source} for the given hashes; unknown hashes are left out"""
+    found, missing = {}, []
+    for digest in set(hashes):
+        source = source_cache.get(digest)
+        if source is None:
+            missing.append(digest)
+        else:
+            found[digest] = source
+    if missing:
+        async for blob in get_async_blob_collection().find({"_id": {"$in": missing}}):
+            source = decompress(blob["codec"], bytes(blob["data"])).decode("utf-8")
+            source_cache.set(blob["_id"], source)
+            stored_hashes.set(blob["_id"], True)
+            found[blob["_id"]] = source
+    return found
+
+async def externalize_sources(documents: list, field: str) -> list:
+    """Replace string document[field] with document[field + "_hash"] in place, storing the sources"""
+    embedding = [document for document in documents if isinstance(document.get(field), str) and document[field]]
+    if embedding:
+        hashes = await put_sources([document[field] for document in embedding])
+        for document, digest in zip(embedding, hashes):
+            del document[field]
+            document[f"{field}_hash"] = digest
+    return documents
+
+async def hydrate_sources(documents: list, field: str) -> list:
+    """Inverse of externalize_sources; documents stored before the blob store pass through as-is"""
+    key = f"{field}_hash"
+    referencing = [document for document in documents if key in document]
+    if referencing:
+        sources = await get_sources([document[key] for document in referencing])
+        for document in referencing:
+            source = sources.get(document[key])
+            if source is None:
+                print(f"[Blob Store] Missing blob {document[key]}")
+                continue
+            document[field] = source
+            del document[key]
+    return documents
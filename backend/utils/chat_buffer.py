@@ -0,0 +1,109 @@
+import os
+import time
+import asyncio
+from utils.chat_store import append_batch
+from utils.metrics import metrics
+
+# Write-behind buffer for chat saves: messages are held per user for up to
+# CHAT_BUFFER_FLUSH_MS (or until CHAT_BUFFER_MAX_MESSAGES are pending) and then
+# written for every buffered user in one bulk_write
+CHAT_BUFFER_ENABLED = os.getenv("CHAT_BUFFER_ENABLED", "true").lower() == "true"
+CHAT_BUFFER_FLUSH_MS = float(os.getenv("CHAT_BUFFER_FLUSH_MS", "20"))
+CHAT_BUFFER_MAX_MESSAGES = int(os.getenv("CHAT_BUFFER_MAX_MESSAGES", "500"))
+CHAT_BUFFER_RETRY_SECONDS = float(os.getenv("CHAT_BUFFER_RETRY_SECONDS", "1"))
+
+class ChatWriteBuffer:
+    """
+    Accumulates chat appends per user and flushes them together. Flushes are
+    serialized so a user's messages reach the database in the order they were
+    added; a failed flush puts its messages back at the front and retries.
+    """
+
+    def __init__(self, flush_interval: float, max_messages: int, enabled: bool = True):
+        self.flush_interval = flush_interval
+        self.max_messages = max_messages
+        self.enabled = enabled
+        self.pending = {}
+        self.pending_count = 0
+        # Users whose messages are being written by the flush in progress
+        self.inflight = set()
+        self._timer = None
+        self._flush_lock = asyncio.Lock()
+        self._tasks = set()
+        self._closed = False
+
+    async def add(self, user_id: str, messages: list) -> dict:
+        """Queue messages for user_id; written directly when buffering is off or the buffer is closed"""
+        if not self.enabled or self._closed:
+            result = await append_batch({user_id: list(messages)})
+            return {"buffered": False, "appended": result["appended"]}
+        self.pending.setdefault(user_id, []).extend(messages)
+        self.pending_count += len(messages)
+        metrics.increment("chat_buffer.messages_buffered", len(messages))
+        if self.pending_count >= self.max_messages:
+            await self.flush()
+        else:
+            self._schedule(self.flush_interval)
+        return {"buffered": True, "appended": len(messages)}
+
+    def has_pending(self, user_id: str) -> bool:
+        """True while any of the user's messages are not yet written, including mid-flush"""
+        return user_id in self.pending or user_id in self.inflight
+
+    def _schedule(self, delay: float):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(delay, self._flush_in_background)
+
+    def _flush_in_background(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        # Keep a reference so the task isn't garbage collected mid-flush
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> bool:
+        """Write everything pending in one batch; returns False if the write failed and was requeued"""
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self.pending:
+                return True
+            batch, count = self.pending, self.pending_count
+            self.pending, self.pending_count = {}, 0
+            self.inflight = set(batch)
+            start = time.perf_counter()
+            try:
+                result = await append_batch(batch)
+            except Exception as e:
+                print(f"[Chat Buffer] Flush of {count} messages for {len(batch)} users failed: {e}")
+                metrics.increment("chat_buffer.flush_failures")
+                # Requeue ahead of anything added meanwhile to keep per-user order
+                for user_id, messages in self.pending.items():
+                    batch.setdefault(user_id, []).extend(messages)
+                self.pending, self.pending_count = batch, self.pending_count + count
+                if not self._closed:
+                    self._schedule(CHAT_BUFFER_RETRY_SECONDS)
+                return False
+            finally:
+                self.inflight = set()
+            metrics.increment("chat_buffer.flushes")
+            metrics.increment("chat_buffer.messages_flushed", count)
+            metrics.increment("chat_buffer.fallback_users", result["fallback_users"])
+            metrics.observe("chat_buffer.flush_size", count)
+            metrics.observe("chat_buffer.flush_users", len(batch))
+            metrics.observe("chat_buffer.flush_latency", time.perf_counter() - start)
+            if self.pending:
+                self._schedule(self.flush_interval)
+            return True
+
+    async def close(self):
+        """Stop buffering and flush what is left; run on shutdown"""
+        self._closed = True
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if not await self.flush():
+            print(f"[Chat Buffer] {self.pending_count} messages could not be written on shutdown")
+
+# Create a global instance
+chat_buffer = ChatWriteBuffer(CHAT_BUFFER_FLUSH_MS / 1000, CHAT_BUFFER_MAX_MESSAGES, CHAT_BUFFER_ENABLED)
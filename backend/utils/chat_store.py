@@ -0,0 +1,247 @@
+import os
+import json
+from datetime import datetime, timezone
+from bson import Binary
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from utils.mongo import get_async_chat_collection, get_async_chat_bucket_collection, get_async_chat_archive_collection, get_async_chat_summary_collection
+from utils.metrics import metrics
+from utils.cache import LRUCache
+from utils.blob_store import externalize_sources, hydrate_sources, compress, decompress
+
+# Chat messages live in fixed-size bucket documents keyed by (user_id, bucket_seq):
+# appends only touch the tail bucket and reads only fetch the buckets they need
+CHAT_BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", "200"))
+CHAT_APPEND_MAX_RETRIES = 5
+
+# Users whose legacy chat_history array has already been checked in this process
+migrated_users = LRUCache(int(os.getenv("CHAT_MIGRATED_USERS_MAX_ENTRIES", "10000")))
+
+async def tail_bucket(user_id: str) -> dict | None:
+    return await get_async_chat_bucket_collection().find_one(
+        {"user_id": user_id},
+        projection={"bucket_seq": 1, "count": 1},
+        sort=[("bucket_seq", DESCENDING)]
+    )
+
+async def append_messages(user_id: str, messages: list) -> dict:
+    """
+    Append messages to the user's tail bucket, opening new buckets as it fills.
+    Each write is conditional on the bucket still having room, so concurrent
+    appenders never overfill a bucket; a lost race re-reads the tail and retries.
+    """
+    await migrate_legacy_history(user_id)
+    # Generated contracts are stored once in the blob store; messages keep code_hash
+    await externalize_sources(messages, "code")
+    buckets = get_async_chat_bucket_collection()
+    remaining, touched, retries = list(messages), set(), 0
+    while remaining:
+        tail = await tail_bucket(user_id)
+        if tail is None:
+            seq, room = 0, CHAT_BUCKET_SIZE
+        elif tail["count"] < CHAT_BUCKET_SIZE:
+            seq, room = tail["bucket_seq"], CHAT_BUCKET_SIZE - tail["count"]
+        else:
+            seq, room = tail["bucket_seq"] + 1, CHAT_BUCKET_SIZE
+        chunk = remaining[:room]
+        try:
+            result = await buckets.update_one(*bucket_append(user_id, seq, chunk), upsert=True)
+            written = result.upserted_id is not None or result.modified_count == 1
+        except DuplicateKeyError:
+            # The bucket exists but no longer has room for the chunk
+            written = False
+        if not written:
+            retries += 1
+            metrics.increment("chat_store.append_retries")
+            if retries > CHAT_APPEND_MAX_RETRIES:
+                raise RuntimeError(f"Could not append chat messages for {user_id} after {retries} attempts")
+            continue
+        touched.add(seq)
+        remaining = remaining[len(chunk):]
+    metrics.increment("chat_store.messages_appended", len(messages))
+    return {"appended": len(messages), "buckets": sorted(touched)}
+
+def bucket_append(user_id: str, seq: int, chunk: list) -> tuple:
+    """(filter, update) appending chunk to bucket seq only while it has room; upserted to open the bucket"""
+    return (
+        {"user_id": user_id, "bucket_seq": seq, "count": {"$lte": CHAT_BUCKET_SIZE - len(chunk)}},
+        {"$push": {"messages": {"$each": chunk}}, "$inc": {"count": len(chunk)}}
+    )
+
+async def append_batch(batch: dict) -> dict:
+    """
+    Append {user_id: messages} for many users in two round trips: one aggregation
+    for every user's tail bucket and one ordered bulk_write. If a tail changed in
+    between (another worker appended), the failed write and everything after it
+    fall back to append_messages, which re-reads the tail.
+    """
+    for user_id in batch:
+        await migrate_legacy_history(user_id)
+    await externalize_sources([message for messages in batch.values() for message in messages], "code")
+    buckets = get_async_chat_bucket_collection()
+    tails = {}
+    async for tail in buckets.aggregate([
+        {"$match": {"user_id": {"$in": list(batch)}}},
+        {"$sort": {"user_id": 1, "bucket_seq": -1}},
+        {"$group": {"_id": "$user_id", "bucket_seq": {"$first": "$bucket_seq"}, "count": {"$first": "$count"}}}
+    ]):
+        tails[tail["_id"]] = tail
+
+    ops, owners = [], []
+    for user_id, messages in batch.items():
+        tail = tails.get(user_id)
+        seq, used = (tail["bucket_seq"], tail["count"]) if tail else (0, 0)
+        if used >= CHAT_BUCKET_SIZE:
+            seq, used = seq + 1, 0
+        remaining = list(messages)
+        while remaining:
+            chunk = remaining[:CHAT_BUCKET_SIZE - used]
+            ops.append(UpdateOne(*bucket_append(user_id, seq, chunk), upsert=True))
+            owners.append((user_id, chunk))
+            remaining = remaining[len(chunk):]
+            seq, used = seq + 1, 0
+
+    failed_from = len(ops)
+    try:
+        await buckets.bulk_write(ops, ordered=True)
+    except BulkWriteError as e:
+        failed_from = e.details["writeErrors"][0]["index"]
+        metrics.increment("chat_store.append_retries")
+    retry = {}
+    for user_id, chunk in owners[failed_from:]:
+        retry.setdefault(user_id, []).extend(chunk)
+    for user_id, messages in retry.items():
+        await append_messages(user_id, messages)
+
+    appended = sum(len(messages) for messages in batch.values())
+    metrics.increment("chat_store.messages_appended", appended - sum(len(m) for m in retry.values()))
+    return {"appended": appended, "users": len(batch), "writes": failed_from, "fallback_users": len(retry)}
+
+async def read_messages(user_id: str) -> list:
+    """The user's full history, oldest first"""
+    await migrate_legacy_history(user_id)
+    cursor = get_async_chat_bucket_collection().find(
+        {"user_id": user_id},
+        projection={"_id": 0, "messages": 1},
+        sort=[("bucket_seq", ASCENDING)]
+    )
+    return await hydrate_sources([message async for bucket in cursor for message in bucket["messages"]], "code")
+
+async def read_message_page(user_id: str, limit: int, before: tuple | None = None, fields: list | None = None) -> tuple:
+    """
+    Newest-first page of up to limit messages older than the before position
+    (bucket_seq, index), read from the (user_id, bucket_seq) index one bucket at a
+    time and continuing into the cold archive once the hot buckets run out.
+    fields projects each message. Returns (messages, next_before) where
+    next_before is None on the last page.
+    """
+    await migrate_legacy_history(user_id)
+    page = []
+    async for seq, messages in buckets_newest_first(user_id, before[0] if before is not None else None, fields):
+        end = min(before[1], len(messages)) if before is not None and seq == before[0] else len(messages)
+        for index in range(end - 1, -1, -1):
+            if len(page) == limit:
+                return await hydrate_sources(page, "code"), (seq, index + 1)
+            page.append(messages[index])
+    return await hydrate_sources(page, "code"), None
+
+def project_message(message: dict, fields: list) -> dict:
+    keep = set(fields) | ({"code_hash"} if "code" in fields else set())
+    return {key: value for key, value in message.items() if key in keep}
+
+async def buckets_newest_first(user_id: str, max_seq: int | None, fields: list | None = None):
+    """(bucket_seq, messages) from the hot buckets, then the archived ones, newest first"""
+    query = {"user_id": user_id}
+    if max_seq is not None:
+        query["bucket_seq"] = {"$lte": max_seq}
+    projection = {"_id": 0, "bucket_seq": 1}
+    if fields:
+        projection.update({f"messages.{field}": 1 for field in fields})
+        if "code" in fields:
+            projection["messages.code_hash"] = 1
+    else:
+        projection["messages"] = 1
+    oldest_hot = None
+    async for bucket in get_async_chat_bucket_collection().find(query, projection=projection, sort=[("bucket_seq", DESCENDING)]):
+        oldest_hot = bucket["bucket_seq"]
+        yield bucket["bucket_seq"], bucket.get("messages", [])
+    # Compaction archives the oldest buckets, so archived ones sort below every hot one
+    if oldest_hot is not None:
+        query["bucket_seq"] = {"$lt": oldest_hot}
+    archived = get_async_chat_archive_collection().find(query, sort=[("bucket_seq", DESCENDING)])
+    async for bucket in archived:
+        messages = unpack_messages(bucket)
+        yield bucket["bucket_seq"], [project_message(message, fields) for message in messages] if fields else messages
+
+def unpack_messages(archived: dict) -> list:
+    return json.loads(decompress(archived["codec"], bytes(archived["data"])))
+
+async def archive_buckets(user_id: str, buckets: list):
+    """
+    Move whole hot buckets into the compressed cold archive. Archive writes are
+    idempotent upserts, and hot buckets are deleted only after, so a crash in
+    between leaves duplicates to clean up rather than lost messages.
+    """
+    ops = []
+    for bucket in buckets:
+        codec, payload = compress(json.dumps(bucket["messages"], separators=(",", ":"), default=str).encode("utf-8"))
+        ops.append(UpdateOne(
+            {"_id": f"{user_id}:{bucket['bucket_seq']}"},
+            {"$setOnInsert": {
+                "user_id": user_id, "bucket_seq": bucket["bucket_seq"], "count": bucket["count"],
+                "codec": codec, "data": Binary(payload), "archived_at": datetime.now(timezone.utc)
+            }},
+            upsert=True
+        ))
+    if not ops:
+        return
+    await get_async_chat_archive_collection().bulk_write(ops, ordered=False)
+    await get_async_chat_bucket_collection().delete_many(
+        {"user_id": user_id, "bucket_seq": {"$in": [bucket["bucket_seq"] for bucket in buckets]}}
+    )
+    metrics.increment("chat_store.buckets_archived", len(buckets))
+
+async def oldest_hot_bucket(user_id: str) -> int | None:
+    """bucket_seq of the user's oldest hot bucket; archived buckets all sort before it"""
+    bucket = await get_async_chat_bucket_collection().find_one(
+        {"user_id": user_id},
+        projection={"bucket_seq": 1},
+        sort=[("bucket_seq", ASCENDING)]
+    )
+    return bucket["bucket_seq"] if bucket else None
+
+async def read_summary(user_id: str) -> dict | None:
+    """Rolling summary of the user's archived messages, if compaction has run for them"""
+    return await get_async_chat_summary_collection().find_one({"_id": user_id}, projection={"_id": 0})
+
+async def migrate_legacy_history(user_id: str):
+    """
+    Move a user's pre-bucket chat_history array into buckets the first time the
+    user is read or written. Its messages go into negative bucket numbers so they
+    sort before anything appended meanwhile without renumbering existing buckets.
+    Buckets are upserted by (user_id, bucket_seq) and the legacy document is only
+    flagged once all of them are written, so a migration that fails or dies
+    halfway is redone on the next access, and concurrent ones write each bucket once.
+    """
+    if migrated_users.get(user_id):
+        return
+    legacy = await get_async_chat_collection().find_one(
+        {"user_id": user_id, "chat_history": {"$exists": True}, "migrated_to_buckets": {"$ne": True}},
+        projection={"chat_history": 1}
+    )
+    if legacy and legacy.get("chat_history"):
+        history = legacy["chat_history"]
+        print(f"[Chat Store] Migrating {len(history)} legacy messages for {user_id}")
+        metrics.increment("chat_store.legacy_migrations")
+        await externalize_sources(history, "code")
+        chunks = [history[start:start + CHAT_BUCKET_SIZE] for start in range(0, len(history), CHAT_BUCKET_SIZE)]
+        buckets = get_async_chat_bucket_collection()
+        for index, chunk in enumerate(chunks):
+            await buckets.update_one(
+                {"user_id": user_id, "bucket_seq": index - len(chunks)},
+                {"$setOnInsert": {"count": len(chunk), "messages": chunk}},
+                upsert=True
+            )
+    if legacy:
+        await get_async_chat_collection().update_one({"_id": legacy["_id"]}, {"$set": {"migrated_to_buckets": True}})
+    migrated_users.set(user_id, True)
@@ -0,0 +1,88 @@
+import os
+import asyncio
+import subprocess
+import contextvars
+from contextlib import asynccontextmanager, AsyncExitStack
+
+# Maximum concurrent calls per external dependency, shared by every request in the worker
+DEPENDENCY_LIMITS = {
+    "llm": int(os.getenv("LLM_CONCURRENCY", "8")),
+    "solhint": int(os.getenv("SOLHINT_CONCURRENCY", "4")),
+    "solc": int(os.getenv("SOLC_CONCURRENCY", "2")),
+}
+
+_semaphores = {}
+
+# Extra per-request limits (e.g. a batch's per-stage parallelism), inherited by the tasks it spawns
+request_limits = contextvars.ContextVar("request_limits", default=None)
+
+def dependency_semaphore(name: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(name)
+    if semaphore is None:
+        semaphore = _semaphores[name] = asyncio.Semaphore(DEPENDENCY_LIMITS.get(name, 4))
+    return semaphore
+
+@asynccontextmanager
+async def dependency_slot(name: str):
+    """Hold one of the concurrency slots of an external dependency, and of the request's own limit if set"""
+    async with AsyncExitStack() as stack:
+        limits = request_limits.get()
+        if limits and name in limits:
+            await stack.enter_async_context(limits[name])
+        await stack.enter_async_context(dependency_semaphore(name))
+        yield
+
+async def run_subprocess(command: list, timeout: float, dependency: str) -> subprocess.CompletedProcess:
+    """
+    asyncio counterpart of subprocess.run(capture_output=True, text=True) that
+    waits for a dependency slot and raises subprocess.TimeoutExpired on timeout
+    """
+    async with dependency_slot(dependency):
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(command, timeout)
+    return subprocess.CompletedProcess(
+        command, process.returncode, stdout.decode("utf-8", "replace"), stderr.decode("utf-8", "replace")
+    )
+
+class SingleFlight:
+    """
+    Coalesce identical in-flight async calls: the first caller for a key runs the
+    call and later callers await the same result instead of starting their own
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, call) -> tuple:
+        """Await call() once per key and return (result, shared) where shared means another caller ran it"""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one waiter disconnecting doesn't cancel the call for the others
+        return await asyncio.shield(task), shared
+
+class ForegroundActivity:
+    """In-flight HTTP requests of this worker (counted by middleware in main.py), so background jobs can yield"""
+
+    def __init__(self):
+        self.inflight = 0
+
+    @asynccontextmanager
+    async def track(self):
+        self.inflight += 1
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+
+# Create a global instance
+foreground_activity = ForegroundActivity()
@@ -0,0 +1,209 @@
+import os
+import asyncio
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from utils.mongo import get_async_deployment_collection, get_async_deployment_record_collection
+from utils.cache import LRUCache
+from utils.metrics import metrics
+from utils.blob_store import externalize_sources, hydrate_sources
+
+# Each deployment is its own record in deployment_records, indexed by user,
+# contract address, contract name, network and time (see ensure_indexes).
+# The original deployment dict is kept as-is under "deployment" so the API
+# returns what the frontend saved; the top-level fields exist for the indexes.
+
+# Read-through cache of each user's deployment list. The dashboard polls
+# get_deployments while deployments change rarely; every write goes through
+# append_deployment, which drops the user's entry
+DEPLOYMENTS_CACHE_ENABLED = os.getenv("DEPLOYMENTS_CACHE_ENABLED", "true").lower() == "true"
+deployments_cache = LRUCache(
+    int(os.getenv("DEPLOYMENTS_CACHE_MAX_ENTRIES", "2048")),
+    float(os.getenv("DEPLOYMENTS_CACHE_TTL_SECONDS", "30"))
+)
+
+# Users whose legacy per-user deployments array has already been checked in this process
+migrated_users = LRUCache(int(os.getenv("DEPLOYMENTS_MIGRATED_USERS_MAX_ENTRIES", "10000")))
+
+# Bumped on every invalidation: a read that started before a write must not
+# put what it fetched back into the cache afterwards
+_write_version = 0
+
+NEWEST_FIRST = [("deployed_at", DESCENDING), ("_id", DESCENDING)]
+
+def invalidate_deployments(user_id: str):
+    global _write_version
+    _write_version += 1
+    deployments_cache.delete(user_id)
+    metrics.increment("deployments_cache.invalidations")
+
+def parse_timestamp(value) -> datetime:
+    """Deployment timestamps arrive as ISO strings; anything unparseable counts as now"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return datetime.now(timezone.utc)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def deployment_record(user_id: str, deployment: dict) -> dict:
+    address = deployment.get("contractAddress")
+    return {
+        "user_id": user_id,
+        "contract_address": address.lower() if isinstance(address, str) else None,
+        "contract_name": deployment.get("contractName"),
+        "network": deployment.get("network"),
+        "deployed_at": parse_timestamp(deployment.get("timestamp")),
+        "deployment": deployment
+    }
+
+async def append_deployment(user_id: str, deployment: dict):
+    """Record a deployment for user_id and invalidate their cached list"""
+    await migrate_legacy_deployments(user_id)
+    # Deployed source, when the client sends it, is stored once in the blob store
+    await externalize_sources([deployment], "code")
+    try:
+        return await get_async_deployment_record_collection().insert_one(deployment_record(user_id, deployment))
+    finally:
+        # Also on failure: the write may have been applied before the error surfaced
+        invalidate_deployments(user_id)
+
+async def read_deployments(user_id: str) -> list:
+    """The user's deployments oldest first, from the cache when possible"""
+    if DEPLOYMENTS_CACHE_ENABLED:
+        cached = deployments_cache.get(user_id)
+        if cached is not None:
+            metrics.increment("deployments_cache.hits")
+            return cached
+        metrics.increment("deployments_cache.misses")
+    await migrate_legacy_deployments(user_id)
+    version = _write_version
+    cursor = get_async_deployment_record_collection().find(
+        {"user_id": user_id},
+        projection={"_id": 0, "deployment": 1},
+        sort=[("deployed_at", ASCENDING), ("_id", ASCENDING)]
+    )
+    deployments = await hydrate_sources([record["deployment"] async for record in cursor], "code")
+    if DEPLOYMENTS_CACHE_ENABLED and version == _write_version:
+        deployments_cache.set(user_id, deployments)
+    return deployments
+
+def deployments_cache_stats() -> dict:
+    counters = metrics.snapshot()["counters"]
+    hits, misses = counters.get("deployments_cache.hits", 0), counters.get("deployments_cache.misses", 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        "invalidations": counters.get("deployments_cache.invalidations", 0),
+        "entries": len(deployments_cache)
+    }
+
+def encode_position(record: dict) -> dict:
+    return {"ts": record["deployed_at"].isoformat(), "id": str(record["_id"])}
+
+def decode_position(position: dict) -> tuple:
+    """(deployed_at, _id) from a decoded cursor; raises ValueError if it isn't one of ours"""
+    try:
+        return parse_timestamp(datetime.fromisoformat(position["ts"])), ObjectId(position["id"])
+    except (KeyError, TypeError, InvalidId):
+        raise ValueError("Invalid cursor")
+
+async def find_deployment_page(query: dict, limit: int, before: tuple | None = None, fields: list | None = None, with_owner: bool = False) -> tuple:
+    """
+    Newest-first page of up to limit deployments matching query, strictly older
+    than the before position (deployed_at, _id). Keyset pagination on an index
+    ending in (deployed_at, _id), so deep pages cost the same as the first.
+    Returns (deployments, next_position or None).
+    """
+    if before is not None:
+        query = {**query, "$or": [
+            {"deployed_at": {"$lt": before[0]}},
+            {"deployed_at": before[0], "_id": {"$lt": before[1]}}
+        ]}
+    projection = {"deployed_at": 1, "user_id": 1}
+    if fields:
+        projection.update({f"deployment.{field}": 1 for field in fields})
+        if "code" in fields:
+            projection["deployment.code_hash"] = 1
+    else:
+        projection["deployment"] = 1
+    cursor = get_async_deployment_record_collection().find(query, projection=projection, sort=NEWEST_FIRST, limit=limit + 1)
+    records = [record async for record in cursor]
+    await hydrate_sources([record["deployment"] for record in records[:limit] if "deployment" in record], "code")
+    page = [
+        {**record.get("deployment", {}), "user_id": record["user_id"]} if with_owner else record.get("deployment", {})
+        for record in records[:limit]
+    ]
+    return page, encode_position(records[limit - 1]) if len(records) > limit else None
+
+async def read_deployment_page(user_id: str, limit: int, before: tuple | None = None, fields: list | None = None) -> tuple:
+    """Newest-first page of the user's deployments; see find_deployment_page"""
+    await migrate_legacy_deployments(user_id)
+    return await find_deployment_page({"user_id": user_id}, limit, before, fields)
+
+def deployment_query(contract_address: str | None = None, contract_name: str | None = None, network: str | None = None,
+                     since: datetime | None = None, until: datetime | None = None) -> dict:
+    """Filter for the global deployment index; each field maps onto one of its indexes"""
+    query = {}
+    if contract_address:
+        query["contract_address"] = contract_address.lower()
+    if contract_name:
+        query["contract_name"] = contract_name
+    if network:
+        query["network"] = network
+    if since or until:
+        query["deployed_at"] = {}
+        if since:
+            query["deployed_at"]["$gte"] = parse_timestamp(since)
+        if until:
+            query["deployed_at"]["$lt"] = parse_timestamp(until)
+    return query
+
+async def claim_legacy_document(query: dict) -> bool:
+    """Move one unmigrated per-user deployments array into records; False if none matched"""
+    legacy = await get_async_deployment_collection().find_one_and_update(
+        {**query, "deployments": {"$exists": True}, "migrated_to_records": {"$ne": True}},
+        {"$set": {"migrated_to_records": True}},
+        projection={"user_id": 1, "deployments": 1}
+    )
+    if legacy is None:
+        return False
+    if legacy.get("deployments"):
+        print(f"[Deployment Store] Migrating {len(legacy['deployments'])} legacy deployments for {legacy['user_id']}")
+        metrics.increment("deployment_store.legacy_migrations")
+        await externalize_sources(legacy["deployments"], "code")
+        await get_async_deployment_record_collection().insert_many([
+            deployment_record(legacy["user_id"], deployment) for deployment in legacy["deployments"]
+        ])
+        invalidate_deployments(legacy["user_id"])
+    return True
+
+async def migrate_legacy_deployments(user_id: str):
+    """
+    Move a user's pre-records deployments array into deployment_records the
+    first time the user is read or written. The legacy document is claimed
+    atomically so concurrent requests (or the backfill) migrate it once.
+    """
+    if migrated_users.get(user_id):
+        return
+    await claim_legacy_document({"user_id": user_id})
+    migrated_users.set(user_id, True)
+
+async def backfill_legacy_deployments(pause_seconds: float = 0.01) -> int:
+    """Migrate every remaining legacy document so global queries see them too; run once at startup"""
+    migrated = 0
+    try:
+        while await claim_legacy_document({}):
+            migrated += 1
+            # Yield between users so the backfill never hogs the event loop
+            await asyncio.sleep(pause_seconds)
+    except PyMongoError as e:
+        # Whatever is left migrates per user on first access
+        print(f"[Deployment Store] Legacy backfill stopped after {migrated} users: {e}")
+    if migrated:
+        print(f"[Deployment Store] Backfilled legacy deployments for {migrated} users")
+    return migrated
@@ -0,0 +1,5 @@
+import hashlib
+
+def source_hash(source: str) -> str:
+    """sha256 of the exact source text"""
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
@@ -0,0 +1,31 @@
+import threading
+
+class Metrics:
+    """Process-wide counters and timing observations exposed on /metrics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+
+    def increment(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            timing = self._timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+            timing["count"] += 1
+            timing["total"] += value
+            timing["max"] = max(timing["max"], value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {
+                name: {**timing, "avg": timing["total"] / timing["count"] if timing["count"] else 0.0}
+                for name, timing in self._timings.items()
+            }
+            return {"counters": dict(self._counters), "timings": timings}
+
+# Create a global instance
+metrics = Metrics()
@@ -1,17 +1,134 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import threading
+
+# One client (and connection pool) per process, created on first use
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "metadag")
+# Compacted chat buckets go to a separate (cold) database, by default the same one
+MONGO_ARCHIVE_DB_NAME = os.getenv("MONGO_ARCHIVE_DB_NAME", MONGO_DB_NAME)
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+}
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_client_pid = None
+
+def _reset_after_fork():
+    # Clients are not fork-safe: a forked worker must open its own pool rather than
+    # reuse the parent's sockets (and must not close them from the child either)
+    global _client, _async_client, _client_pid, _lock
+    _client, _async_client, _client_pid = None, None, None
+    _lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _check_pid():
+    global _client, _async_client, _client_pid
+    if _client_pid != os.getpid():
+        _client, _async_client, _client_pid = None, None, os.getpid()
 
 def get_mongo_client():
-    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-    return MongoClient(mongo_uri)
+    global _client
+    with _lock:
+        _check_pid()
+        if _client is None:
+            _client = MongoClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
+        return _client
+
+def get_async_mongo_client():
+    """Motor client for async routes, so database I/O doesn't block the event loop"""
+    global _async_client
+    with _lock:
+        _check_pid()
+        if _async_client is None:
+            _async_client = AsyncIOMotorClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
+        return _async_client
+
+def close_mongo_clients():
+    global _client, _async_client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        if _async_client is not None:
+            _async_client.close()
+        _client, _async_client = None, None
+
+async def ensure_indexes():
+    """
+    Create the indexes the routes rely on; run at startup. user_id is unique so
+    concurrent first writes for a user upsert into one document instead of two.
+    """
+    buckets = get_async_chat_bucket_collection()
+    try:
+        await buckets.create_index([("user_id", ASCENDING), ("bucket_seq", ASCENDING)], unique=True, name="user_bucket_unique")
+    except PyMongoError as e:
+        print(f"[Mongo] Could not create bucket index on {buckets.name}: {e}")
+    archive = get_async_chat_archive_collection()
+    try:
+        await archive.create_index([("user_id", ASCENDING), ("bucket_seq", ASCENDING)], name="user_bucket")
+    except PyMongoError as e:
+        print(f"[Mongo] Could not create bucket index on {archive.name}: {e}")
+    records = get_async_deployment_record_collection()
+    # Every index ends in (deployed_at, _id) so listings page by keyset newest first
+    record_indexes = {
+        "user_time": [("user_id", ASCENDING)],
+        "address_time": [("contract_address", ASCENDING)],
+        "name_time": [("contract_name", ASCENDING)],
+        "network_time": [("network", ASCENDING)],
+        "time": [],
+    }
+    for name, keys in record_indexes.items():
+        try:
+            await records.create_index(keys + [("deployed_at", DESCENDING), ("_id", DESCENDING)], name=name)
+        except PyMongoError as e:
+            print(f"[Mongo] Could not create {name} index on {records.name}: {e}")
+    for collection in (get_async_chat_collection(), get_async_deployment_collection()):
+        try:
+            await collection.create_index([("user_id", ASCENDING)], unique=True, name="user_id_unique")
+        except PyMongoError as e:
+            # e.g. Mongo unreachable, or duplicate user docs left by the old find-then-insert writes
+            print(f"[Mongo] Could not create user_id index on {collection.name}: {e}")
 
 def get_chat_collection():
-    client = get_mongo_client()
-    db = client["metadag"]  # or your preferred db name
-    return db["chat_history"]
+    return get_mongo_client()[MONGO_DB_NAME]["chat_history"]
 
 def get_deployment_collection():
-    client = get_mongo_client()
-    db = client["metadag"]  # or your preferred db name
-    return db["deployments"]
+    return get_mongo_client()[MONGO_DB_NAME]["deployments"]
+
+def get_async_chat_collection():
+    return get_async_mongo_client()[MONGO_DB_NAME]["chat_history"]
+
+def get_async_chat_bucket_collection():
+    return get_async_mongo_client()[MONGO_DB_NAME]["chat_messages"]
+
+def get_async_chat_archive_collection():
+    """Compressed chat buckets moved out of chat_messages by the compaction worker"""
+    return get_async_mongo_client()[MONGO_ARCHIVE_DB_NAME]["chat_archive"]
+
+def get_async_chat_summary_collection():
+    return get_async_mongo_client()[MONGO_DB_NAME]["chat_summaries"]
+
+def get_async_deployment_collection():
+    """Legacy per-user deployments arrays, migrated into deployment_records on first use"""
+    return get_async_mongo_client()[MONGO_DB_NAME]["deployments"]
+
+def get_async_deployment_record_collection():
+    return get_async_mongo_client()[MONGO_DB_NAME]["deployment_records"]
+
+def get_async_artifact_collection():
+    """Per deployed address: blob hashes of the ABI, bytecode and source; see utils/artifact_store.py"""
+    return get_async_mongo_client()[MONGO_DB_NAME]["contract_artifacts"]
 
+def get_async_blob_collection():
+    """Compressed Solidity sources keyed by sha256; see utils/blob_store.py"""
+    return get_async_mongo_client()[MONGO_DB_NAME]["source_blobs"]
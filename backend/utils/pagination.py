@@ -0,0 +1,38 @@
+import re
+import json
+import base64
+
+# Opaque cursors for the listing endpoints: clients pass back next_cursor as-is
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 200
+FIELD_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def encode_cursor(position: dict) -> str:
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    """Inverse of encode_cursor; raises ValueError for anything it didn't produce"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
+
+def parse_fields(fields: str | None) -> list | None:
+    """Comma-separated field names for projection; raises ValueError for anything but plain names"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    invalid = [name for name in names if not FIELD_PATTERN.match(name)]
+    if invalid:
+        raise ValueError(f"Invalid field names: {', '.join(invalid)}")
+    return names
+
+def check_limit(limit: int) -> int:
+    if limit < 1 or limit > PAGE_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {PAGE_MAX_LIMIT}")
+    return limit
@@ -0,0 +1,93 @@
+import time
+import asyncio
+import threading
+
+class AdmissionRejected(Exception):
+    """Raised when a call cannot be admitted within the queue limits; maps to HTTP 429"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Token bucket sized to a per-minute quota. Callers reserve their cost up front
+    (the balance may go negative) and wait until the refill covers it. At most
+    max_queue callers wait at a time, and none waits longer than max_wait_seconds;
+    anyone beyond that is rejected immediately instead of piling up.
+    """
+
+    def __init__(self, tokens_per_minute: int, max_queue: int, max_wait_seconds: float):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self.tokens = self.capacity
+        self.waiting = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, cost: float, queue: bool) -> float:
+        """Reserve cost tokens and return how long to wait for them"""
+        cost = min(cost, self.capacity)
+        with self._lock:
+            self._refill()
+            wait = max(0.0, (cost - self.tokens) / self.rate)
+            if wait > 0:
+                if not queue:
+                    raise AdmissionRejected("Token bucket is empty", wait)
+                if self.waiting >= self.max_queue or wait > self.max_wait_seconds:
+                    raise AdmissionRejected("LLM quota exhausted, admission queue is full", wait)
+                self.waiting += 1
+            self.tokens -= cost
+            return wait
+
+    def _release_waiter(self):
+        with self._lock:
+            self.waiting -= 1
+
+    def refund(self, cost: float):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + min(cost, self.capacity))
+
+    def headroom(self) -> float:
+        """Fraction of the bucket available right now, 0 while requests are queued; background work defers on it"""
+        with self._lock:
+            self._refill()
+            return 0.0 if self.waiting else max(0.0, self.tokens) / self.capacity
+
+    def try_acquire(self, cost: float) -> bool:
+        """Take cost tokens only if they are available right now"""
+        try:
+            self._reserve(cost, queue=False)
+            return True
+        except AdmissionRejected:
+            return False
+
+    def acquire(self, cost: float) -> float:
+        """Blocking acquire; returns the time spent waiting"""
+        wait = self._reserve(cost, queue=True)
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            finally:
+                self._release_waiter()
+        return wait
+
+    async def acquire_async(self, cost: float) -> float:
+        """Async acquire; a cancelled waiter gives its tokens back"""
+        wait = self._reserve(cost, queue=True)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.refund(cost)
+                raise
+            finally:
+                self._release_waiter()
+        return wait
@@ -1,7 +1,7 @@
 'use client'
 import React, { useState, useEffect, useRef } from "react";
 // import MonacoEditor from "@monaco-editor/react";
-import { CodeResponse, saveChat, sendChat } from "@/services/chatService";
+import { CodeResponse, saveChat, streamChat } from "@/services/chatService";
 import { deploySmartContract, IDeployResponse, saveDeployment, getDeployments } from "@/services/deployService";
 import toast, { Toaster } from 'react-hot-toast';
 import { useAccount } from "wagmi";
@@ -35,6 +35,19 @@ interface Deployment {
     // [key: string]: any;
 }
 
+const ARCHIVE_PAGE_SIZE = 50;
+
+const toMessage = (msg: unknown): Message => {
+    if (typeof msg === 'object' && msg !== null && 'sender' in msg) {
+        return {
+            sender: (msg as { sender: "user" | "ai" }).sender,
+            text: (msg as { message?: string; text?: string }).message || (msg as { text?: string }).text || "",
+            code: (msg as { code?: string }).code
+        };
+    }
+    return { sender: 'ai', text: '', code: '' };
+};
+
 const initialCode = `// SPDX-License-Identifier: MIT
 pragma solidity ^0.8.0;
 
@@ -56,13 +69,23 @@ const ChatWithEditor = () => {
     const [deployInfo, setDeployInfo] = useState<IDeployResponse | null>(null);
     const [isHistoryModalOpen, setIsHistoryModalOpen] = useState(false);
     const [deployments, setDeployments] = useState<Deployment[]>([]);
+    // Older messages compacted by the backend: their summary and a cursor into the archive
+    const [chatSummary, setChatSummary] = useState<string | null>(null);
+    const [archiveCursor, setArchiveCursor] = useState<string | null>(null);
+    const [isLoadingEarlier, setIsLoadingEarlier] = useState(false);
     const { address } = useAccount();
     const { theme } = useTheme();
 
     const chatEndRef = useRef<HTMLDivElement | null>(null);
+    // Prepending earlier messages should keep the current scroll position
+    const skipScrollRef = useRef(false);
 
     // Scroll to bottom when messages change
     useEffect(() => {
+        if (skipScrollRef.current) {
+            skipScrollRef.current = false;
+            return;
+        }
         if (chatEndRef.current) {
             chatEndRef.current.scrollIntoView({ behavior: 'smooth' });
         }
@@ -75,17 +98,10 @@ const ChatWithEditor = () => {
                 const res = await getChat(address);
                 if (res && res.data && res.data.chat_history) {
                     // Convert chat_history to Message[]
-                    const loadedMessages: Message[] = res.data.chat_history.map((msg: unknown) => {
-                        if (typeof msg === 'object' && msg !== null && 'sender' in msg) {
-                            return {
-                                sender: (msg as { sender: string }).sender,
-                                text: (msg as { message?: string; text?: string }).message || (msg as { text?: string }).text || "",
-                                code: (msg as { code?: string }).code
-                            };
-                        }
-                        return { sender: 'ai', text: '', code: '' };
-                    });
+                    const loadedMessages: Message[] = res.data.chat_history.map(toMessage);
                     setMessages(loadedMessages);
+                    setChatSummary(res.data.summary || null);
+                    setArchiveCursor(res.data.archive_cursor || null);
                     // Find last AI message with code
                     const lastAiMsg = [...loadedMessages].reverse().find((m: Message) => m.sender === 'ai' && !!m.code);
                     if (lastAiMsg && lastAiMsg.code) {
@@ -100,6 +116,25 @@ const ChatWithEditor = () => {
     }, [address]);
 
 
+    const loadEarlierMessages = async () => {
+        if (!address || !archiveCursor) return;
+        setIsLoadingEarlier(true);
+        try {
+            const res = await getChat(address, { limit: ARCHIVE_PAGE_SIZE, cursor: archiveCursor });
+            if (res && res.data && res.data.chat_history) {
+                // Pages come newest first
+                const earlier: Message[] = res.data.chat_history.map(toMessage).reverse();
+                skipScrollRef.current = true;
+                setMessages(prev => [...earlier, ...prev]);
+                setArchiveCursor(res.data.next_cursor || null);
+            }
+        } catch (e) {
+            console.log(e);
+        } finally {
+            setIsLoadingEarlier(false);
+        }
+    };
+
     const handleSend = async () => {
         if (!address) {
             toast.error("Wallet not connected");
@@ -115,7 +150,8 @@ const ChatWithEditor = () => {
 
             const prompt = input;
             setInput("");
-            const aiResponse: CodeResponse | undefined = await sendChat(prompt);
+            // Show the code in the editor while it is being generated
+            const aiResponse: CodeResponse | undefined = await streamChat(prompt, setCode);
             if (!aiResponse) return;
 
             const aiMessage: Message = { sender: 'ai', text: aiResponse.text, code: aiResponse.code };
@@ -235,6 +271,21 @@ const ChatWithEditor = () => {
                     
                     {/* Messages Area */}
                     <div className="flex-1 overflow-y-auto p-4 space-y-4 bg-gradient-to-b from-gray-50 to-white dark:from-gray-900 dark:to-gray-800">
+                        {chatSummary && (
+                            <div className="rounded-xl border border-gray-200 dark:border-gray-700 bg-gray-100 dark:bg-gray-800 p-3 text-xs text-gray-600 dark:text-gray-300">
+                                <p className="font-medium mb-1">Summary of earlier conversation</p>
+                                <p className="whitespace-pre-wrap">{chatSummary}</p>
+                                {archiveCursor && (
+                                    <Button
+                                        className="mt-2 px-3 py-1 rounded-lg bg-gray-200 dark:bg-gray-700 text-gray-700 dark:text-gray-200 text-xs disabled:opacity-50"
+                                        onClick={loadEarlierMessages}
+                                        disabled={isLoadingEarlier}
+                                    >
+                                        {isLoadingEarlier ? "Loading..." : "Load earlier messages"}
+                                    </Button>
+                                )}
+                            </div>
+                        )}
                         {messages.length === 0 && (
                             <div className="text-center text-gray-500 dark:text-gray-400 mt-8">
                                 <div className="w-16 h-16 bg-gradient-to-r from-blue-400 to-purple-400 rounded-full mx-auto mb-4 flex items-center justify-center">
@@ -34,6 +34,8 @@ export default function ContractAuditor() {
     const [isLoading, setIsLoading] = useState(false);
     const [auditResult, setAuditResult] = useState<AuditResult | null>(null);
     const [activeTab, setActiveTab] = useState<'original' | 'corrected'>('original');
+    // Lets the backend re-audit only the functions edited since the previous round
+    const [sessionId] = useState(() => crypto.randomUUID());
 
     const handleAudit = async () => {
         if (!contractCode.trim()) {
@@ -43,7 +45,7 @@ export default function ContractAuditor() {
 
         setIsLoading(true);
         try {
-            const result = await auditContract(contractCode);
+            const result = await auditContract(contractCode, undefined, sessionId);
             setAuditResult({
                 success: result.success,
                 originalCode: result.original_code,
@@ -3,6 +3,7 @@ import { api } from "../utils/axios";
 export interface AuditRequest {
     contract_code: string;
     description?: string;
+    session_id?: string;
 }
 
 export interface AuditResponse {
@@ -78,11 +79,12 @@ function isAxiosErrorWithDetail(error: unknown): error is { response: { data: {
     );
 }
 
-export async function auditContract(contractCode: string, description?: string): Promise<AuditResponse> {
+export async function auditContract(contractCode: string, description?: string, sessionId?: string): Promise<AuditResponse> {
     try {
         const response = await api.post("/audit", {
             contract_code: contractCode,
-            description: description || ""
+            description: description || "",
+            session_id: sessionId
         });
         return response.data;
     } catch (error: unknown) {
@@ -12,6 +12,48 @@ export async function sendChat(prompt: string) {
     }
 }
 
+// Streams /generate/stream (server-sent events) and reports the code as it is written
+export async function streamChat(prompt: string, onCode: (code: string) => void) {
+    try {
+        const res = await fetch(`${api.defaults.baseURL}/generate/stream`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ prompt: prompt }),
+        });
+        if (!res.ok || !res.body) {
+            throw new Error(`Generation failed with status ${res.status}`);
+        }
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let code = "";
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split("\n\n");
+            buffer = events.pop() ?? "";
+            for (const raw of events) {
+                const event = raw.match(/^event: (.*)$/m)?.[1];
+                const data = raw.match(/^data: (.*)$/m)?.[1];
+                if (!event || data === undefined) continue;
+                const payload = JSON.parse(data);
+                if (event === "code") {
+                    code += payload;
+                    onCode(code);
+                } else if (event === "done") {
+                    const processedData: CodeResponse = { text: payload.explanation, code: payload.code };
+                    return processedData;
+                } else if (event === "error") {
+                    throw new Error(payload);
+                }
+            }
+        }
+    } catch (e: unknown) {
+        console.log(e);
+    }
+}
+
 
 export interface CodeResponse {
     text: string;
@@ -66,9 +108,10 @@ export async function saveChat(user_id: string, chat_history: { sender: string;
   }
 }
 
-export async function getChat(user_id: string) {
+export async function getChat(user_id: string, page?: { limit?: number; cursor?: string }) {
   try {
-      return await api.get(`/get_chat_history/${user_id}`);
+      // With a limit or cursor the backend returns one page, newest first, plus next_cursor
+      return await api.get(`/get_chat_history/${user_id}`, { params: page });
   } catch (e: unknown) {
       console.log(e);
   }